@@ -0,0 +1,204 @@
+import os
+import argparse
+import pandas as pd
+from datetime import date, timedelta
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, text
+
+# --- Archivo de quincenas cerradas ---
+# Cada quincena cerrada de las tablas históricas se guarda como un archivo Parquet
+# comprimido (zstd) en ARCHIVE_DIR/<tabla>/<año>/<inicio de quincena>.parquet.
+# read_archived() los sirve al generador de reportes de la línea de comandos
+# (report_generator.py); el API y la app sólo leen la base, por eso no se purga nada.
+load_dotenv()
+
+ARCHIVE_DIR = os.getenv("SGO_ARCHIVE_DIR", "archivo")
+# Only quincenas that ended at least this many days ago count as closed. It is
+# longer than the frontend replica's horizon, so purged rows are never replicated.
+MIN_AGE_DAYS = int(os.getenv("SGO_ARCHIVE_MIN_AGE_DAYS", "180"))
+
+# table -> (first, last) date column of each row. An absence interval is archived
+# in every quincena it overlaps.
+TABLES = {
+    "incidentes": ("fecha_incidente", "fecha_incidente"),
+    "ausencias": ("start_date", "end_date"),
+    "sustituciones": ("fecha", "fecha"),
+    "tiempo_extra": ("fecha", "fecha"),
+    "asignaciones_servicio": ("fecha", "fecha"),
+}
+# Single-day incidents override the absence intervals (see backend/app/ausencias.py),
+# so an incidents archive is only complete with the intervals of the same quincenas.
+ARCHIVED_WITH = {"incidentes": ["ausencias"]}
+# Tables that may be purged. Every reader of a purged table must merge the archive
+# back, and none does yet: only report_generator.fetch_overtime_data reads it, while
+# the API range endpoints and the in-app reports read the database alone (and the
+# archive directory is local to wherever this script runs). Purging now would drop
+# the closed periods from them, so --purgar is refused until such a reader exists.
+PURGEABLE = []
+INTERNAL_COLUMNS = ["updated_at", "deleted_at"]
+
+def get_database_engine():
+    """Connects to the Cloud SQL database and returns an engine object."""
+    db_user = os.getenv("DB_USER")
+    db_password = os.getenv("DB_PASSWORD")
+    db_host = os.getenv("DB_HOST")
+    db_port = os.getenv("DB_PORT")
+    db_name = os.getenv("DB_NAME")
+
+    if not all([db_user, db_password, db_host, db_port, db_name]):
+        raise ValueError("❌ Error: Missing database credentials in .env file.")
+
+    database_url = f"postgresql+psycopg2://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
+    return create_engine(database_url)
+
+# --- Quincenas ---
+
+def quincena_of(day):
+    """(start, end) of the quincena containing `day`: the 1st-15th or the 16th-end of the month."""
+    if day.day <= 15:
+        return day.replace(day=1), day.replace(day=15)
+    next_month = (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return day.replace(day=16), next_month - timedelta(days=1)
+
+def quincenas_between(start, end):
+    """Every quincena overlapping [start, end], in order."""
+    periods = []
+    day = quincena_of(start)[0]
+    while day <= end:
+        period = quincena_of(day)
+        periods.append(period)
+        day = period[1] + timedelta(days=1)
+    return periods
+
+def archive_path(table, quincena_start):
+    return os.path.join(ARCHIVE_DIR, table, str(quincena_start.year), f"{quincena_start.isoformat()}.parquet")
+
+# --- Writing ---
+
+def archive_quincena(engine, table, start, end, purge=False):
+    """
+    Writes the live rows of one quincena to its Parquet file (atomically, through
+    a temporary file) and, with `purge`, deletes the quincena's rows from the
+    database afterwards. Returns the number of rows archived.
+    """
+    first, last = TABLES[table]
+    with engine.begin() as conn:
+        df = pd.read_sql(
+            text(f"SELECT * FROM {table} WHERE {first} <= :end AND {last} >= :start AND deleted_at IS NULL ORDER BY {first}"),
+            conn, params={"start": start, "end": end},
+        )
+        df = df.drop(columns=[c for c in INTERNAL_COLUMNS if c in df.columns])
+        path = archive_path(table, start)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        df.to_parquet(path + ".tmp", engine="pyarrow", compression="zstd", index=False)
+        os.replace(path + ".tmp", path)
+        if purge:
+            purge_quincena(conn, table, start, end)
+    return len(df)
+
+def purge_quincena(conn, table, start, end):
+    """
+    Deletes the quincena's rows in the caller's transaction. The same transaction
+    records the quincena in quincenas_purgadas, so stats.rebuild_summaries keeps
+    its summaries, and bumps the table's version, so the ETags of its reads change.
+    The rows are older than the frontend replica's horizon, so no client holds
+    them and they need no tombstones.
+    """
+    if table not in PURGEABLE:
+        raise ValueError(f"{table} no tiene un lector del archivo; sus filas no se pueden purgar.")
+    column = TABLES[table][0]
+    params = {"table": table, "start": start, "end": end}
+    deleted = conn.execute(text(f"DELETE FROM {table} WHERE {column} BETWEEN :start AND :end"), params).rowcount
+    conn.execute(text(
+        "INSERT INTO quincenas_purgadas (tabla, inicio, fin) VALUES (:table, :start, :end) ON CONFLICT DO NOTHING"
+    ), params)
+    if deleted:
+        conn.execute(text(
+            "INSERT INTO versiones_tablas (tabla, version) VALUES (:table, 1) "
+            "ON CONFLICT (tabla) DO UPDATE SET version = versiones_tablas.version + 1"
+        ), params)
+
+def is_purged(engine, table, start):
+    with engine.connect() as conn:
+        return conn.execute(
+            text("SELECT 1 FROM quincenas_purgadas WHERE tabla = :table AND inicio = :start"),
+            {"table": table, "start": start},
+        ).first() is not None
+
+def archive_closed(engine, until, tables=None, purge=False):
+    """
+    Archives every quincena that ended on or before `until` and has no file yet,
+    along with the tables archived with the requested ones. With `purge`, the
+    PURGEABLE tables are purged too. A quincena archived by an earlier run is
+    archived again in the purge transaction, so rows added or edited since then
+    are in the file before they are deleted; one already purged is left alone.
+    """
+    tables = list(tables or TABLES)
+    tables += [extra for table in tables for extra in ARCHIVED_WITH.get(table, []) if extra not in tables]
+    written = 0
+    for table in tables:
+        table_purge = purge and table in PURGEABLE
+        first = pd.read_sql(text(f"SELECT min({TABLES[table][0]}) AS first FROM {table}"), engine)["first"].iloc[0]
+        if first is None or pd.isna(first):
+            continue
+        for start, end in quincenas_between(pd.Timestamp(first).date(), until):
+            if end > until:
+                continue
+            if os.path.exists(archive_path(table, start)):
+                if table_purge and not is_purged(engine, table, start):
+                    rows = archive_quincena(engine, table, start, end, purge=True)
+                    print(f"{table} {start} a {end}: {rows} filas archivadas de nuevo y purgadas")
+                continue
+            rows = archive_quincena(engine, table, start, end, table_purge)
+            print(f"{table} {start} a {end}: {rows} filas archivadas")
+            written += 1
+    return written
+
+# --- Reading ---
+
+def read_archived(table, start, end):
+    """
+    Archived rows of `table` with their date (or interval) in [start, end], as a
+    DataFrame with the table's columns (empty when nothing in the range was archived).
+    """
+    first, last = TABLES[table]
+    frames = [
+        pd.read_parquet(archive_path(table, q_start))
+        for q_start, _ in quincenas_between(start, end)
+        if os.path.exists(archive_path(table, q_start))
+    ]
+    if not frames:
+        return pd.DataFrame()
+    df = pd.concat(frames, ignore_index=True)
+    if first != last:
+        # An interval is in the file of every quincena it overlaps; the latest copy wins.
+        df = df.drop_duplicates(subset="id", keep="last")
+    in_range = (pd.to_datetime(df[first]).dt.date <= end) & (pd.to_datetime(df[last]).dt.date >= start)
+    return df[in_range].reset_index(drop=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Archiva en Parquet las quincenas cerradas de las tablas históricas.")
+    parser.add_argument("--hasta", type=date.fromisoformat, default=date.today() - timedelta(days=MIN_AGE_DAYS),
+                        help="Archiva las quincenas que terminaron en o antes de esta fecha (AAAA-MM-DD).")
+    parser.add_argument("--tabla", action="append", choices=list(TABLES), help="Tabla a archivar. Puede repetirse.")
+    parser.add_argument("--purgar", action="store_true",
+                        help="Elimina de la base las filas ya archivadas de las tablas cuyos lectores leen el archivo "
+                             f"({', '.join(PURGEABLE) or 'ninguna por ahora'}).")
+    args = parser.parse_args(argv)
+
+    limit = date.today() - timedelta(days=MIN_AGE_DAYS)
+    if args.hasta > limit:
+        parser.error(f"Sólo se archivan quincenas cerradas hace al menos {MIN_AGE_DAYS} días (hasta {limit}).")
+    unreadable = [table for table in args.tabla or TABLES if table not in PURGEABLE]
+    if args.purgar and unreadable:
+        parser.error(f"--purgar no admite {', '.join(unreadable)}: el API y la app no leen su archivo.")
+
+    engine = get_database_engine()
+    try:
+        written = archive_closed(engine, args.hasta, args.tabla, args.purgar)
+        print(f"✅ {written} quincenas archivadas en '{ARCHIVE_DIR}'")
+    finally:
+        engine.dispose()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+from datetime import date, timedelta
+
+from sqlalchemy import Date, cast, func, literal_column, null, select, union_all
+from sqlalchemy.orm import Session, aliased
+
+import events, models
+
+# Las incidencias de larga duración se guardan como un intervalo por ausencia
+# (tabla `ausencias`) en lugar de una fila de `incidentes` por día. Una incidencia
+# de un solo día para la misma plaza y fecha tiene prioridad sobre el intervalo.
+LONG_ABSENCE_TYPES = ("Vacaciones", "Incapacidad", "Licencia", "Beca")
+
+_INCLUSIVE = literal_column("'[]'")
+
+
+def periodo(model=models.Ausencia):
+    """daterange of an interval; the same expression as the GiST index, so the planner can use it."""
+    return func.daterange(model.start_date, model.end_date, _INCLUSIVE)
+
+def overlapping(start_date: date, end_date: date, model=models.Ausencia):
+    return periodo(model).op("&&")(func.daterange(start_date, end_date, _INCLUSIVE))
+
+
+# --- Reads: intervals expanded to one incident per day ---
+def overridden(ausencia, dia, start_date=None, end_date=None):
+    """
+    A live single-day incident for the plaza on `dia` hides the interval's day.
+    The optional window repeats the outer bounds so the lookup is pruned to
+    their partitions (see partitioning.py).
+    """
+    criteria = [
+        models.active(models.Incidente),
+        models.Incidente.plaza_id == ausencia.plaza_id,
+        models.Incidente.fecha_incidente == dia,
+    ]
+    if start_date is not None:
+        criteria += [models.Incidente.fecha_incidente >= start_date, models.Incidente.fecha_incidente <= end_date]
+    return select(models.Incidente.incidente_id).where(*criteria).exists()
+
+def expanded_days(start_date: date, end_date: date):
+    """(ausencia, dia) for every day of the live intervals overlapping the window, clipped to it."""
+    ausencia = models.Ausencia
+    dia = cast(func.generate_series(
+        func.greatest(ausencia.start_date, start_date),
+        func.least(ausencia.end_date, end_date),
+        literal_column("interval '1 day'"),
+    ).column_valued("dia"), Date)
+    return ausencia, dia
+
+def incidencias(db: Session, start_date: date, end_date: date):
+    """
+    Incidents between both dates as the API returns them: the single-day rows
+    plus one row per day of each overlapping absence interval (with a null
+    incidente_id), except the days a single-day incident overrides.
+    """
+    ausencia, dia = expanded_days(start_date, end_date)
+    single_days = select(*models.Incidente.__table__.columns).where(
+        models.active(models.Incidente),
+        models.Incidente.fecha_incidente >= start_date,
+        models.Incidente.fecha_incidente <= end_date,
+    )
+    from_interval = {
+        "incidente_id": cast(null(), models.Incidente.incidente_id.type),
+        "plaza_id": ausencia.plaza_id,
+        "fecha_incidente": dia,
+        "tipo_incidencia": ausencia.tipo_incidencia,
+        "descripcion": ausencia.descripcion,
+        "registrado_por": ausencia.registrado_por,
+        "updated_at": ausencia.updated_at,
+        "deleted_at": ausencia.deleted_at,
+    }
+    interval_days = select(
+        *(from_interval[column.name].label(column.name) for column in models.Incidente.__table__.columns)
+    ).where(
+        models.active(ausencia),
+        overlapping(start_date, end_date),
+        ~overridden(ausencia, dia, start_date, end_date),
+    )
+    merged = aliased(models.Incidente, union_all(single_days, interval_days).subquery("incidencias"), adapt_on_names=True)
+    return db.query(merged).order_by(merged.fecha_incidente, merged.plaza_id)
+
+
+# --- Roll call writes ---
+def load(db: Session, plaza_ids, start_date: date, end_date: date):
+    """Live intervals of the plazas overlapping or adjacent to the window, as plaza -> list."""
+    by_plaza = {}
+    for ausencia in db.query(models.Ausencia).filter(
+        models.active(models.Ausencia),
+        models.Ausencia.plaza_id.in_(set(plaza_ids)),
+        overlapping(start_date - timedelta(days=1), end_date + timedelta(days=1)),
+    ):
+        by_plaza.setdefault(ausencia.plaza_id, []).append(ausencia)
+    return by_plaza
+
+def covering(intervals, fecha: date):
+    return next((a for a in intervals if a.start_date <= fecha <= a.end_date), None)
+
+def record_day(db: Session, intervals, incidente):
+    """
+    Stores one roll-call day of a long absence in the plaza's intervals (the
+    plaza's list from load(), updated in place): a day already covered with the
+    same tipo is a no-op, an adjacent interval of the same tipo is extended (two
+    are merged when the day closes the gap between them), otherwise a one-day
+    interval is opened. Returns False when the day lies inside an interval of
+    another tipo; the caller then keeps it as an overriding single-day incident.
+    """
+    fecha, tipo = incidente.fecha_incidente, incidente.tipo_incidencia
+    current = covering(intervals, fecha)
+    if current is not None:
+        return current.tipo_incidencia == tipo
+    before = next((a for a in intervals if a.end_date == fecha - timedelta(days=1) and a.tipo_incidencia == tipo), None)
+    after = next((a for a in intervals if a.start_date == fecha + timedelta(days=1) and a.tipo_incidencia == tipo), None)
+    if before is not None and after is not None:
+        before.end_date = after.end_date
+        after.deleted_at = func.now()
+        intervals.remove(after)
+    elif before is not None:
+        before.end_date = fecha
+    elif after is not None:
+        after.start_date = fecha
+    else:
+        ausencia = models.Ausencia(
+            plaza_id=incidente.plaza_id, tipo_incidencia=tipo, start_date=fecha, end_date=fecha,
+            descripcion=incidente.descripcion, registrado_por=incidente.registrado_por,
+        )
+        db.add(ausencia)
+        intervals.append(ausencia)
+    events.announce(db, "incidentes", fecha)
+    return True
+
+
+def clash(db: Session, plaza_id: str, start_date: date, end_date: date):
+    """Id of a live interval of the plaza overlapping the period, or None."""
+    row = db.query(models.Ausencia.id).filter(
+        models.active(models.Ausencia),
+        models.Ausencia.plaza_id == plaza_id,
+        overlapping(start_date, end_date),
+    ).first()
+    return row.id if row else None
@@ -0,0 +1,158 @@
+import re
+from collections import defaultdict
+from datetime import date, timedelta
+
+from sqlalchemy.orm import Session
+
+import models, reads, scheduling
+
+# Disponibilidad de los trabajadores para cubrir tiempo extra en un periodo, como
+# bitsets por día: el bit i de cada máscara corresponde a start_date + i días, así
+# que "libre en todos los días que faltan por cubrir" es un AND de enteros.
+
+# motivo_cobertura of the overtime registered from the planning board
+MOTIVO_PATTERN = re.compile(r"Cubre a: .* \(([^()]*)\)\. Folio:")
+# Incident types that do not take the worker off duty
+PRESENT_TYPES = ("Asistencia",)
+
+
+def popcount(mask):
+    return bin(mask).count("1")
+
+def covered_plaza(motivo):
+    """The plaza an overtime record covers, read from its motivo_cobertura (None if it covers no need)."""
+    match = MOTIVO_PATTERN.search(motivo or "")
+    return match.group(1) if match else None
+
+def motivo(nombre, plaza, folio):
+    """motivo_cobertura for overtime covering `plaza`, in the planning board's format."""
+    return f"Cubre a: {nombre} ({plaza}). Folio: {folio}"
+
+
+class Availability:
+    """
+    Day bitsets over [start_date, end_date] for every live plaza, loaded with
+    five queries: scheduled on its own roster (any shift), on rest, absent (a
+    non-attendance incident or long absence), on overtime and substituting,
+    plus the overtime hours each one already has and the days already covered
+    for each absent plaza.
+    """
+
+    def __init__(self, db: Session, start_date: date, end_date: date):
+        self.start_date = start_date
+        self.end_date = end_date
+        self.size = (end_date - start_date).days + 1
+        self._weekday_bits = [0] * 7
+        for i in range(self.size):
+            self._weekday_bits[(start_date.weekday() + i) % 7] |= 1 << i
+
+        self.plazas = {row["plaza"]: row for row in reads.rows(reads.plazas(db, 0, None), models.Plaza)}
+        self.working = {}
+        self.resting = {}
+        for plaza, row in self.plazas.items():
+            self.working[plaza] = self._expand(scheduling.work_mask(row["horario"], row["dias_descanso"]))
+            self.resting[plaza] = self._expand(scheduling.rest_mask(row["dias_descanso"]))
+
+        self.absent = defaultdict(int)
+        for row in reads.rows(reads.incidentes_por_rango(db, start_date, end_date), models.Incidente):
+            if row["tipo_incidencia"] not in PRESENT_TYPES:
+                self.absent[row["plaza_id"]] |= self.bit(row["fecha_incidente"])
+
+        self.overtime = defaultdict(int)
+        self.hours = defaultdict(float)
+        self.covered = defaultdict(int)
+        for row in reads.rows(reads.tiempo_extra_por_rango(db, start_date, end_date), models.TiempoExtra):
+            day = self.bit(row["fecha"])
+            self.overtime[row["plaza_id"]] |= day
+            self.hours[row["plaza_id"]] += row["horas"]
+            covered = covered_plaza(row["motivo_cobertura"])
+            if covered is not None:
+                self.covered[covered] |= day
+
+        self.substituting = defaultdict(int)
+        for row in reads.rows(reads.sustituciones_por_rango(db, start_date, end_date), models.Sustitucion):
+            self.substituting[row["plaza_suplente_id"]] |= self.bit(row["fecha"])
+
+    def _expand(self, weekday_mask):
+        days = 0
+        for weekday in range(7):
+            if weekday_mask >> weekday & 1:
+                days |= self._weekday_bits[weekday]
+        return days
+
+    def bit(self, day):
+        return 1 << (day - self.start_date).days
+
+    def day(self, index):
+        return self.start_date + timedelta(days=index)
+
+    def days(self, mask):
+        """The dates whose bits are set in `mask`, in order."""
+        return [self.day(i) for i in range(self.size) if mask >> i & 1]
+
+    def period(self, start_date, end_date):
+        """Mask of [start_date, end_date] clipped to the window."""
+        first = max((start_date - self.start_date).days, 0)
+        last = min((end_date - self.start_date).days, self.size - 1)
+        if first > last:
+            return 0
+        return ((1 << (last + 1)) - 1) & ~((1 << first) - 1)
+
+    def busy(self, plaza):
+        """Days the plaza can't take overtime: on its own roster, absent, already on overtime or substituting."""
+        return self.working.get(plaza, 0) | self.absent[plaza] | self.overtime[plaza] | self.substituting[plaza]
+
+    def uncovered(self, need):
+        """Days of a coverage need (absent plaza off rest days) that no overtime covers yet."""
+        absent = need["plaza_id_ausente"]
+        return self.period(need["start_date"], need["end_date"]) & ~self.resting.get(absent, 0) & ~self.covered[absent]
+
+    def eligible(self, need):
+        """plaza -> days of the need it can cover: same category as the absent worker and not busy."""
+        absent = need["plaza_id_ausente"]
+        category = self.plazas.get(absent, {}).get("categoria")
+        days = self.uncovered(need)
+        masks = {}
+        for plaza, row in self.plazas.items():
+            if plaza == absent or row["categoria"] != category:
+                continue
+            free = days & ~self.busy(plaza)
+            if free:
+                masks[plaza] = free
+        return masks
+
+    def candidates(self, need, limit=5):
+        """
+        For each uncovered day of the need, up to `limit` eligible workers, the
+        ones with the fewest overtime hours in the window first and, among them,
+        the ones free on more of the need's days (so one person can take it all).
+        """
+        masks = self.eligible(need)
+        uncovered = self.uncovered(need)
+        ranked = sorted(
+            masks,
+            key=lambda plaza: (self.hours[plaza], -popcount(masks[plaza]), self.plazas[plaza]["nombre_actual"] or ""),
+        )
+        dias = []
+        for fecha in self.days(uncovered):
+            day = self.bit(fecha)
+            picks = [plaza for plaza in ranked if masks[plaza] & day][:limit]
+            dias.append({
+                "fecha": fecha,
+                "candidatos": [
+                    {
+                        "plaza": plaza,
+                        "nombre_actual": self.plazas[plaza]["nombre_actual"],
+                        "horas_extra": self.hours[plaza],
+                        "dias_disponibles": popcount(masks[plaza]),
+                    }
+                    for plaza in picks
+                ],
+            })
+        return {
+            "cobertura_id": need["id"],
+            "plaza_id_ausente": need["plaza_id_ausente"],
+            "start_date": self.start_date,
+            "end_date": self.end_date,
+            "dias": dias,
+        }
@@ -0,0 +1,64 @@
+import os
+from datetime import date, datetime, timedelta
+from typing import Iterable, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+import models
+
+# table -> (model, column limiting the initial snapshot with `desde`)
+TRACKED = {
+    "plazas": (models.Plaza, None),
+    "incidentes": (models.Incidente, "fecha_incidente"),
+    "ausencias": (models.Ausencia, "end_date"),
+    "sustituciones": (models.Sustitucion, "fecha"),
+    "tiempo_extra": (models.TiempoExtra, "fecha"),
+    "asignaciones_servicio": (models.AsignacionServicio, "fecha"),
+    "coberturas_necesarias": (models.CoberturaNecesaria, "end_date"),
+}
+
+# updated_at is the transaction's start time (now()), so a transaction still open
+# when a cursor is issued can commit rows stamped before it. Re-reading this
+# window on every sync catches them; clients apply rows idempotently by key.
+OVERLAP = timedelta(seconds=int(os.environ.get("CHANGES_OVERLAP_SECONDS", "60")))
+
+
+def parse_tables(tables: Optional[str]):
+    """Comma-separated table names (None for all). Raises ValueError on unknown names."""
+    names = [name.strip() for name in tables.split(",")] if tables else None
+    unknown = set(names or ()) - set(TRACKED)
+    if unknown:
+        raise ValueError(f"Tablas desconocidas: {', '.join(sorted(unknown))}")
+    return names
+
+
+def changes_since(db: Session, since: Optional[datetime], desde: Optional[date] = None,
+                  tables: Optional[Iterable[str]] = None):
+    """
+    Rows changed after the `since` cursor, per table, split into upserts and
+    deleted keys. Without a cursor it returns a full snapshot of the live rows
+    (dated tables from `desde` on). The returned cursor goes in the next call.
+    """
+    cursor = db.execute(select(func.now())).scalar()
+    result = {}
+    for name in tables or TRACKED:
+        model, date_column = TRACKED[name]
+        key = model.__mapper__.primary_key[0].name
+        query = db.query(*models.public_columns(model), model.deleted_at)
+        if since is None:
+            query = query.filter(models.active(model))
+        else:
+            query = query.filter(model.updated_at > since - OVERLAP)
+        if desde is not None and date_column is not None:
+            query = query.filter(getattr(model, date_column) >= desde)
+
+        upserts, deletes = [], []
+        for row in query.order_by(model.updated_at):
+            row = row._asdict()
+            if row.pop("deleted_at") is None:
+                upserts.append(row)
+            else:
+                deletes.append(row[key])
+        result[name] = {"key": key, "upserts": upserts, "deletes": deletes}
+    return {"cursor": cursor.isoformat(), "full": since is None, "tables": result}
@@ -0,0 +1,123 @@
+from datetime import date
+
+from sqlalchemy.orm import Session
+
+import availability, models, reads, scheduling
+
+# Detección de dobles reservas. Cada reserva (tiempo extra, o ser suplente en una
+# sustitución) de un trabajador en un día choca con su turno programado, con una
+# incidencia que lo tiene ausente o con otra reserva del mismo día. La tabla
+# `ocupacion` lleva las reservas por (plaza, fecha); el turno sale de las máscaras
+# de scheduling.py y la incidencia de las incidencias combinadas (ausencias.py).
+
+# Tables that feed the conflicts; their versions form the ETag of GET /conflictos.
+# `ocupacion` is bumped by stats.rebuild_summaries, which rewrites it wholesale.
+TABLES = ("plazas", "incidentes", "ausencias", "tiempo_extra", "sustituciones", "ocupacion")
+
+
+def reasons(tiempo_extra, sustituciones, turno, tipo_incidencia):
+    """Why a worker's bookings for a day conflict (empty list when they don't)."""
+    bookings = tiempo_extra + sustituciones
+    if not bookings:
+        return []
+    motivos = []
+    if tipo_incidencia is not None and tipo_incidencia not in availability.PRESENT_TYPES:
+        motivos.append(f"Ausente ({tipo_incidencia})")
+    if turno:
+        motivos.append("Turno programado")
+    if bookings > 1:
+        motivos.append("Doble reserva")
+    return motivos
+
+
+def _incidencias(db: Session, start_date: date, end_date: date, plaza_ids=None):
+    """(plaza, fecha) -> effective tipo_incidencia over the range, from the merged incidents."""
+    query = reads.incidentes_por_rango(db, start_date, end_date)
+    entity = query.column_descriptions[0]["entity"]
+    if plaza_ids is not None:
+        query = query.filter(entity.plaza_id.in_(plaza_ids))
+    rows = query.with_entities(entity.plaza_id, entity.fecha_incidente, entity.tipo_incidencia)
+    return {(row.plaza_id, row.fecha_incidente): row.tipo_incidencia for row in rows}
+
+def _rosters(db: Session, plaza_ids=None):
+    """plaza -> weekday mask of its own shifts."""
+    query = db.query(models.Plaza.plaza, models.Plaza.horario, models.Plaza.dias_descanso).filter(models.active(models.Plaza))
+    if plaza_ids is not None:
+        query = query.filter(models.Plaza.plaza.in_(plaza_ids))
+    return {row.plaza: scheduling.work_mask(row.horario, row.dias_descanso) for row in query}
+
+def _conflict(plaza_id, fecha, counts, roster, tipo_incidencia):
+    turno = bool(roster >> fecha.weekday() & 1)
+    motivos = reasons(counts[0], counts[1], turno, tipo_incidencia)
+    if not motivos:
+        return None
+    return {
+        "plaza_id": plaza_id,
+        "fecha": fecha,
+        "motivos": motivos,
+        "tiempo_extra": counts[0],
+        "sustituciones": counts[1],
+        "turno_programado": turno,
+        "tipo_incidencia": tipo_incidencia,
+    }
+
+
+class Bookings:
+    """
+    Occupancy of the (plaza, fecha) keys a write touches, loaded with three
+    indexed queries whatever the number of keys; each booking is then checked
+    with dictionary lookups, and bookings added in the same write count against
+    each other.
+    """
+
+    def __init__(self, db: Session, keys):
+        keys = {(plaza, fecha) for plaza, fecha in keys if plaza}
+        self.counts = {}
+        self.rosters = {}
+        self.incidencias = {}
+        if not keys:
+            return
+        plaza_ids = {plaza for plaza, _ in keys}
+        fechas = {fecha for _, fecha in keys}
+        for row in db.query(models.Ocupacion).filter(
+            models.Ocupacion.plaza_id.in_(plaza_ids),
+            models.Ocupacion.fecha.in_(fechas)
+        ):
+            self.counts[(row.plaza_id, row.fecha)] = [row.tiempo_extra, row.sustituciones]
+        self.rosters = _rosters(db, plaza_ids)
+        self.incidencias = _incidencias(db, min(fechas), max(fechas), plaza_ids)
+
+    def book(self, plaza_id, fecha, tiempo_extra=0, sustituciones=0):
+        """Adds a booking (negative to release one) and returns the day's conflict with it, or None."""
+        if not plaza_id:
+            return None
+        counts = self.counts.setdefault((plaza_id, fecha), [0, 0])
+        counts[0] += tiempo_extra
+        counts[1] += sustituciones
+        if tiempo_extra <= 0 and sustituciones <= 0:
+            return None
+        return _conflict(plaza_id, fecha, counts, self.rosters.get(plaza_id, 0), self.incidencias.get((plaza_id, fecha)))
+
+
+def in_range(db: Session, start_date: date, end_date: date):
+    """
+    Every conflicting (plaza, fecha) in the range. Only days with bookings can
+    conflict, so the scan starts from the bookings index rather than the tables.
+    """
+    booked = db.query(models.Ocupacion).filter(
+        models.Ocupacion.fecha >= start_date,
+        models.Ocupacion.fecha <= end_date,
+        models.Ocupacion.tiempo_extra + models.Ocupacion.sustituciones > 0
+    ).all()
+    if not booked:
+        return []
+    rosters = _rosters(db)
+    incidencias = _incidencias(db, start_date, end_date)
+    conflictos = []
+    for row in booked:
+        conflict = _conflict(row.plaza_id, row.fecha, (row.tiempo_extra, row.sustituciones),
+                             rosters.get(row.plaza_id, 0), incidencias.get((row.plaza_id, row.fecha)))
+        if conflict is not None:
+            conflictos.append(conflict)
+    conflictos.sort(key=lambda c: (c["fecha"], c["plaza_id"]))
+    return conflictos
@@ -0,0 +1,58 @@
+from datetime import date
+
+from sqlalchemy.orm import Session
+
+import models, reads, scheduling
+
+# Tables read by day_snapshot(); their versions form the ETag of GET /day/{fecha}.
+TABLES = ("plazas", "incidentes", "ausencias", "asignaciones_servicio", "sustituciones", "tiempo_extra")
+
+
+def day_snapshot(db: Session, fecha: date):
+    """
+    Everything the supervisor's screen shows for one date, from five indexed
+    queries: the day's incidents, assignments (all shifts), substitutions and
+    overtime, plus, per shift, the scheduled roster with each worker's incident,
+    service area and substitute already joined in.
+    """
+    plazas = reads.rows(reads.plazas(db, 0, None), models.Plaza)
+    incidentes = reads.rows(reads.incidentes_por_fecha(db, fecha), models.Incidente)
+    asignaciones = reads.rows(
+        db.query(models.AsignacionServicio).filter(
+            models.active(models.AsignacionServicio), models.AsignacionServicio.fecha == fecha
+        ),
+        models.AsignacionServicio,
+    )
+    sustituciones = reads.rows(reads.sustituciones_por_rango(db, fecha, fecha), models.Sustitucion)
+    tiempo_extra = reads.rows(reads.tiempo_extra_por_rango(db, fecha, fecha), models.TiempoExtra)
+
+    incidente_by_plaza = {row["plaza_id"]: row for row in incidentes}
+    area_by_key = {(row["plaza_id"], row["turno"]): row["area_servicio"] for row in asignaciones}
+    suplente_by_plaza = {row["plaza_ausente_id"]: row["plaza_suplente_id"] for row in sustituciones}
+    bit = 1 << fecha.weekday()
+
+    turnos = {}
+    for shift in scheduling.SHIFTS:
+        roster = []
+        for plaza in plazas:
+            if not scheduling.roster_mask(plaza["horario"], plaza["dias_descanso"], shift) & bit:
+                continue
+            incidente = incidente_by_plaza.get(plaza["plaza"])
+            roster.append({
+                "plaza": plaza["plaza"],
+                "nombre_actual": plaza["nombre_actual"],
+                "categoria": plaza["categoria"],
+                "tipo_incidencia": incidente["tipo_incidencia"] if incidente else None,
+                "area_servicio": area_by_key.get((plaza["plaza"], shift)),
+                "plaza_suplente_id": suplente_by_plaza.get(plaza["plaza"]),
+            })
+        turnos[shift] = roster
+
+    return {
+        "fecha": fecha,
+        "turnos": turnos,
+        "incidentes": incidentes,
+        "asignaciones": asignaciones,
+        "sustituciones": sustituciones,
+        "tiempo_extra": tiempo_extra,
+    }
@@ -14,6 +14,11 @@ def get_engine():
     Initializes a connection pool for a Cloud SQL instance of Postgres.
     Uses the Cloud SQL Python Connector package.
     """
+    # A plain DATABASE_URL (e.g. a local Postgres for tests) bypasses the connector.
+    database_url = os.environ.get("DATABASE_URL")
+    if database_url:
+        return create_engine(database_url)
+
     # These environment variables are set by the gcloud run deploy command
     db_user = os.environ["DB_USER"]
     db_pass = os.environ["DB_PASSWORD"]
@@ -0,0 +1,104 @@
+import logging
+import os
+import time
+from collections import Counter
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger("sgo.diagnostics")
+
+# DB_DIAGNOSTICS=1 logs findings; DB_DIAGNOSTICS=strict also raises when a route exceeds its query budget.
+MODE = os.environ.get("DB_DIAGNOSTICS", "").lower()
+ENABLED = MODE in ("1", "true", "on", "strict")
+STRICT = MODE == "strict"
+SLOW_QUERY_MS = float(os.environ.get("DB_SLOW_QUERY_MS", "200"))
+REPEAT_THRESHOLD = int(os.environ.get("DB_REPEAT_THRESHOLD", "3"))
+DEFAULT_QUERY_BUDGET = int(os.environ.get("DB_QUERY_BUDGET", "10"))
+
+_INFO_KEY = "sgo_diagnostics"
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_budget(max_queries: int):
+    """Decorator for endpoints: the maximum number of SQL statements the route may issue."""
+    def decorator(endpoint):
+        endpoint.query_budget = max_queries
+        return endpoint
+    return decorator
+
+
+class StatementLog:
+    def __init__(self):
+        self.statements = []  # (statement, parameters, seconds)
+
+    def record(self, statement, parameters, seconds):
+        self.statements.append((statement, parameters, seconds))
+
+
+def instrument_engine(engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if _INFO_KEY in conn.info:
+            conn.info.setdefault("sgo_diag_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        log = conn.info.get(_INFO_KEY)
+        if log is not None:
+            log.record(statement, parameters, time.perf_counter() - conn.info["sgo_diag_start"].pop())
+
+    @event.listens_for(engine, "checkin")
+    def _checkin(dbapi_connection, connection_record):
+        # The pooled connection outlives the session; don't leak the log to the next checkout.
+        connection_record.info.pop(_INFO_KEY, None)
+
+@event.listens_for(Session, "after_begin")
+def _attach_log(session, transaction, connection):
+    log = session.info.get(_INFO_KEY)
+    if log is not None:
+        connection.info[_INFO_KEY] = log
+
+
+def start(db: Session):
+    """Starts collecting the statements issued through `db`."""
+    db.info[_INFO_KEY] = StatementLog()
+
+def finish(db: Session, engine, route_name: str, budget: int):
+    """Analyzes the statements collected for one request and logs (or raises on) any finding."""
+    log = db.info.pop(_INFO_KEY, None)
+    if log is None:
+        return
+
+    by_text = Counter(statement for statement, _, _ in log.statements)
+    for statement, count in by_text.items():
+        if count >= REPEAT_THRESHOLD:
+            logger.warning("[%s] statement executed %d times (possible N+1): %s", route_name, count, statement)
+    exact = Counter((statement, repr(parameters)) for statement, parameters, _ in log.statements)
+    for (statement, parameters), count in exact.items():
+        if count > 1:
+            logger.warning("[%s] identical statement repeated %d times: %s %s", route_name, count, statement, parameters)
+
+    for statement, parameters, seconds in log.statements:
+        if seconds * 1000 >= SLOW_QUERY_MS:
+            logger.warning("[%s] slow statement (%.1f ms): %s %s\n%s",
+                           route_name, seconds * 1000, statement, parameters, explain(engine, statement, parameters))
+
+    if len(log.statements) > budget:
+        message = f"[{route_name}] issued {len(log.statements)} statements, budget is {budget}"
+        if STRICT:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+def explain(engine, statement, parameters):
+    if not statement.lstrip().upper().startswith(("SELECT", "WITH", "UPDATE", "DELETE", "INSERT")):
+        return "(no EXPLAIN for this statement)"
+    try:
+        with engine.connect() as conn:
+            rows = conn.exec_driver_sql("EXPLAIN " + statement, parameters).fetchall()
+        return "\n".join(row[0] for row in rows)
+    except Exception as e:
+        return f"(EXPLAIN failed: {e})"
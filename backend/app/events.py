@@ -0,0 +1,156 @@
+import asyncio
+import os
+import threading
+import uuid
+from collections import deque
+
+import orjson
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+# Tables whose commits are announced on GET /events, with the column that dates
+# each row. Summary and bookkeeping tables are derived data and stay silent.
+DATE_COLUMNS = {
+    "plazas": None,
+    "incidentes": "fecha_incidente",
+    "ausencias": None,
+    "sustituciones": "fecha",
+    "tiempo_extra": "fecha",
+    "asignaciones_servicio": "fecha",
+    "coberturas_necesarias": None,
+    "coberturas_temporales": None,
+}
+KEEPALIVE_SECONDS = float(os.environ.get("EVENTS_KEEPALIVE_SECONDS", "15"))
+HISTORY_SIZE = int(os.environ.get("EVENTS_HISTORY_SIZE", "1000"))
+
+_SESSION_KEY = "sgo_change_notices"
+
+
+class Broker:
+    """
+    In-process fan-out of change notices to the open /events streams. Notices are
+    numbered and the last HISTORY_SIZE are kept, so a client reconnecting with
+    Last-Event-ID gets what it missed. Each Cloud Run instance has its own broker
+    and only announces the writes it handled itself, so event ids are
+    "<epoch>-<number>" with an epoch drawn per process: an id from another
+    instance, or from before a restart, never matches and gets a reset.
+    """
+    def __init__(self, history_size=HISTORY_SIZE, epoch=None):
+        self.epoch = epoch or uuid.uuid4().hex[:12]
+        self._history = deque(maxlen=history_size)
+        self._subscribers = {}  # queue -> event loop
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def publish(self, notices):
+        """Thread-safe: called from the threadpool when a session commits."""
+        with self._lock:
+            numbered = []
+            for notice in notices:
+                numbered.append((self._next_id, orjson.dumps(notice).decode()))
+                self._next_id += 1
+            self._history.extend(numbered)
+            subscribers = list(self._subscribers.items())
+        items = [(self.event_id(number), data) for number, data in numbered]
+        for queue, loop in subscribers:
+            for item in items:
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+
+    def event_id(self, number):
+        return f"{self.epoch}-{number}"
+
+    def subscribe(self, last_event_id=None):
+        """
+        Registers a stream on the running loop. Returns the queue, the
+        (event id, data) notices missed since `last_event_id` and the id of the
+        latest notice. The backlog is None when the notices already fell out of
+        the history, or the id belongs to another process, and the client must
+        drop everything it cached.
+        """
+        queue = asyncio.Queue()
+        with self._lock:
+            self._subscribers[queue] = asyncio.get_running_loop()
+            latest = self.event_id(self._next_id - 1)
+            if last_event_id is None:
+                return queue, [], latest
+            epoch, _, number = last_event_id.rpartition("-")
+            if epoch != self.epoch or not number.isdigit():
+                return queue, None, latest
+            last = int(number)
+            oldest = self._history[0][0] if self._history else self._next_id
+            if last + 1 < oldest or last >= self._next_id:
+                return queue, None, latest
+            return queue, [(self.event_id(n), data) for n, data in self._history if n > last], latest
+
+    def unsubscribe(self, queue):
+        with self._lock:
+            self._subscribers.pop(queue, None)
+
+
+broker = Broker()
+
+
+def _notices(session):
+    """Groups the rows touched by a flush into compact (table, fecha, turno, ids) notices."""
+    grouped = {}
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        table = getattr(obj, "__tablename__", None)
+        if table not in DATE_COLUMNS:
+            continue
+        date_column = DATE_COLUMNS[table]
+        fecha = getattr(obj, date_column) if date_column else None
+        key = (table, fecha.isoformat() if fecha else None, getattr(obj, "turno", None))
+        # The identity key is only assigned after the flush; the PK attributes already hold it.
+        pk = inspect(obj).mapper.primary_key_from_instance(obj)
+        grouped.setdefault(key, []).append(pk[0] if len(pk) == 1 else pk)
+    return [
+        {"table": table, "fecha": fecha, "turno": turno, "ids": ids}
+        for (table, fecha, turno), ids in grouped.items()
+    ]
+
+@event.listens_for(Session, "after_flush")
+def _collect_notices(session, flush_context):
+    notices = _notices(session)
+    if notices:
+        session.info.setdefault(_SESSION_KEY, []).extend(notices)
+
+def announce(session, table, fecha=None, turno=None, ids=()):
+    """Queues a notice explicitly, for bulk statements that bypass the ORM flush."""
+    notice = {"table": table, "fecha": fecha.isoformat() if fecha else None, "turno": turno, "ids": list(ids)}
+    session.info.setdefault(_SESSION_KEY, []).append(notice)
+
+@event.listens_for(Session, "after_commit")
+def _publish_notices(session):
+    notices = session.info.pop(_SESSION_KEY, None)
+    if notices:
+        broker.publish(notices)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_notices(session):
+    session.info.pop(_SESSION_KEY, None)
+
+
+def _format(event_id, data):
+    return f"id: {event_id}\nevent: change\ndata: {data}\n\n"
+
+async def stream(request, last_event_id=None):
+    """Server-sent events body for GET /events."""
+    queue, backlog, latest = broker.subscribe(last_event_id)
+    try:
+        yield "retry: 3000\n\n"
+        if backlog is None:
+            # Carries the current id, so the client's next reconnect resumes from here.
+            yield f"id: {latest}\nevent: reset\ndata: {{}}\n\n"
+            backlog = []
+        for event_id, data in backlog:
+            yield _format(event_id, data)
+        while not await request.is_disconnected():
+            try:
+                event_id, data = await asyncio.wait_for(queue.get(), KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                # Comment line: keeps proxies from closing an idle connection.
+                yield ": keepalive\n\n"
+                continue
+            yield _format(event_id, data)
+    finally:
+        broker.unsubscribe(queue)
@@ -0,0 +1,101 @@
+import io
+
+from fastapi import HTTPException, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Date, Float, Integer, String
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Las exportaciones columnares son opcionales
+    pa = None
+
+import models, reads
+from database import SessionLocal
+
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+PARQUET_MEDIA_TYPE = "application/vnd.apache.parquet"
+BATCH_SIZE = 10000
+
+
+def _arrow_type(column):
+    if isinstance(column.type, Integer):
+        return pa.int64()
+    if isinstance(column.type, Float):
+        return pa.float64()
+    if isinstance(column.type, Date):
+        return pa.date32()
+    if isinstance(column.type, String):
+        return pa.string()
+    raise TypeError(f"Unsupported column type for export: {column.type!r}")
+
+def arrow_schema(model):
+    return pa.schema([pa.field(column.name, _arrow_type(column)) for column in models.public_columns(model)])
+
+def record_batches(statement, schema):
+    """
+    Executes `statement` on its own session and yields Arrow record batches of
+    BATCH_SIZE rows as they come off the cursor. The session is owned by the
+    generator because the response is still streaming after the endpoint returns.
+    """
+    db = SessionLocal()
+    try:
+        result = db.execute(statement.execution_options(yield_per=BATCH_SIZE))
+        for rows in result.partitions(BATCH_SIZE):
+            columns = list(zip(*rows))
+            yield pa.RecordBatch.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                schema=schema,
+            )
+    finally:
+        db.close()
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object whose buffered bytes can be drained between row groups."""
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+def _arrow_stream(statement, schema):
+    sink = _ChunkSink()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for batch in record_batches(statement, schema):
+            writer.write_batch(batch)
+            yield sink.drain()
+    yield sink.drain()
+
+def _parquet_stream(statement, schema):
+    sink = _ChunkSink()
+    with pq.ParquetWriter(sink, schema, compression="zstd") as writer:
+        for batch in record_batches(statement, schema):
+            writer.write_batch(batch)
+            yield sink.drain()
+    yield sink.drain()
+
+def range_response(query, model, format: str, response: Response, filename: str):
+    """Streams the rows of `query` as an Arrow IPC stream or a Parquet file."""
+    if pa is None:
+        raise HTTPException(status_code=501, detail="pyarrow no está instalado en el servidor")
+    schema = arrow_schema(model)
+    statement = query.with_entities(*reads.public_columns(query, model)).statement
+    headers = dict(response.headers)
+    if format == "parquet":
+        headers["Content-Disposition"] = f'attachment; filename="{filename}.parquet"'
+        return StreamingResponse(_parquet_stream(statement, schema), media_type=PARQUET_MEDIA_TYPE, headers=headers)
+    return StreamingResponse(_arrow_stream(statement, schema), media_type=ARROW_MEDIA_TYPE, headers=headers)
@@ -1,74 +1,343 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+import os
+import orjson
+from fastapi import FastAPI, Depends, HTTPException, Request, Response, status
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from typing import List
-from datetime import date
+from typing import List, Literal, Optional
+from datetime import date, datetime
 
-import models, schemas
+import ausencias, availability, changes, conflicts, daily, diagnostics, events, export, metrics, migrations, models, partitioning, planner, read_cache, reads, schemas, stats, versioning
 from database import SessionLocal, engine
 
 models.Base.metadata.create_all(bind=engine)
+migrations.apply(engine)
+partitioning.ensure_partitions(engine)
+stats.backfill(engine)
 
 app = FastAPI(
     title="Sistema de Gestión de Operaciones (SGO) API",
     description="API for managing employee incidents, substitutions, and overtime.",
-    version="1.8.0"
+    version="1.8.0",
+    default_response_class=ORJSONResponse
 )
 
-def get_db():
+# Responses smaller than this are sent uncompressed; compressing them costs more than it saves.
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", "1000"))
+try:
+    # Brotli when the client accepts it, falling back to gzip otherwise.
+    from brotli_asgi import BrotliMiddleware
+    app.add_middleware(BrotliMiddleware, minimum_size=COMPRESSION_MIN_SIZE, gzip_fallback=True)
+except ImportError:
+    app.add_middleware(GZipMiddleware, minimum_size=COMPRESSION_MIN_SIZE)
+
+# Outermost middleware, so its timings include compression.
+metrics.instrument_engine(engine)
+app.add_middleware(metrics.MetricsMiddleware)
+
+if diagnostics.ENABLED:
+    diagnostics.instrument_engine(engine)
+
+# Upper bound on the reads one POST /batch may carry
+MAX_BATCH_QUERIES = 20
+
+# Formats accepted by the range endpoints: JSON (default) or columnar Arrow IPC / Parquet
+ExportFormat = Literal["json", "arrow", "parquet"]
+
+def get_db(request: Request):
+    metrics.mark_handler_start()
     db = SessionLocal()
+    if diagnostics.ENABLED:
+        diagnostics.start(db)
     try:
         yield db
     finally:
         db.close()
+        if diagnostics.ENABLED:
+            route = request.scope.get("route")
+            budget = getattr(getattr(route, "endpoint", None), "query_budget", diagnostics.DEFAULT_QUERY_BUDGET)
+            diagnostics.finish(db, engine, getattr(route, "path", request.url.path), budget)
+
+def check_not_modified(request: Request, response: Response, db: Session, *tables: str):
+    """
+    Sets the ETag of a read endpoint from the version counters of `tables`.
+    Returns a 304 response when the client already holds the current version.
+    """
+    etag = versioning.current_etag(db, tables, request.url.path, request.url.query)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if versioning.etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return None
+
+def rows_response(query, model, response: Response):
+    """
+    Returns the rows of `query` as plain dicts serialized with orjson, skipping
+    ORM object construction and response_model validation on large list endpoints.
+    Headers already set on `response` (e.g. the ETag) are carried over.
+    """
+    return ORJSONResponse(reads.rows(query, model), headers=dict(response.headers))
+
+def cached_rows_response(request: Request, db: Session, name: str, tables, query, model):
+    """
+    Serves a hot, slowly-changing list from the in-process read cache. A hit
+    costs no database round trip at all (not even the ETag version lookup);
+    a miss runs `query`, serializes the rows once and stores body and ETag.
+    """
+    key = (request.url.path, request.url.query)
+    entry = read_cache.cache.get(name, key)
+    if entry is None:
+        generation = read_cache.cache.generation(tables)
+        etag = versioning.current_etag(db, tables, request.url.path, request.url.query)
+        entry = read_cache.cache.put(key, tables, generation, etag, orjson.dumps(reads.rows(query, model)))
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if versioning.etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(entry.body, media_type="application/json", headers=headers)
+
+# --- Metrics Endpoint ---
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def read_metrics():
+    return metrics.render_metrics() + "\n".join(read_cache.cache.render()) + "\n"
+
+@app.get("/cache/stats", include_in_schema=False)
+def read_cache_stats():
+    """Aciertos, fallos y tasa de aciertos de la caché de lecturas por endpoint."""
+    return read_cache.cache.hit_rates()
+
+# --- Change Notifications (server-sent events) ---
+@app.get("/events")
+async def stream_events(request: Request):
+    """
+    Stream of change notices, one per (table, fecha, turno) touched by each commit:
+    `data: {"table": ..., "fecha": ..., "turno": ..., "ids": [...]}`.
+    Reconnecting with Last-Event-ID replays the notices missed in between;
+    an `event: reset` means they are gone (or the id comes from another instance
+    or an earlier process) and the client must refetch everything.
+    """
+    return StreamingResponse(
+        events.stream(request, request.headers.get("last-event-id")),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# --- Delta Sync ---
+@app.get("/changes", response_model=schemas.ChangeSet)
+@diagnostics.query_budget(len(changes.TRACKED) + 1)
+def read_changes(since: Optional[datetime] = None, desde: Optional[date] = None, tables: Optional[str] = None,
+                 db: Session = Depends(get_db)):
+    """
+    Filas modificadas desde el cursor `since` (el `cursor` de la respuesta anterior),
+    con las eliminadas como tombstones. Sin `since` devuelve una copia completa;
+    `desde` limita las tablas con fecha y `tables` (separadas por comas) las tablas.
+    """
+    try:
+        names = changes.parse_tables(tables)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return ORJSONResponse(changes.changes_since(db, since, desde, names))
+
+# --- Batched Reads ---
+@app.post("/batch", response_model=schemas.BatchResult)
+@diagnostics.query_budget(MAX_BATCH_QUERIES + len(changes.TRACKED))
+def read_batch(batch: schemas.BatchRequest, db: Session = Depends(get_db)):
+    """
+    Ejecuta varias lecturas GET en una sola petición: cada consulta indica el
+    `path` del endpoint y sus `params`, y su resultado vuelve bajo su `name`.
+    All of them run in one REPEATABLE READ transaction, so they see the same snapshot.
+    """
+    if len(batch.queries) > MAX_BATCH_QUERIES:
+        raise HTTPException(status_code=400, detail=f"Máximo {MAX_BATCH_QUERIES} consultas por lote")
+    calls = []
+    for query in batch.queries:
+        if query.path not in reads.BATCHABLE:
+            raise HTTPException(status_code=400, detail=f"{query.name}: ruta no disponible en lote: {query.path}")
+        params_model, run = reads.BATCHABLE[query.path]
+        try:
+            params = params_model(**query.params)
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=f"{query.name}: {e}")
+        calls.append((query.name, run, params))
+
+    db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+    results = {}
+    for name, run, params in calls:
+        try:
+            results[name] = run(db, **params.dict())
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"{name}: {e}")
+    return ORJSONResponse({"results": results})
 
 # --- Plazas Endpoint ---
 @app.get("/plazas/", response_model=List[schemas.Plaza])
-def read_plazas(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return db.query(models.Plaza).offset(skip).limit(limit).all()
+@diagnostics.query_budget(2)
+def read_plazas(request: Request, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+    query = reads.plazas(db, skip, limit)
+    return cached_rows_response(request, db, "plazas", ("plazas",), query, models.Plaza)
+
+# --- Per-day Snapshot ---
+@app.get("/day/{fecha}", response_model=schemas.DaySnapshot)
+@diagnostics.query_budget(len(daily.TABLES) + 1)
+def read_day(request: Request, response: Response, fecha: date, db: Session = Depends(get_db)):
+    """
+    Vista completa de un día para los tres turnos: incidencias, asignaciones,
+    sustituciones, tiempo extra y el rol programado con todo ya combinado.
+    """
+    not_modified = check_not_modified(request, response, db, *daily.TABLES)
+    if not_modified:
+        return not_modified
+    return ORJSONResponse(daily.day_snapshot(db, fecha), headers=dict(response.headers))
 
 # --- Incidente Endpoints ---
 @app.get("/incidentes/", response_model=List[schemas.Incidente])
-def read_incidentes_by_date(fecha: date, db: Session = Depends(get_db)):
-    return db.query(models.Incidente).filter(models.Incidente.fecha_incidente == fecha).all()
+@diagnostics.query_budget(2)
+def read_incidentes_by_date(request: Request, response: Response, fecha: date, db: Session = Depends(get_db)):
+    not_modified = check_not_modified(request, response, db, "incidentes", "ausencias")
+    if not_modified:
+        return not_modified
+    query = reads.incidentes_por_fecha(db, fecha)
+    return rows_response(query, models.Incidente, response)
 
 @app.get("/incidentes/range/", response_model=List[schemas.Incidente])
-def read_incidentes_by_range(start_date: date, end_date: date, db: Session = Depends(get_db)):
-    return db.query(models.Incidente).filter(
-        models.Incidente.fecha_incidente >= start_date,
-        models.Incidente.fecha_incidente <= end_date
-    ).all()
+@diagnostics.query_budget(2)
+def read_incidentes_by_range(request: Request, response: Response, start_date: date, end_date: date, format: ExportFormat = "json", db: Session = Depends(get_db)):
+    not_modified = check_not_modified(request, response, db, "incidentes", "ausencias")
+    if not_modified:
+        return not_modified
+    query = reads.incidentes_por_rango(db, start_date, end_date)
+    if format != "json":
+        return export.range_response(query, models.Incidente, format, response, f"incidentes_{start_date}_{end_date}")
+    return rows_response(query, models.Incidente, response)
+
+def save_incidentes(db: Session, incidentes: List[schemas.IncidenteCreate]):
+    """
+    One incident per (plaza, fecha); repeated keys keep the last value, so a
+    retried batch is idempotent. Existing rows and absence intervals come from
+    one query each. Long absences extend or open an interval (ausencias.record_day)
+    instead of adding a row per day. The stats follow each day's effective incident.
+    Returns the single-day rows by key (None for days kept in an interval).
+    """
+    latest = {(i.plaza_id, i.fecha_incidente): i for i in incidentes}
+    if not latest:
+        return {}
+    existing = {
+        (row.plaza_id, row.fecha_incidente): row
+        for row in db.query(models.Incidente).filter(
+            models.active(models.Incidente),
+            models.Incidente.plaza_id.in_({plaza for plaza, _ in latest}),
+            models.Incidente.fecha_incidente.in_({fecha for _, fecha in latest})
+        )
+    }
+    fechas = [fecha for _, fecha in latest]
+    intervals = ausencias.load(db, {plaza for plaza, _ in latest}, min(fechas), max(fechas))
+    saved = {}
+    # In date order, so a run of consecutive days grows a single interval.
+    for key in sorted(latest, key=lambda key: key[1]):
+        incidente, row = latest[key], existing.get(key)
+        plaza_intervals = intervals.setdefault(incidente.plaza_id, [])
+        interval = ausencias.covering(plaza_intervals, incidente.fecha_incidente)
+        before = row.tipo_incidencia if row else interval.tipo_incidencia if interval else None
+        if incidente.tipo_incidencia in ausencias.LONG_ABSENCE_TYPES and ausencias.record_day(db, plaza_intervals, incidente):
+            if row is not None:
+                row.deleted_at = func.now()
+            saved[key] = None
+        elif row is None:
+            saved[key] = models.Incidente(**incidente.dict())
+            db.add(saved[key])
+        else:
+            row.tipo_incidencia = incidente.tipo_incidencia
+            row.descripcion = incidente.descripcion
+            saved[key] = row
+        if before != incidente.tipo_incidencia:
+            if before is not None:
+                stats.apply_incidente(db, incidente.plaza_id, incidente.fecha_incidente, before, -1)
+            stats.apply_incidente(db, incidente.plaza_id, incidente.fecha_incidente, incidente.tipo_incidencia, 1)
+    return saved
 
 @app.post("/incidentes/", response_model=schemas.Incidente, status_code=201)
 def create_or_update_incidente(incidente: schemas.IncidenteCreate, db: Session = Depends(get_db)):
-    existing = db.query(models.Incidente).filter(
-        models.Incidente.plaza_id == incidente.plaza_id,
-        models.Incidente.fecha_incidente == incidente.fecha_incidente
-    ).first()
-    if existing:
-        existing.tipo_incidencia = incidente.tipo_incidencia
-        existing.descripcion = incidente.descripcion
-        db_obj = existing
-    else:
-        db_obj = models.Incidente(**incidente.dict())
-        db.add(db_obj)
+    db_obj = save_incidentes(db, [incidente])[(incidente.plaza_id, incidente.fecha_incidente)]
     db.commit()
+    if db_obj is None:
+        return schemas.Incidente(**incidente.dict())
     db.refresh(db_obj)
     return db_obj
 
+@app.post("/incidentes/bulk", response_model=schemas.BulkResult)
+def create_or_update_incidentes_bulk(incidentes: List[schemas.IncidenteCreate], db: Session = Depends(get_db)):
+    """
+    Guarda varias incidencias en una sola transacción (p. ej. el pase de lista de un turno),
+    con la misma semántica de POST /incidentes/.
+    """
+    saved = save_incidentes(db, incidentes)
+    db.commit()
+    return {"guardados": len(saved)}
+
+# --- Ausencia Endpoints (long absences as intervals) ---
+@app.get("/ausencias/", response_model=List[schemas.Ausencia])
+@diagnostics.query_budget(2)
+def read_ausencias(request: Request, response: Response, start_date: date, end_date: date, db: Session = Depends(get_db)):
+    """Intervalos de ausencia que se traslapan con el periodo."""
+    not_modified = check_not_modified(request, response, db, "ausencias")
+    if not_modified:
+        return not_modified
+    query = db.query(models.Ausencia).filter(models.active(models.Ausencia), ausencias.overlapping(start_date, end_date))
+    return rows_response(query, models.Ausencia, response)
+
+@app.post("/ausencias/", response_model=schemas.Ausencia, status_code=201)
+def create_ausencia(ausencia: schemas.AusenciaCreate, db: Session = Depends(get_db)):
+    if ausencia.end_date < ausencia.start_date:
+        raise HTTPException(status_code=400, detail="end_date no puede ser anterior a start_date")
+    clash = ausencias.clash(db, ausencia.plaza_id, ausencia.start_date, ausencia.end_date)
+    if clash is not None:
+        raise HTTPException(status_code=409, detail=f"La plaza ya tiene una ausencia en ese periodo (id {clash})")
+    db_obj = models.Ausencia(**ausencia.dict())
+    db.add(db_obj)
+    stats.apply_ausencia(db, db_obj, 1)
+    events.announce(db, "incidentes")
+    db.commit()
+    db.refresh(db_obj)
+    return db_obj
+
+@app.delete("/ausencias/{ausencia_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_ausencia(ausencia_id: int, db: Session = Depends(get_db)):
+    db_obj = db.query(models.Ausencia).filter(models.active(models.Ausencia), models.Ausencia.id == ausencia_id).first()
+    if db_obj is None:
+        raise HTTPException(status_code=404, detail="Ausencia no encontrada")
+    stats.apply_ausencia(db, db_obj, -1)
+    db_obj.deleted_at = func.now()
+    events.announce(db, "incidentes")
+    db.commit()
+    return
+
 # --- Sustitucion Endpoints ---
 @app.get("/sustituciones/range/", response_model=List[schemas.Sustitucion])
-def read_sustituciones_by_range(start_date: date, end_date: date, db: Session = Depends(get_db)):
-    return db.query(models.Sustitucion).filter(
-        models.Sustitucion.fecha >= start_date,
-        models.Sustitucion.fecha <= end_date
-    ).all()
+@diagnostics.query_budget(2)
+def read_sustituciones_by_range(request: Request, response: Response, start_date: date, end_date: date, format: ExportFormat = "json", db: Session = Depends(get_db)):
+    not_modified = check_not_modified(request, response, db, "sustituciones")
+    if not_modified:
+        return not_modified
+    query = reads.sustituciones_por_rango(db, start_date, end_date)
+    if format != "json":
+        return export.range_response(query, models.Sustitucion, format, response, f"sustituciones_{start_date}_{end_date}")
+    return rows_response(query, models.Sustitucion, response)
 
 @app.post("/sustituciones/", response_model=schemas.Sustitucion, status_code=201)
-def create_or_update_sustitucion(sustitucion: schemas.SustitucionCreate, db: Session = Depends(get_db)):
+def create_or_update_sustitucion(sustitucion: schemas.SustitucionCreate, forzar: bool = False, db: Session = Depends(get_db)):
     existing = db.query(models.Sustitucion).filter(
+        models.active(models.Sustitucion),
         models.Sustitucion.fecha == sustitucion.fecha,
         models.Sustitucion.plaza_ausente_id == sustitucion.plaza_ausente_id
     ).first()
+    previous = existing.plaza_suplente_id if existing else None
+    if previous != sustitucion.plaza_suplente_id:
+        bookings = conflicts.Bookings(db, [(sustitucion.plaza_suplente_id, sustitucion.fecha)])
+        raise_on_conflicts([bookings.book(sustitucion.plaza_suplente_id, sustitucion.fecha, sustituciones=1)], forzar)
+        stats.apply_ocupacion(db, previous, sustitucion.fecha, sustituciones=-1)
+        stats.apply_ocupacion(db, sustitucion.plaza_suplente_id, sustitucion.fecha, sustituciones=1)
     if existing:
         existing.plaza_suplente_id = sustitucion.plaza_suplente_id
         existing.motivo = sustitucion.motivo
@@ -82,49 +351,139 @@ def create_or_update_sustitucion(sustitucion: schemas.SustitucionCreate, db: Ses
 
 # --- Tiempo Extra Endpoints ---
 @app.get("/tiempo-extra/", response_model=List[schemas.TiempoExtra])
-def read_tiempo_extra_by_range(start_date: date, end_date: date, db: Session = Depends(get_db)):
-    return db.query(models.TiempoExtra).filter(
-        models.TiempoExtra.fecha >= start_date,
-        models.TiempoExtra.fecha <= end_date
-    ).all()
+@diagnostics.query_budget(2)
+def read_tiempo_extra_by_range(request: Request, response: Response, start_date: date, end_date: date, format: ExportFormat = "json", db: Session = Depends(get_db)):
+    not_modified = check_not_modified(request, response, db, "tiempo_extra")
+    if not_modified:
+        return not_modified
+    query = reads.tiempo_extra_por_rango(db, start_date, end_date)
+    if format != "json":
+        return export.range_response(query, models.TiempoExtra, format, response, f"tiempo_extra_{start_date}_{end_date}")
+    return rows_response(query, models.TiempoExtra, response)
+
+# Tables read by availability.Availability; their versions form the ETag of the
+# overtime candidates and plan.
+AVAILABILITY_TABLES = ("plazas", "coberturas_necesarias", "incidentes", "ausencias", "tiempo_extra", "sustituciones")
+
+def raise_on_conflicts(found, forzar: bool):
+    """409 listing the double bookings a write would create, unless it is forced (`forzar=true`)."""
+    found = [conflict for conflict in found if conflict is not None]
+    if found and not forzar:
+        raise HTTPException(status_code=409, detail={
+            "mensaje": "El registro crea conflictos de ocupación; envíe forzar=true para guardarlo de todos modos.",
+            "conflictos": jsonable_encoder(found),
+        })
+
+def save_tiempo_extra(db: Session, registros: List[schemas.TiempoExtraCreate], forzar: bool = False):
+    """
+    One overtime record per (plaza, fecha); repeated keys keep the last value.
+    Existing rows come from one query and the stats follow every change. New
+    records are checked against the bookings index first (409 unless `forzar`).
+    Returns the rows by key.
+    """
+    latest = {(r.plaza_id, r.fecha): r for r in registros}
+    existing = {
+        (row.plaza_id, row.fecha): row
+        for row in db.query(models.TiempoExtra).filter(
+            models.active(models.TiempoExtra),
+            models.TiempoExtra.plaza_id.in_({plaza for plaza, _ in latest}),
+            models.TiempoExtra.fecha.in_({fecha for _, fecha in latest})
+        )
+    }
+    new_keys = [key for key in latest if key not in existing]
+    bookings = conflicts.Bookings(db, new_keys)
+    raise_on_conflicts([bookings.book(plaza, fecha, tiempo_extra=1) for plaza, fecha in new_keys], forzar)
+    saved = {}
+    for key, tiempo_extra in latest.items():
+        row = existing.get(key)
+        if row is not None:
+            stats.apply_tiempo_extra(db, row.plaza_id, row.fecha, row.motivo_cobertura, -row.horas, -1)
+            row.horas = tiempo_extra.horas
+            row.motivo_cobertura = tiempo_extra.motivo_cobertura
+        else:
+            row = models.TiempoExtra(**tiempo_extra.dict())
+            db.add(row)
+            stats.apply_ocupacion(db, row.plaza_id, row.fecha, tiempo_extra=1)
+        stats.apply_tiempo_extra(db, tiempo_extra.plaza_id, tiempo_extra.fecha, tiempo_extra.motivo_cobertura, tiempo_extra.horas, 1)
+        saved[key] = row
+    return saved
 
 @app.post("/tiempo-extra/", response_model=schemas.TiempoExtra, status_code=201)
-def create_or_update_tiempo_extra(tiempo_extra: schemas.TiempoExtraCreate, db: Session = Depends(get_db)):
-    existing = db.query(models.TiempoExtra).filter(
-        models.TiempoExtra.plaza_id == tiempo_extra.plaza_id,
-        models.TiempoExtra.fecha == tiempo_extra.fecha
-    ).first()
-    if existing:
-        existing.horas = tiempo_extra.horas
-        existing.motivo_cobertura = tiempo_extra.motivo_cobertura
-        db_obj = existing
-    else:
-        db_obj = models.TiempoExtra(**tiempo_extra.dict())
-        db.add(db_obj)
+def create_or_update_tiempo_extra(tiempo_extra: schemas.TiempoExtraCreate, forzar: bool = False, db: Session = Depends(get_db)):
+    db_obj = save_tiempo_extra(db, [tiempo_extra], forzar)[(tiempo_extra.plaza_id, tiempo_extra.fecha)]
     db.commit()
     db.refresh(db_obj)
     return db_obj
 
+@app.post("/tiempo-extra/bulk", response_model=schemas.BulkResult)
+def create_or_update_tiempo_extra_bulk(registros: List[schemas.TiempoExtraCreate], forzar: bool = False, db: Session = Depends(get_db)):
+    """
+    Guarda varios registros de tiempo extra en una sola transacción (p. ej. el plan
+    de GET /tiempo-extra/plan), con la misma semántica de POST /tiempo-extra/.
+    """
+    saved = save_tiempo_extra(db, registros, forzar)
+    db.commit()
+    return {"guardados": len(saved)}
+
+@app.get("/tiempo-extra/plan", response_model=schemas.PlanTiempoExtra)
+@diagnostics.query_budget(len(AVAILABILITY_TABLES) + 2)
+def read_plan_tiempo_extra(request: Request, response: Response, start_date: date, end_date: date,
+                           horas: float = planner.HORAS_POR_DIA, max_horas: float = planner.MAX_HORAS,
+                           folio: str = "", db: Session = Depends(get_db)):
+    """
+    Propone el tiempo extra de todas las coberturas necesarias del periodo: cubre
+    el mayor número de días sin pasar de `max_horas` por trabajador (contando el
+    tiempo extra ya registrado) y reparte las horas lo más parejo posible.
+    """
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="end_date no puede ser anterior a start_date")
+    if horas <= 0:
+        raise HTTPException(status_code=400, detail="horas debe ser mayor que cero")
+    not_modified = check_not_modified(request, response, db, *AVAILABILITY_TABLES)
+    if not_modified:
+        return not_modified
+    payload = planner.plan(db, start_date, end_date, horas, max_horas, folio)
+    return ORJSONResponse(payload, headers=dict(response.headers))
+
 @app.delete("/tiempo-extra/{overtime_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_tiempo_extra(overtime_id: int, db: Session = Depends(get_db)):
-    db_obj = db.query(models.TiempoExtra).filter(models.TiempoExtra.id == overtime_id).first()
+    db_obj = db.query(models.TiempoExtra).filter(models.active(models.TiempoExtra), models.TiempoExtra.id == overtime_id).first()
     if db_obj is None:
         raise HTTPException(status_code=404, detail="Overtime record not found")
-    db.delete(db_obj)
+    stats.apply_tiempo_extra(db, db_obj.plaza_id, db_obj.fecha, db_obj.motivo_cobertura, -db_obj.horas, -1)
+    stats.apply_ocupacion(db, db_obj.plaza_id, db_obj.fecha, tiempo_extra=-1)
+    # Soft delete: the tombstone lets GET /changes report the deletion.
+    db_obj.deleted_at = func.now()
     db.commit()
     return
 
+# --- Conflict Endpoints ---
+@app.get("/conflictos", response_model=List[schemas.Conflicto])
+@diagnostics.query_budget(4)
+def read_conflictos(request: Request, response: Response, start: date, end: date, db: Session = Depends(get_db)):
+    """
+    Dobles reservas del periodo: trabajadores con tiempo extra o como suplentes en
+    un día en que tienen turno, están ausentes o ya tienen otra reserva.
+    """
+    not_modified = check_not_modified(request, response, db, *conflicts.TABLES)
+    if not_modified:
+        return not_modified
+    return ORJSONResponse(conflicts.in_range(db, start, end), headers=dict(response.headers))
+
 # --- Asignacion Endpoints ---
 @app.get("/asignaciones/", response_model=List[schemas.AsignacionServicio])
-def read_asignaciones(fecha: date, turno: str, db: Session = Depends(get_db)):
-    return db.query(models.AsignacionServicio).filter(
-        models.AsignacionServicio.fecha == fecha,
-        models.AsignacionServicio.turno == turno
-    ).all()
+@diagnostics.query_budget(2)
+def read_asignaciones(request: Request, response: Response, fecha: date, turno: str, db: Session = Depends(get_db)):
+    not_modified = check_not_modified(request, response, db, "asignaciones_servicio")
+    if not_modified:
+        return not_modified
+    query = reads.asignaciones(db, fecha, turno)
+    return rows_response(query, models.AsignacionServicio, response)
 
-@app.post("/asignaciones/", response_model=schemas.AsignacionServicio, status_code=201)
-def create_or_update_asignacion(asignacion: schemas.AsignacionServicioCreate, db: Session = Depends(get_db)):
+def upsert_asignacion(db: Session, asignacion: schemas.AsignacionServicioCreate):
+    """One assignment per (plaza, fecha, turno): updates the existing row or adds a new one."""
     existing = db.query(models.AsignacionServicio).filter(
+        models.active(models.AsignacionServicio),
         models.AsignacionServicio.plaza_id == asignacion.plaza_id,
         models.AsignacionServicio.fecha == asignacion.fecha,
         models.AsignacionServicio.turno == asignacion.turno
@@ -135,39 +494,91 @@ def create_or_update_asignacion(asignacion: schemas.AsignacionServicioCreate, db
     else:
         db_obj = models.AsignacionServicio(**asignacion.dict())
         db.add(db_obj)
+    return db_obj
+
+@app.post("/asignaciones/", response_model=schemas.AsignacionServicio, status_code=201)
+def create_or_update_asignacion(asignacion: schemas.AsignacionServicioCreate, db: Session = Depends(get_db)):
+    db_obj = upsert_asignacion(db, asignacion)
     db.commit()
     db.refresh(db_obj)
     return db_obj
 
+@app.post("/asignaciones/bulk", response_model=schemas.BulkResult)
+def create_or_update_asignaciones_bulk(asignaciones: List[schemas.AsignacionServicioCreate], db: Session = Depends(get_db)):
+    """
+    Guarda varias asignaciones en una sola transacción, con la misma semántica de
+    POST /asignaciones/; repeated (plaza, fecha, turno) keys keep the last value.
+    """
+    latest = {(a.plaza_id, a.fecha, a.turno): a for a in asignaciones}
+    existing = {
+        (row.plaza_id, row.fecha, row.turno): row
+        for row in db.query(models.AsignacionServicio).filter(
+            models.active(models.AsignacionServicio),
+            models.AsignacionServicio.plaza_id.in_({key[0] for key in latest}),
+            models.AsignacionServicio.fecha.in_({key[1] for key in latest}),
+            models.AsignacionServicio.turno.in_({key[2] for key in latest})
+        )
+    }
+    for key, asignacion in latest.items():
+        row = existing.get(key)
+        if row is None:
+            db.add(models.AsignacionServicio(**asignacion.dict()))
+        else:
+            row.area_servicio = asignacion.area_servicio
+    db.commit()
+    return {"guardados": len(latest)}
+
 # --- Coberturas Necesarias Endpoints ---
 @app.get("/coberturas-necesarias/", response_model=List[schemas.CoberturaNecesaria])
-def read_coberturas_necesarias(db: Session = Depends(get_db)):
-    return db.query(models.CoberturaNecesaria).all()
+@diagnostics.query_budget(2)
+def read_coberturas_necesarias(request: Request, db: Session = Depends(get_db)):
+    query = reads.coberturas_necesarias(db)
+    return cached_rows_response(request, db, "coberturas_necesarias", ("coberturas_necesarias",), query, models.CoberturaNecesaria)
 
 @app.post("/coberturas-necesarias/", response_model=schemas.CoberturaNecesaria, status_code=201)
 def create_cobertura_necesaria(cobertura: schemas.CoberturaNecesariaCreate, db: Session = Depends(get_db)):
     db_obj = models.CoberturaNecesaria(**cobertura.dict())
     db.add(db_obj)
     db.commit()
+    read_cache.cache.invalidate("coberturas_necesarias")
     db.refresh(db_obj)
     return db_obj
 
 @app.delete("/coberturas-necesarias/{cobertura_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_cobertura_necesaria(cobertura_id: int, db: Session = Depends(get_db)):
-    db_obj = db.query(models.CoberturaNecesaria).filter(models.CoberturaNecesaria.id == cobertura_id).first()
+    db_obj = db.query(models.CoberturaNecesaria).filter(models.active(models.CoberturaNecesaria), models.CoberturaNecesaria.id == cobertura_id).first()
     if db_obj is None:
         raise HTTPException(status_code=404, detail="Coverage need not found")
-    db.delete(db_obj)
+    db_obj.deleted_at = func.now()
     db.commit()
+    read_cache.cache.invalidate("coberturas_necesarias")
     return
 
+@app.get("/coberturas-necesarias/{cobertura_id}/candidatos", response_model=schemas.Candidatos)
+@diagnostics.query_budget(len(AVAILABILITY_TABLES) + 2)
+def read_candidatos(request: Request, response: Response, cobertura_id: int, limit: int = 5, db: Session = Depends(get_db)):
+    """
+    Para cada día aún sin cubrir de una cobertura necesaria, los trabajadores de
+    la misma categoría que pueden cubrirlo con tiempo extra (sin turno propio,
+    incidencia, tiempo extra ni sustitución ese día), los de menos horas primero.
+    """
+    not_modified = check_not_modified(request, response, db, *AVAILABILITY_TABLES)
+    if not_modified:
+        return not_modified
+    query = reads.coberturas_necesarias(db).filter(models.CoberturaNecesaria.id == cobertura_id)
+    need = next(iter(reads.rows(query, models.CoberturaNecesaria)), None)
+    if need is None:
+        raise HTTPException(status_code=404, detail="Coverage need not found")
+    window = availability.Availability(db, need["start_date"], need["end_date"])
+    return ORJSONResponse(window.candidates(need, limit), headers=dict(response.headers))
+
 @app.put("/plazas/{plaza_id}", response_model=schemas.PlazaUpdate)
 def update_plaza_by_id(plaza_id: str, plaza_data: schemas.PlazaUpdate, db: Session = Depends(get_db)):
     """
     Actualiza los datos de un trabajador buscando por su 'plaza' (ID).
     """
     # 1. Buscar el registro en la base de datos
-    db_plaza = db.query(models.Plaza).filter(models.Plaza.plaza == plaza_id).first()
+    db_plaza = db.query(models.Plaza).filter(models.active(models.Plaza), models.Plaza.plaza == plaza_id).first()
 
     # 2. Si no se encuentra, devolver un error 404
     if db_plaza is None:
@@ -182,6 +593,7 @@ def update_plaza_by_id(plaza_id: str, plaza_data: schemas.PlazaUpdate, db: Sessi
 
     # 4. Guardar los cambios en la base de datos
     db.commit()
+    read_cache.cache.invalidate("plazas")
     db.refresh(db_plaza)
 
     # 5. Devolver el registro actualizado
@@ -189,7 +601,7 @@ def update_plaza_by_id(plaza_id: str, plaza_data: schemas.PlazaUpdate, db: Sessi
 
 @app.post("/plazas/{plaza_id}/asignar-cobertura-temporal", response_model=schemas.Plaza)
 def asignar_cobertura(plaza_id: str, cobertura_data: schemas.CoberturaTemporalCreate, db: Session = Depends(get_db)):
-    db_plaza = db.query(models.Plaza).filter(models.Plaza.plaza == plaza_id).first()
+    db_plaza = db.query(models.Plaza).filter(models.active(models.Plaza), models.Plaza.plaza == plaza_id).first()
     if db_plaza is None:
         raise HTTPException(status_code=404, detail="Plaza no encontrada")
 
@@ -206,12 +618,15 @@ def asignar_cobertura(plaza_id: str, cobertura_data: schemas.CoberturaTemporalCr
     db_plaza.nombre_actual = cobertura_data.nombre_trabajador_eventual
     
     db.commit()
+    read_cache.cache.invalidate("plazas", "coberturas_temporales")
     db.refresh(db_plaza)
     return db_plaza
 
 @app.get("/coberturas-temporales/", response_model=List[schemas.CoberturaTemporal])
-def leer_coberturas_activas(db: Session = Depends(get_db)):
-    return db.query(models.CoberturaTemporal).all()
+@diagnostics.query_budget(2)
+def leer_coberturas_activas(request: Request, db: Session = Depends(get_db)):
+    query = reads.coberturas_temporales(db)
+    return cached_rows_response(request, db, "coberturas_temporales", ("coberturas_temporales",), query, models.CoberturaTemporal)
 
 @app.post("/coberturas-temporales/{cobertura_id}/finalizar", response_model=schemas.Plaza)
 def finalizar_cobertura(cobertura_id: int, db: Session = Depends(get_db)):
@@ -219,11 +634,12 @@ def finalizar_cobertura(cobertura_id: int, db: Session = Depends(get_db)):
     if cobertura is None:
         raise HTTPException(status_code=404, detail="Cobertura no encontrada")
 
-    db_plaza = db.query(models.Plaza).filter(models.Plaza.plaza == cobertura.plaza_id).first()
+    db_plaza = db.query(models.Plaza).filter(models.active(models.Plaza), models.Plaza.plaza == cobertura.plaza_id).first()
     if db_plaza is None:
         # Esto no debería pasar, pero es una buena práctica de seguridad
         db.delete(cobertura)
         db.commit()
+        read_cache.cache.invalidate("coberturas_temporales")
         raise HTTPException(status_code=404, detail="La plaza original ya no existe, se eliminó la cobertura.")
 
     # 1. Restaurar el nombre original en la tabla 'plazas'
@@ -233,5 +649,35 @@ def finalizar_cobertura(cobertura_id: int, db: Session = Depends(get_db)):
     db.delete(cobertura)
     
     db.commit()
+    read_cache.cache.invalidate("plazas", "coberturas_temporales")
     db.refresh(db_plaza)
-    return db_plaza
\ No newline at end of file
+    return db_plaza
+
+# --- Stats Endpoints (pre-aggregated summaries) ---
+@app.get("/stats/tiempo-extra/", response_model=List[schemas.ResumenTiempoExtra])
+def read_stats_tiempo_extra(start_date: date, end_date: date, plaza_id: Optional[str] = None, db: Session = Depends(get_db)):
+    query = db.query(models.ResumenTiempoExtra).filter(
+        models.ResumenTiempoExtra.quincena_inicio >= stats.quincena_start(start_date),
+        models.ResumenTiempoExtra.quincena_inicio <= end_date
+    )
+    if plaza_id:
+        query = query.filter(models.ResumenTiempoExtra.plaza_id == plaza_id)
+    return query.all()
+
+@app.get("/stats/incidentes/", response_model=List[schemas.ResumenIncidentes])
+def read_stats_incidentes(start_date: date, end_date: date, plaza_id: Optional[str] = None, tipo_incidencia: Optional[str] = None, db: Session = Depends(get_db)):
+    query = db.query(models.ResumenIncidentes).filter(
+        models.ResumenIncidentes.mes >= stats.month_start(start_date),
+        models.ResumenIncidentes.mes <= end_date
+    )
+    if plaza_id:
+        query = query.filter(models.ResumenIncidentes.plaza_id == plaza_id)
+    if tipo_incidencia:
+        query = query.filter(models.ResumenIncidentes.tipo_incidencia == tipo_incidencia)
+    return query.all()
+
+@app.post("/stats/recalcular", status_code=status.HTTP_204_NO_CONTENT)
+def rebuild_stats(db: Session = Depends(get_db)):
+    """Recalcula las tablas de resumen a partir de los registros originales."""
+    stats.rebuild_summaries(db)
+    return
@@ -0,0 +1,182 @@
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+_lock = threading.Lock()
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus exposition format, keyed by label values."""
+    def __init__(self, name, help_text, label_names, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = defaultdict(lambda: [[0] * (len(buckets) + 1), 0.0, 0])
+
+    def observe(self, value, *labels):
+        with _lock:
+            counts, _, _ = series = self._series[labels]
+            counts[bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with _lock:
+            items = [(labels, list(counts), total, count) for labels, (counts, total, count) in self._series.items()]
+        for labels, counts, total, count in sorted(items):
+            label_str = ",".join(f'{name}="{value}"' for name, value in zip(self.label_names, labels))
+            sep = "," if label_str else ""
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{label_str}{sep}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{label_str}{sep}le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{label_str}}} {total}")
+            lines.append(f"{self.name}_count{{{label_str}}} {count}")
+        return lines
+
+class Gauge:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self.value = 0
+
+    def add(self, amount):
+        with _lock:
+            self.value += amount
+
+    def render(self):
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge", f"{self.name} {self.value}"]
+
+
+REQUEST_LATENCY = Histogram("sgo_http_request_duration_seconds", "Total request latency.", ("method", "route", "status"))
+QUEUE_LATENCY = Histogram("sgo_http_queue_duration_seconds", "Time from request arrival until the handler's DB session is opened (threadpool wait).", ("route",))
+DB_TIME = Histogram("sgo_db_time_per_request_seconds", "Time spent executing SQL per request.", ("route",))
+DB_QUERIES = Histogram("sgo_db_queries_per_request", "Number of SQL statements per request.", ("route",), buckets=COUNT_BUCKETS)
+DB_CONNECT = Histogram("sgo_db_connect_duration_seconds", "Time to open a new DB connection (Cloud SQL connector handshake).", ())
+IN_FLIGHT = Gauge("sgo_http_requests_in_flight", "Requests currently being processed.")
+
+# Scrapes and long-lived streams would only skew the latency histograms.
+UNTIMED_ROUTES = ("/metrics", "/events")
+
+ALL_METRICS = [REQUEST_LATENCY, QUEUE_LATENCY, DB_TIME, DB_QUERIES, DB_CONNECT, IN_FLIGHT]
+
+
+class RequestStats:
+    __slots__ = ("start", "handler_start", "db_time", "db_queries", "connect_time")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.handler_start = None
+        self.db_time = 0.0
+        self.db_queries = 0
+        self.connect_time = 0.0
+
+# Mutable per-request stats; anyio copies the context into the threadpool, so the
+# SQLAlchemy hooks running in worker threads update the same object.
+_current = contextvars.ContextVar("sgo_request_stats", default=None)
+
+def current_stats():
+    return _current.get()
+
+def mark_handler_start():
+    """Called when the handler's DB session is opened; the gap since arrival is queueing."""
+    stats = _current.get()
+    if stats is not None and stats.handler_start is None:
+        stats.handler_start = time.perf_counter()
+
+
+def instrument_engine(engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("sgo_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["sgo_query_start"].pop()
+        stats = _current.get()
+        if stats is not None:
+            stats.db_time += elapsed
+            stats.db_queries += 1
+
+    @event.listens_for(engine, "do_connect")
+    def _do_connect(dialect, connection_record, cargs, cparams):
+        connection_record.info["sgo_connect_start"] = time.perf_counter()
+
+    @event.listens_for(engine, "connect")
+    def _connect(dbapi_connection, connection_record):
+        start = connection_record.info.pop("sgo_connect_start", None)
+        if start is None:
+            return
+        elapsed = time.perf_counter() - start
+        DB_CONNECT.observe(elapsed)
+        stats = _current.get()
+        if stats is not None:
+            stats.connect_time += elapsed
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware that records per-route latency, DB time and in-flight
+    requests, and adds a Server-Timing header to every HTTP response.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing(stats).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        IN_FLIGHT.add(1)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            IN_FLIGHT.add(-1)
+            _current.reset(token)
+            route = scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            if route_path not in UNTIMED_ROUTES:
+                REQUEST_LATENCY.observe(time.perf_counter() - stats.start, scope["method"], route_path, str(status_code))
+                DB_TIME.observe(stats.db_time, route_path)
+                DB_QUERIES.observe(stats.db_queries, route_path)
+                if stats.handler_start is not None:
+                    QUEUE_LATENCY.observe(stats.handler_start - stats.start, route_path)
+
+def server_timing(stats):
+    total = (time.perf_counter() - stats.start) * 1000
+    parts = [f"total;dur={total:.1f}"]
+    if stats.handler_start is not None:
+        parts.append(f"queue;dur={(stats.handler_start - stats.start) * 1000:.1f}")
+    if stats.connect_time:
+        parts.append(f"connect;dur={stats.connect_time * 1000:.1f}")
+    parts.append(f'db;dur={stats.db_time * 1000:.1f};desc="{stats.db_queries} queries"')
+    return ", ".join(parts)
+
+def render_metrics():
+    lines = []
+    for metric in ALL_METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,30 @@
+from sqlalchemy import text
+from sqlalchemy.schema import CreateIndex
+
+import models
+
+# create_all() only creates missing tables; columns and indexes added to existing
+# tables are applied here. Every statement must be idempotent: they run on each startup.
+def _tracking_statements():
+    for model in (models.Plaza, models.Incidente, models.Sustitucion, models.TiempoExtra,
+                  models.AsignacionServicio, models.CoberturaNecesaria):
+        table = model.__tablename__
+        yield f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now()"
+        yield f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMPTZ"
+        yield f"CREATE INDEX IF NOT EXISTS ix_{table}_updated_at ON {table} (updated_at)"
+
+def _date_index_statements():
+    for model in (models.Incidente, models.Sustitucion, models.TiempoExtra, models.AsignacionServicio):
+        for index in model.__table__.indexes:
+            if index.name == f"ix_{model.__tablename__}_fecha":
+                yield CreateIndex(index, if_not_exists=True)
+
+SCHEMA_UPDATES = [
+    *_tracking_statements(),
+    *_date_index_statements(),
+]
+
+def apply(engine):
+    with engine.begin() as conn:
+        for statement in SCHEMA_UPDATES:
+            conn.execute(text(statement) if isinstance(statement, str) else statement)
@@ -1,9 +1,32 @@
-from sqlalchemy import Column, String, Date, Integer, Float, ForeignKey
+from sqlalchemy import Column, String, Date, DateTime, Integer, Float, ForeignKey, Index, func, text
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
 
-class Plaza(Base):
+class ChangeTracking:
+    """
+    Columns for delta sync (GET /changes) and soft deletes. `updated_at` is set by
+    the database on every insert/update; a deleted row keeps existing with
+    `deleted_at` set (a tombstone) so clients can learn about the deletion.
+    """
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now(), index=True)
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
+
+TRACKING_COLUMNS = ("updated_at", "deleted_at")
+
+def public_columns(model):
+    """Table columns exposed by the API (the change-tracking ones are internal)."""
+    return [column for column in model.__table__.columns if column.name not in TRACKING_COLUMNS]
+
+def active(model):
+    """Filter criterion excluding soft-deleted rows."""
+    return model.deleted_at.is_(None)
+
+def date_index(table, *columns):
+    """Index for the per-date reads, covering only live rows (see migrations.py for existing tables)."""
+    return Index(f"ix_{table}_fecha", *columns, postgresql_where=text("deleted_at IS NULL"))
+
+class Plaza(ChangeTracking, Base):
     __tablename__ = 'plazas'
     plaza = Column(String, primary_key=True, index=True)
     categoria = Column(String)
@@ -12,8 +35,9 @@ class Plaza(Base):
     matricula_actual = Column(String, nullable=True)
     nombre_actual = Column(String, nullable=True)
 
-class Incidente(Base):
+class Incidente(ChangeTracking, Base):
     __tablename__ = 'incidentes'
+    __table_args__ = (date_index('incidentes', 'fecha_incidente', 'plaza_id'),)
     incidente_id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     plaza_id = Column(String, ForeignKey('plazas.plaza'))
     fecha_incidente = Column(Date, nullable=False)
@@ -21,32 +45,50 @@ class Incidente(Base):
     descripcion = Column(String, nullable=True)
     registrado_por = Column(String, nullable=True)
 
-class Sustitucion(Base):
+class Sustitucion(ChangeTracking, Base):
     __tablename__ = 'sustituciones'
+    __table_args__ = (date_index('sustituciones', 'fecha', 'plaza_ausente_id'),)
     sustitucion_id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     fecha = Column(Date, nullable=False)
     plaza_ausente_id = Column(String, ForeignKey('plazas.plaza'))
     plaza_suplente_id = Column(String, ForeignKey('plazas.plaza'))
     motivo = Column(String, nullable=True)
 
-class TiempoExtra(Base):
+class TiempoExtra(ChangeTracking, Base):
     __tablename__ = 'tiempo_extra'
+    __table_args__ = (date_index('tiempo_extra', 'fecha', 'plaza_id'),)
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     plaza_id = Column(String, ForeignKey('plazas.plaza'))
     fecha = Column(Date, nullable=False)
     horas = Column(Float, nullable=False)
     motivo_cobertura = Column(String, nullable=False)
 
-class AsignacionServicio(Base):
+class AsignacionServicio(ChangeTracking, Base):
     __tablename__ = 'asignaciones_servicio'
+    __table_args__ = (date_index('asignaciones_servicio', 'fecha', 'turno', 'plaza_id'),)
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     plaza_id = Column(String, ForeignKey('plazas.plaza'))
     fecha = Column(Date, nullable=False)
     turno = Column(String, nullable=False)
     area_servicio = Column(String, nullable=False)
 
+# Long absences (see ausencias.py): one row per interval instead of one incident per day
+class Ausencia(ChangeTracking, Base):
+    __tablename__ = 'ausencias'
+    __table_args__ = (
+        Index('ix_ausencias_periodo', text("daterange(start_date, end_date, '[]')"),
+              postgresql_using='gist', postgresql_where=text("deleted_at IS NULL")),
+    )
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    plaza_id = Column(String, ForeignKey('plazas.plaza'))
+    tipo_incidencia = Column(String, nullable=False)
+    start_date = Column(Date, nullable=False)
+    end_date = Column(Date, nullable=False)
+    descripcion = Column(String, nullable=True)
+    registrado_por = Column(String, nullable=True)
+
 # NEW MODEL FOR PLANNED COVERAGE NEEDS
-class CoberturaNecesaria(Base):
+class CoberturaNecesaria(ChangeTracking, Base):
     __tablename__ = 'coberturas_necesarias'
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     plaza_id_ausente = Column(String, ForeignKey('plazas.plaza'))
@@ -60,3 +102,44 @@ class CoberturaTemporal(Base):
     nombre_trabajador_original = Column(String)
     fecha_inicio = Column(Date, nullable=False)
     fecha_fin = Column(Date, nullable=False)
+
+
+# --- Pre-aggregated summaries, kept up to date by the write handlers (see stats.py) ---
+class ResumenTiempoExtra(Base):
+    __tablename__ = 'resumen_tiempo_extra'
+    plaza_id = Column(String, ForeignKey('plazas.plaza'), primary_key=True)
+    quincena_inicio = Column(Date, primary_key=True)
+    motivo_cobertura = Column(String, primary_key=True)
+    total_horas = Column(Float, nullable=False, default=0)
+    num_registros = Column(Integer, nullable=False, default=0)
+
+class ResumenIncidentes(Base):
+    __tablename__ = 'resumen_incidentes'
+    plaza_id = Column(String, ForeignKey('plazas.plaza'), primary_key=True)
+    mes = Column(Date, primary_key=True)
+    tipo_incidencia = Column(String, primary_key=True)
+    total = Column(Integer, nullable=False, default=0)
+
+# Bookings per worker and day (overtime records and days as substitute), kept in sync by
+# the write handlers; conflicts.py validates writes and lists double bookings from it.
+class Ocupacion(Base):
+    __tablename__ = 'ocupacion'
+    __table_args__ = (Index('ix_ocupacion_fecha', 'fecha'),)
+    plaza_id = Column(String, ForeignKey('plazas.plaza'), primary_key=True)
+    fecha = Column(Date, primary_key=True)
+    tiempo_extra = Column(Integer, nullable=False, default=0)
+    sustituciones = Column(Integer, nullable=False, default=0)
+
+# Per-table version counters, bumped on every flush that touches the table (see versioning.py)
+class VersionTabla(Base):
+    __tablename__ = 'versiones_tablas'
+    tabla = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+# Quincenas whose rows archiver.py moved to Parquet and deleted from the table;
+# stats.rebuild_summaries keeps the summaries of these periods instead of recomputing them.
+class QuincenaPurgada(Base):
+    __tablename__ = 'quincenas_purgadas'
+    tabla = Column(String, primary_key=True)
+    inicio = Column(Date, primary_key=True)
+    fin = Column(Date, nullable=False)
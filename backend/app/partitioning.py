@@ -0,0 +1,145 @@
+import json
+import logging
+import sys
+from datetime import date
+
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex
+
+import models, reads
+
+logger = logging.getLogger(__name__)
+
+# Las tablas históricas se particionan por año (PARTITION BY RANGE sobre su fecha):
+# las lecturas por fecha o rango sólo tocan las particiones de esos años y un año
+# cerrado se puede archivar o eliminar como una sola tabla.
+# table -> (model, partition key)
+PARTITIONED = {
+    "incidentes": (models.Incidente, "fecha_incidente"),
+    "sustituciones": (models.Sustitucion, "fecha"),
+    "tiempo_extra": (models.TiempoExtra, "fecha"),
+    "asignaciones_servicio": (models.AsignacionServicio, "fecha"),
+}
+# Partitions are kept ready up to this many years past the current one.
+YEARS_AHEAD = 1
+
+
+def is_partitioned(conn, table):
+    return conn.execute(
+        text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table)"), {"table": table}
+    ).first() is not None
+
+def _partition_statement(table, year):
+    return (f"CREATE TABLE IF NOT EXISTS {table}_{year} PARTITION OF {table} "
+            f"FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')")
+
+def ensure_partitions(engine, today=None):
+    """
+    Creates the yearly partitions from the current year to YEARS_AHEAD on the
+    tables already converted. Idempotent; it runs on every startup. A year whose
+    rows already fell into the default partition is skipped with a warning.
+    """
+    year = (today or date.today()).year
+    with engine.begin() as conn:
+        for table in PARTITIONED:
+            if not is_partitioned(conn, table):
+                continue
+            for partition_year in range(year, year + YEARS_AHEAD + 1):
+                try:
+                    with conn.begin_nested():
+                        conn.execute(text(_partition_statement(table, partition_year)))
+                except Exception as e:
+                    logger.warning("No se pudo crear la partición %s_%s: %s", table, partition_year, e)
+
+
+def convert(engine, today=None):
+    """
+    One-off conversion of the unpartitioned tables: each one is renamed, recreated
+    as a partitioned table with the same columns, one partition per year of data
+    (plus a default one for stray dates), refilled and dropped, in one transaction
+    per table. The primary key becomes (id, fecha), as Postgres requires the
+    partition key in it; the ORM keeps identifying rows by id.
+    """
+    current_year = (today or date.today()).year
+    for table, (model, column) in PARTITIONED.items():
+        pk = model.__mapper__.primary_key[0].name
+        legacy = f"{table}_sin_particionar"
+        with engine.begin() as conn:
+            if is_partitioned(conn, table):
+                continue
+            sequence = conn.execute(text("SELECT pg_get_serial_sequence(:table, :pk)"), {"table": table, "pk": pk}).scalar()
+            first_year = conn.execute(text(f"SELECT EXTRACT(YEAR FROM min({column}))::int FROM {table}")).scalar() or current_year
+            conn.execute(text(f"ALTER TABLE {table} RENAME TO {legacy}"))
+            conn.execute(text(f"CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS) PARTITION BY RANGE ({column})"))
+            conn.execute(text(f"ALTER TABLE {table} ADD PRIMARY KEY ({pk}, {column})"))
+            for fk in model.__table__.foreign_keys:
+                conn.execute(text(
+                    f"ALTER TABLE {table} ADD FOREIGN KEY ({fk.parent.name}) "
+                    f"REFERENCES {fk.column.table.name} ({fk.column.name})"
+                ))
+            if sequence:
+                conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {table}.{pk}"))
+            for year in range(min(first_year, current_year), current_year + YEARS_AHEAD + 1):
+                conn.execute(text(_partition_statement(table, year)))
+            conn.execute(text(f"CREATE TABLE {table}_otros PARTITION OF {table} DEFAULT"))
+            conn.execute(text(f"INSERT INTO {table} SELECT * FROM {legacy}"))
+            conn.execute(text(f"DROP TABLE {legacy}"))
+            # The legacy indexes went with it; created on the parent they cascade to every partition.
+            for index in model.__table__.indexes:
+                conn.execute(CreateIndex(index, if_not_exists=True))
+        logger.info("Tabla %s particionada por año de %s", table, column)
+
+
+# --- Pruning check for the range endpoints ---
+RANGE_READS = {
+    "incidentes": reads.incidentes_por_rango,
+    "sustituciones": reads.sustituciones_por_rango,
+    "tiempo_extra": reads.tiempo_extra_por_rango,
+}
+
+def _scanned_relations(plan):
+    relations = {plan["Relation Name"]} if "Relation Name" in plan else set()
+    for child in plan.get("Plans", ()):
+        relations |= _scanned_relations(child)
+    return relations
+
+def verify_pruning(db, start_date: date, end_date: date):
+    """
+    EXPLAINs the query of each range endpoint and returns, per table, the
+    partitions outside [start_date, end_date] that the plan still scans
+    (empty lists when pruning works).
+    """
+    expected_years = range(start_date.year, end_date.year + 1)
+    unexpected = {}
+    for table, builder in RANGE_READS.items():
+        model = PARTITIONED[table][0]
+        query = builder(db, start_date, end_date)
+        statement = query.with_entities(*reads.public_columns(query, model)).statement
+        sql = str(statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+        plan = db.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        scanned = _scanned_relations(plan[0]["Plan"])
+        unexpected[table] = sorted(
+            name for name in scanned
+            if name.startswith(f"{table}_") and name not in {f"{table}_{year}" for year in expected_years}
+        )
+    return unexpected
+
+
+if __name__ == "__main__":
+    from database import SessionLocal, engine
+
+    if "--verificar" in sys.argv:
+        today = date.today()
+        session = SessionLocal()
+        try:
+            for table, partitions in verify_pruning(session, today.replace(day=1), today).items():
+                print(f"{'✅' if not partitions else '❌'} {table}: {', '.join(partitions) or 'sólo las particiones del periodo'}")
+        finally:
+            session.close()
+    else:
+        print("Converting history tables to yearly partitions...")
+        convert(engine)
+        print("✅ Tables partitioned.")
@@ -0,0 +1,170 @@
+import heapq
+import os
+from collections import defaultdict
+from datetime import date
+
+from sqlalchemy.orm import Session
+
+import availability, models, reads
+
+# Propuesta de tiempo extra para todas las coberturas necesarias de un periodo
+# (p. ej. una quincena), resuelta como flujo de costo mínimo: cubre tantos días
+# como se pueda y, entre esas soluciones, reparte las horas lo más parejo posible.
+
+# Defaults of GET /tiempo-extra/plan
+HORAS_POR_DIA = float(os.environ.get("SGO_PLAN_HORAS_POR_DIA", "8"))
+# Overtime hours per worker in the period, counting the ones already registered.
+MAX_HORAS = float(os.environ.get("SGO_PLAN_MAX_HORAS", "48"))
+
+
+class _Flow:
+    """Min-cost flow by successive shortest paths (Dijkstra with potentials)."""
+
+    def __init__(self, size):
+        self.graph = [[] for _ in range(size)]
+
+    def add_edge(self, u, v, capacity, cost):
+        # edge: [to, residual capacity, cost, index of the reverse edge]
+        self.graph[u].append([v, capacity, cost, len(self.graph[v])])
+        self.graph[v].append([u, 0, -cost, len(self.graph[u]) - 1])
+        return self.graph[u][-1]
+
+    def run(self, source, sink):
+        size = len(self.graph)
+        potential = [0.0] * size
+        while True:
+            dist = [None] * size
+            previous = [None] * size
+            dist[source] = 0.0
+            heap = [(0.0, source)]
+            while heap:
+                d, u = heapq.heappop(heap)
+                if d > dist[u]:
+                    continue
+                for i, (v, capacity, cost, _) in enumerate(self.graph[u]):
+                    if capacity <= 0:
+                        continue
+                    # Clamped: float rounding can make a reduced cost slightly negative.
+                    nd = d + max(cost + potential[u] - potential[v], 0.0)
+                    if dist[v] is None or nd < dist[v] - 1e-9:
+                        dist[v] = nd
+                        previous[v] = (u, i)
+                        heapq.heappush(heap, (nd, v))
+            if dist[sink] is None:
+                return
+            for node in range(size):
+                if dist[node] is not None:
+                    potential[node] += dist[node]
+            # Every path goes through a unit-capacity edge, so each one carries one unit.
+            v = sink
+            while v != source:
+                u, i = previous[v]
+                edge = self.graph[u][i]
+                edge[1] -= 1
+                self.graph[v][edge[3]][1] += 1
+                v = u
+
+
+def _solve_category(window, slots_by_day, workers, horas, max_horas):
+    """
+    Assigns the slots of one category: day node -> worker (free that day, at most
+    one slot per day) -> sink through one unit edge per extra slot, priced at the
+    growth of the worker's squared hours, so the cheapest plan evens them out.
+    Returns {day index: [plaza, ...]}.
+    """
+    days = sorted(slots_by_day)
+    source, sink = 0, 1
+    day_node = {index: 2 + n for n, index in enumerate(days)}
+    worker_node = {plaza: 2 + len(days) + n for n, plaza in enumerate(workers)}
+    flow = _Flow(2 + len(days) + len(workers))
+
+    for index in days:
+        flow.add_edge(source, day_node[index], len(slots_by_day[index]), 0.0)
+    picks = []
+    for plaza in workers:
+        free = ~window.busy(plaza)
+        for index in days:
+            if free >> index & 1:
+                picks.append((index, plaza, flow.add_edge(day_node[index], worker_node[plaza], 1, 0.0)))
+        current = window.hours[plaza]
+        for _ in range(int((max_horas - current) // horas)):
+            flow.add_edge(worker_node[plaza], sink, 1, (current + horas) ** 2 - current ** 2)
+            current += horas
+
+    flow.run(source, sink)
+    assigned = defaultdict(list)
+    for index, plaza, edge in picks:
+        if edge[1] == 0:
+            assigned[index].append(plaza)
+    return assigned
+
+
+def plan(db: Session, start_date: date, end_date: date, horas: float = HORAS_POR_DIA,
+         max_horas: float = MAX_HORAS, folio: str = ""):
+    """
+    Proposed overtime for every uncovered day of the coverage needs intersecting
+    [start_date, end_date]: the registered overtime counts towards each worker's
+    hours and cap, and the absent workers are left out. `asignaciones` can be sent
+    as is to POST /tiempo-extra/bulk.
+    """
+    window = availability.Availability(db, start_date, end_date)
+    needs = reads.rows(
+        reads.coberturas_necesarias(db).filter(
+            models.CoberturaNecesaria.start_date <= end_date,
+            models.CoberturaNecesaria.end_date >= start_date
+        ),
+        models.CoberturaNecesaria,
+    )
+    # The workers being covered are off on their need days.
+    for need in needs:
+        window.absent[need["plaza_id_ausente"]] |= window.period(need["start_date"], need["end_date"])
+
+    # category -> day index -> needs open that day
+    slots = defaultdict(lambda: defaultdict(list))
+    for need in needs:
+        if need["plaza_id_ausente"] not in window.plazas:
+            continue
+        category = window.plazas[need["plaza_id_ausente"]]["categoria"]
+        for fecha in window.days(window.uncovered(need)):
+            slots[category][(fecha - start_date).days].append(need)
+
+    workers_by_category = defaultdict(list)
+    for plaza, row in window.plazas.items():
+        workers_by_category[row["categoria"]].append(plaza)
+
+    asignaciones, sin_cubrir = [], []
+    for category, slots_by_day in slots.items():
+        assigned = _solve_category(window, slots_by_day, workers_by_category.get(category, []), horas, max_horas)
+        previous = {}
+        for index in sorted(slots_by_day):
+            available = assigned.get(index, [])
+            fecha = window.day(index)
+            for need in slots_by_day[index]:
+                if not available:
+                    sin_cubrir.append({"cobertura_id": need["id"], "plaza_id_ausente": need["plaza_id_ausente"], "fecha": fecha})
+                    continue
+                # Whoever covered this need the day before keeps it, if the solver gave them this day too.
+                plaza = previous.get(need["id"]) if previous.get(need["id"]) in available else available[0]
+                available.remove(plaza)
+                previous[need["id"]] = plaza
+                window.hours[plaza] += horas
+                covered = window.plazas[need["plaza_id_ausente"]]
+                asignaciones.append({
+                    "plaza_id": plaza,
+                    "fecha": fecha,
+                    "horas": horas,
+                    "motivo_cobertura": availability.motivo(covered["nombre_actual"], covered["plaza"], folio),
+                    "cobertura_id": need["id"],
+                })
+
+    asignaciones.sort(key=lambda a: (a["fecha"], a["plaza_id"]))
+    sin_cubrir.sort(key=lambda s: (s["fecha"], s["plaza_id_ausente"]))
+    return {
+        "start_date": start_date,
+        "end_date": end_date,
+        "horas": horas,
+        "max_horas": max_horas,
+        "asignaciones": asignaciones,
+        "sin_cubrir": sin_cubrir,
+        "horas_por_plaza": {plaza: total for plaza, total in window.hours.items() if total},
+    }
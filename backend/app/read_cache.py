@@ -0,0 +1,105 @@
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+# Hot, slowly-changing reads (plazas, coberturas) are served from memory. Each
+# Cloud Run instance keeps its own copy: the write handlers of this instance
+# invalidate it immediately, the others pick up changes within the TTL.
+READ_CACHE_TTL = float(os.environ.get("READ_CACHE_TTL", "30"))
+READ_CACHE_MAX_ENTRIES = int(os.environ.get("READ_CACHE_MAX_ENTRIES", "128"))
+
+
+class CacheEntry:
+    __slots__ = ("tables", "etag", "body", "expires_at")
+
+    def __init__(self, tables, etag, body, expires_at):
+        self.tables = tables
+        self.etag = etag
+        self.body = body
+        self.expires_at = expires_at
+
+
+class ReadCache:
+    """
+    Bounded LRU of serialized responses with a TTL. Entries are tagged with the
+    tables they were read from; `invalidate(table)` drops them and bumps a
+    per-table generation so a load that raced with the write is not stored.
+    """
+    def __init__(self, max_entries=READ_CACHE_MAX_ENTRIES, ttl=READ_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._generations = defaultdict(int)
+        self._counts = defaultdict(lambda: {"hits": 0, "misses": 0})
+        self._lock = threading.Lock()
+
+    def get(self, name, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at < time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self._counts[name]["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counts[name]["hits"] += 1
+            return entry
+
+    def generation(self, tables):
+        with self._lock:
+            return tuple(self._generations[t] for t in tables)
+
+    def put(self, key, tables, generation, etag, body):
+        """Stores the entry unless one of `tables` was invalidated since `generation` was taken."""
+        entry = CacheEntry(tables, etag, body, time.monotonic() + self.ttl)
+        with self._lock:
+            if tuple(self._generations[t] for t in tables) != generation:
+                return entry
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, *tables):
+        with self._lock:
+            for table in tables:
+                self._generations[table] += 1
+            stale = [key for key, entry in self._entries.items() if set(entry.tables) & set(tables)]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def render(self):
+        """Hit/miss counters per cached endpoint, in the Prometheus exposition format."""
+        lines = [
+            "# HELP sgo_read_cache_requests_total Lookups in the in-process read cache.",
+            "# TYPE sgo_read_cache_requests_total counter",
+        ]
+        with self._lock:
+            counts = sorted((name, dict(c)) for name, c in self._counts.items())
+            size = len(self._entries)
+        for name, c in counts:
+            lines.append(f'sgo_read_cache_requests_total{{endpoint="{name}",result="hit"}} {c["hits"]}')
+            lines.append(f'sgo_read_cache_requests_total{{endpoint="{name}",result="miss"}} {c["misses"]}')
+        lines += [
+            "# HELP sgo_read_cache_entries Entries currently held in the read cache.",
+            "# TYPE sgo_read_cache_entries gauge",
+            f"sgo_read_cache_entries {size}",
+        ]
+        return lines
+
+    def hit_rates(self):
+        with self._lock:
+            return {
+                name: {**c, "hit_rate": round(c["hits"] / (c["hits"] + c["misses"]), 3) if c["hits"] + c["misses"] else None}
+                for name, c in self._counts.items()
+            }
+
+
+cache = ReadCache()
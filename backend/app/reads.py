@@ -0,0 +1,104 @@
+from datetime import date, datetime
+from typing import Optional
+
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+
+import ausencias, changes, models
+
+# Consultas de lectura compartidas por los endpoints GET y por POST /batch, que
+# ejecuta varias de ellas en una sola petición y una sola sesión.
+
+
+class PlazasParams(BaseModel):
+    skip: int = 0
+    limit: int = 100
+
+class FechaParams(BaseModel):
+    fecha: date
+
+class RangoParams(BaseModel):
+    start_date: date
+    end_date: date
+
+class AsignacionesParams(BaseModel):
+    fecha: date
+    turno: str
+
+class SinParams(BaseModel):
+    pass
+
+class ChangesParams(BaseModel):
+    since: Optional[datetime] = None
+    desde: Optional[date] = None
+    tables: Optional[str] = None
+
+
+def plazas(db: Session, skip: int = 0, limit: int = 100):
+    return db.query(models.Plaza).filter(models.active(models.Plaza)).offset(skip).limit(limit)
+
+def incidentes_por_fecha(db: Session, fecha: date):
+    return ausencias.incidencias(db, fecha, fecha)
+
+def incidentes_por_rango(db: Session, start_date: date, end_date: date):
+    return ausencias.incidencias(db, start_date, end_date)
+
+def sustituciones_por_rango(db: Session, start_date: date, end_date: date):
+    return db.query(models.Sustitucion).filter(
+        models.active(models.Sustitucion),
+        models.Sustitucion.fecha >= start_date,
+        models.Sustitucion.fecha <= end_date
+    )
+
+def tiempo_extra_por_rango(db: Session, start_date: date, end_date: date):
+    return db.query(models.TiempoExtra).filter(
+        models.active(models.TiempoExtra),
+        models.TiempoExtra.fecha >= start_date,
+        models.TiempoExtra.fecha <= end_date
+    )
+
+def asignaciones(db: Session, fecha: date, turno: str):
+    return db.query(models.AsignacionServicio).filter(
+        models.active(models.AsignacionServicio),
+        models.AsignacionServicio.fecha == fecha,
+        models.AsignacionServicio.turno == turno
+    )
+
+def coberturas_necesarias(db: Session):
+    return db.query(models.CoberturaNecesaria).filter(models.active(models.CoberturaNecesaria))
+
+def coberturas_temporales(db: Session):
+    return db.query(models.CoberturaTemporal)
+
+
+def public_columns(query, model):
+    """
+    The public columns of `model` as selected by `query`, whose entity may be
+    the model itself or an alias of it (e.g. the merged incidents of ausencias.py).
+    """
+    entity = query.column_descriptions[0]["entity"]
+    return [getattr(entity, column.name) for column in models.public_columns(model)]
+
+def rows(query, model):
+    """The public columns of `query` as plain dicts, as the list endpoints return them."""
+    return [row._asdict() for row in query.with_entities(*public_columns(query, model))]
+
+def _rows_of(builder, model):
+    return lambda db, **params: rows(builder(db, **params), model)
+
+def _changes(db: Session, since=None, desde=None, tables=None):
+    return changes.changes_since(db, since, desde, changes.parse_tables(tables))
+
+
+# GET path -> (parameter model, function(db, **params) returning the JSON payload)
+BATCHABLE = {
+    "/plazas/": (PlazasParams, _rows_of(plazas, models.Plaza)),
+    "/incidentes/": (FechaParams, _rows_of(incidentes_por_fecha, models.Incidente)),
+    "/incidentes/range/": (RangoParams, _rows_of(incidentes_por_rango, models.Incidente)),
+    "/sustituciones/range/": (RangoParams, _rows_of(sustituciones_por_rango, models.Sustitucion)),
+    "/tiempo-extra/": (RangoParams, _rows_of(tiempo_extra_por_rango, models.TiempoExtra)),
+    "/asignaciones/": (AsignacionesParams, _rows_of(asignaciones, models.AsignacionServicio)),
+    "/coberturas-necesarias/": (SinParams, _rows_of(coberturas_necesarias, models.CoberturaNecesaria)),
+    "/coberturas-temporales/": (SinParams, _rows_of(coberturas_temporales, models.CoberturaTemporal)),
+    "/changes": (ChangesParams, _changes),
+}
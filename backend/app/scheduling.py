@@ -0,0 +1,76 @@
+from functools import lru_cache
+
+# Reglas de rol de turnos, las mismas que usa el frontend (frontend/plaza_directory.py):
+# qué trabajadores están programados en cada día de la semana y turno.
+
+SHIFTS = ["Matutino", "Vespertino", "Nocturno"]
+
+# Mapa de días de descanso: Asocia el string de descanso con los números de día de la semana
+# Lunes=0, Martes=1, Miércoles=2, Jueves=3, Viernes=4, Sábado=5, Domingo=6
+REST_DAY_MAP = {
+    "L M": [0, 1], "M M": [1, 2], "M J": [2, 3],
+    "J V": [3, 4], "V S": [4, 5], "S D": [5, 6],
+    "D L": [6, 0]
+}
+# Mapa de descanso para turno nocturno
+NIGHT_SHIFT_PATTERN = {
+    'DOMINGO': [0, 2, 4], 'SABADO': [6, 1, 3], 'VIERNES': [5, 0, 2],
+    'JUEVES': [4, 6, 1], 'MIERCOLES': [3, 5, 0], 'MARTES': [2, 4, 6],
+    'LUNES': [1, 3, 5]
+}
+
+
+def is_rest_weekday(descanso, weekday):
+    """True if `weekday` is one of the worker's rest days (the dashboards' is_day_off rule)."""
+    descanso = str(descanso or "").upper().strip()
+    if descanso == "": return False
+    if "LAV" in descanso: return weekday in [0, 1, 2, 3, 4]
+    day_checks = {
+        0: ["L", "LUNES", "L M"], 1: ["M", "MARTES", "M M"], 2: ["X", "MIERCOLES", "M M"],
+        3: ["J", "JUEVES", "J V"], 4: ["V", "VIERNES", "V S"], 5: ["S", "SABADO", "V S", "S D"],
+        6: ["D", "DOMINGO", "D L", "S D"]
+    }
+    for check_str in day_checks.get(weekday, []):
+        if check_str in descanso: return True
+    return False
+
+def is_active_on(horario, descanso, selected_weekday, selected_shift):
+    """True if a worker with this horario/descanso is on the roster for the weekday and shift."""
+    horario = str(horario or "").upper()
+    descanso = str(descanso or "").upper().strip()
+
+    # Case 1: Jornada Acumulada (LAV descanso)
+    if "LAV" in descanso:
+        if selected_weekday == 5 and selected_shift in ["Matutino", "Vespertino"]:
+            return True
+        return selected_weekday == 6  # Sunday, active in all shifts
+
+    # Case 2: Turno Nocturno
+    if "A 08.10" in horario and selected_shift == "Nocturno":
+        return selected_weekday in NIGHT_SHIFT_PATTERN.get(descanso, [])
+
+    # Case 3: Turno Matutino/Vespertino
+    is_matutino = "7.00" in horario and selected_shift == "Matutino"
+    is_vespertino = "14.00" in horario and selected_shift == "Vespertino"
+    if is_matutino or is_vespertino:
+        return selected_weekday not in REST_DAY_MAP.get(descanso, [])
+    return False
+
+@lru_cache(maxsize=1024)
+def roster_mask(horario, descanso, shift):
+    """Weekday bitmask (bit 0 = Monday) of the days the worker is on the roster for `shift`."""
+    return sum(1 << wd for wd in range(7) if is_active_on(horario, descanso, wd, shift))
+
+@lru_cache(maxsize=256)
+def rest_mask(descanso):
+    """Weekday bitmask (bit 0 = Monday) of the worker's rest days."""
+    return sum(1 << wd for wd in range(7) if is_rest_weekday(descanso, wd))
+
+@lru_cache(maxsize=1024)
+def work_mask(horario, descanso):
+    """Weekday bitmask of the days the worker is on the roster in any shift."""
+    return roster_mask(horario, descanso, SHIFTS[0]) | roster_mask(horario, descanso, SHIFTS[1]) | roster_mask(horario, descanso, SHIFTS[2])
+
+def on_roster(plaza, day, shift):
+    """True if the plaza (a models.Plaza or row with horario/dias_descanso) works `shift` on `day`."""
+    return bool(roster_mask(plaza.horario, plaza.dias_descanso, shift) >> day.weekday() & 1)
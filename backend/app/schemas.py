@@ -1,6 +1,6 @@
 from pydantic import BaseModel
-from datetime import date
-from typing import Optional
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
 
 # --- Plaza Schemas ---
 class Plaza(BaseModel):
@@ -21,7 +21,21 @@ class IncidenteCreate(BaseModel):
     registrado_por: Optional[str] = None
 
 class Incidente(IncidenteCreate):
-    incidente_id: int
+    # None for the days of an absence interval (see Ausencia)
+    incidente_id: Optional[int] = None
+    class Config: from_attributes = True
+
+# --- Ausencia Schemas (long absences stored as intervals) ---
+class AusenciaCreate(BaseModel):
+    plaza_id: str
+    tipo_incidencia: str
+    start_date: date
+    end_date: date
+    descripcion: Optional[str] = None
+    registrado_por: Optional[str] = None
+
+class Ausencia(AusenciaCreate):
+    id: int
     class Config: from_attributes = True
 
 # --- Sustitucion Schemas ---
@@ -90,7 +104,110 @@ class CoberturaTemporal(CoberturaTemporalBase):
     class Config:
         from_attributes = True
 
+# --- Bulk write result ---
+class BulkResult(BaseModel):
+    guardados: int
+
+# --- Delta sync (GET /changes) ---
+class TableChanges(BaseModel):
+    key: str
+    upserts: List[Dict[str, Any]]
+    deletes: List[Any]
+
+class ChangeSet(BaseModel):
+    cursor: datetime
+    full: bool
+    tables: Dict[str, TableChanges]
+
+# --- Batched reads (POST /batch) ---
+class BatchQuery(BaseModel):
+    name: str
+    path: str
+    params: Dict[str, Any] = {}
+
+class BatchRequest(BaseModel):
+    queries: List[BatchQuery]
+
+class BatchResult(BaseModel):
+    results: Dict[str, Any]
+
+# --- Per-day snapshot (GET /day/{fecha}) ---
+class RosterEntry(BaseModel):
+    plaza: str
+    nombre_actual: Optional[str] = None
+    categoria: Optional[str] = None
+    tipo_incidencia: Optional[str] = None
+    area_servicio: Optional[str] = None
+    plaza_suplente_id: Optional[str] = None
+
+class DaySnapshot(BaseModel):
+    fecha: date
+    turnos: Dict[str, List[RosterEntry]]
+    incidentes: List[Incidente]
+    asignaciones: List[AsignacionServicio]
+    sustituciones: List[Sustitucion]
+    tiempo_extra: List[TiempoExtra]
+
+class Candidato(BaseModel):
+    plaza: str
+    nombre_actual: Optional[str] = None
+    horas_extra: float
+    dias_disponibles: int
+
+class DiaCandidatos(BaseModel):
+    fecha: date
+    candidatos: List[Candidato]
+
+class Candidatos(BaseModel):
+    cobertura_id: int
+    plaza_id_ausente: str
+    start_date: date
+    end_date: date
+    dias: List[DiaCandidatos]
+
+class TiempoExtraPropuesto(TiempoExtraCreate):
+    cobertura_id: int
+
+class DiaSinCubrir(BaseModel):
+    cobertura_id: int
+    plaza_id_ausente: str
+    fecha: date
+
+class PlanTiempoExtra(BaseModel):
+    start_date: date
+    end_date: date
+    horas: float
+    max_horas: float
+    asignaciones: List[TiempoExtraPropuesto]
+    sin_cubrir: List[DiaSinCubrir]
+    horas_por_plaza: Dict[str, float]
+
+class Conflicto(BaseModel):
+    plaza_id: str
+    fecha: date
+    motivos: List[str]
+    tiempo_extra: int
+    sustituciones: int
+    turno_programado: bool
+    tipo_incidencia: Optional[str] = None
+
 class CoberturaTemporalCreate(BaseModel):
     nombre_trabajador_eventual: str
     fecha_inicio: date
-    fecha_fin: date
\ No newline at end of file
+    fecha_fin: date
+
+# --- Summary (stats) Schemas ---
+class ResumenTiempoExtra(BaseModel):
+    plaza_id: str
+    quincena_inicio: date
+    motivo_cobertura: str
+    total_horas: float
+    num_registros: int
+    class Config: from_attributes = True
+
+class ResumenIncidentes(BaseModel):
+    plaza_id: str
+    mes: date
+    tipo_incidencia: str
+    total: int
+    class Config: from_attributes = True
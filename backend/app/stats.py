@@ -0,0 +1,247 @@
+from collections import Counter
+from datetime import date, timedelta
+from sqlalchemy import Date, cast, func, literal, literal_column, select, text, union_all
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+import ausencias, models, versioning
+
+
+def quincena_start(fecha: date) -> date:
+    """First day of the quincena that contains `fecha` (the 1st or the 16th)."""
+    return fecha.replace(day=1 if fecha.day <= 15 else 16)
+
+def month_start(fecha: date) -> date:
+    return fecha.replace(day=1)
+
+
+# --- Incremental updates (called by the write handlers before commit) ---
+def apply_tiempo_extra(db: Session, plaza_id: str, fecha: date, motivo_cobertura: str, horas: float, registros: int):
+    """
+    Adds `horas` and `registros` (negative to subtract) to the summary row of the
+    plaza/quincena/motivo. The upsert is atomic, so concurrent writes don't lose updates.
+    """
+    table = models.ResumenTiempoExtra.__table__
+    stmt = insert(table).values(
+        plaza_id=plaza_id,
+        quincena_inicio=quincena_start(fecha),
+        motivo_cobertura=motivo_cobertura,
+        total_horas=horas,
+        num_registros=registros,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.plaza_id, table.c.quincena_inicio, table.c.motivo_cobertura],
+        set_={
+            "total_horas": table.c.total_horas + stmt.excluded.total_horas,
+            "num_registros": table.c.num_registros + stmt.excluded.num_registros,
+        },
+    )
+    db.execute(stmt)
+    if registros < 0:
+        db.execute(table.delete().where(
+            table.c.plaza_id == plaza_id,
+            table.c.quincena_inicio == quincena_start(fecha),
+            table.c.motivo_cobertura == motivo_cobertura,
+            table.c.num_registros <= 0,
+        ))
+
+def apply_incidente(db: Session, plaza_id: str, fecha: date, tipo_incidencia: str, delta: int):
+    """Adds `delta` (negative to subtract) to the incident counter of the plaza/month/tipo."""
+    table = models.ResumenIncidentes.__table__
+    stmt = insert(table).values(
+        plaza_id=plaza_id,
+        mes=month_start(fecha),
+        tipo_incidencia=tipo_incidencia,
+        total=delta,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.plaza_id, table.c.mes, table.c.tipo_incidencia],
+        set_={"total": table.c.total + stmt.excluded.total},
+    )
+    db.execute(stmt)
+    if delta < 0:
+        db.execute(table.delete().where(
+            table.c.plaza_id == plaza_id,
+            table.c.mes == month_start(fecha),
+            table.c.tipo_incidencia == tipo_incidencia,
+            table.c.total <= 0,
+        ))
+
+def apply_ausencia(db: Session, ausencia: models.Ausencia, sign: int):
+    """
+    Adds (sign=1) or subtracts (sign=-1) the days of an absence interval to the
+    monthly incident counters, skipping the days a single-day incident overrides.
+    """
+    overridden = {
+        fecha for (fecha,) in db.query(models.Incidente.fecha_incidente).filter(
+            models.active(models.Incidente),
+            models.Incidente.plaza_id == ausencia.plaza_id,
+            models.Incidente.fecha_incidente >= ausencia.start_date,
+            models.Incidente.fecha_incidente <= ausencia.end_date,
+        )
+    }
+    days = (ausencia.start_date + timedelta(days=offset) for offset in range((ausencia.end_date - ausencia.start_date).days + 1))
+    for mes, total in Counter(month_start(day) for day in days if day not in overridden).items():
+        apply_incidente(db, ausencia.plaza_id, mes, ausencia.tipo_incidencia, sign * total)
+
+
+def apply_ocupacion(db: Session, plaza_id: str, fecha: date, tiempo_extra: int = 0, sustituciones: int = 0):
+    """Adds overtime records and substitutions (negative to subtract) to the plaza's bookings for the day."""
+    if not plaza_id or not (tiempo_extra or sustituciones):
+        return
+    table = models.Ocupacion.__table__
+    stmt = insert(table).values(plaza_id=plaza_id, fecha=fecha, tiempo_extra=tiempo_extra, sustituciones=sustituciones)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.plaza_id, table.c.fecha],
+        set_={
+            "tiempo_extra": table.c.tiempo_extra + stmt.excluded.tiempo_extra,
+            "sustituciones": table.c.sustituciones + stmt.excluded.sustituciones,
+        },
+    )
+    db.execute(stmt)
+
+
+# --- Full rebuild (initial population or repair) ---
+# Inlined rather than bound: pg8000 sends each bound 'month' as its own parameter,
+# and Postgres then rejects the GROUP BY as not matching the selected expression.
+_MONTH = literal_column("'month'")
+
+def purged(table: str, fecha):
+    """Whether `fecha` falls in a quincena of `table` that archiver.py purged from the database."""
+    periodo = models.QuincenaPurgada
+    return select(periodo.inicio).where(periodo.tabla == table, periodo.inicio <= fecha, periodo.fin >= fecha).exists()
+
+def rebuild_summaries(db: Session):
+    """
+    Recomputes the summary tables and the bookings index from the raw rows in a
+    single transaction. The overtime of purged quincenas is only in the archive,
+    so their summary and bookings rows are kept as they are.
+    """
+    db.query(models.ResumenTiempoExtra).filter(
+        ~purged("tiempo_extra", models.ResumenTiempoExtra.quincena_inicio)
+    ).delete(synchronize_session=False)
+    db.query(models.ResumenIncidentes).delete()
+    db.query(models.Ocupacion).filter(~purged("tiempo_extra", models.Ocupacion.fecha)).delete(synchronize_session=False)
+
+    quincena = cast(func.date_trunc(_MONTH, models.TiempoExtra.fecha) + text(
+        "CASE WHEN EXTRACT(DAY FROM tiempo_extra.fecha) > 15 THEN INTERVAL '15 days' ELSE INTERVAL '0 days' END"
+    ), Date)
+    overtime_rows = select(
+        models.TiempoExtra.plaza_id,
+        quincena,
+        models.TiempoExtra.motivo_cobertura,
+        func.sum(models.TiempoExtra.horas),
+        func.count(),
+    ).where(
+        models.active(models.TiempoExtra), ~purged("tiempo_extra", models.TiempoExtra.fecha)
+    ).group_by(models.TiempoExtra.plaza_id, quincena, models.TiempoExtra.motivo_cobertura)
+    db.execute(insert(models.ResumenTiempoExtra.__table__).from_select(
+        ["plaza_id", "quincena_inicio", "motivo_cobertura", "total_horas", "num_registros"], overtime_rows
+    ))
+
+    mes = cast(func.date_trunc(_MONTH, models.Incidente.fecha_incidente), Date)
+    incident_rows = select(
+        models.Incidente.plaza_id,
+        mes,
+        models.Incidente.tipo_incidencia,
+        func.count(),
+    ).where(models.active(models.Incidente)).group_by(models.Incidente.plaza_id, mes, models.Incidente.tipo_incidencia)
+    db.execute(insert(models.ResumenIncidentes.__table__).from_select(
+        ["plaza_id", "mes", "tipo_incidencia", "total"], incident_rows
+    ))
+
+    # Days of the absence intervals that no single-day incident overrides
+    ausencia, dia = ausencias.expanded_days(models.Ausencia.start_date, models.Ausencia.end_date)
+    mes = cast(func.date_trunc(_MONTH, dia), Date)
+    absence_rows = select(
+        ausencia.plaza_id,
+        mes,
+        ausencia.tipo_incidencia,
+        func.count(),
+    ).where(models.active(ausencia), ~ausencias.overridden(ausencia, dia)).group_by(ausencia.plaza_id, mes, ausencia.tipo_incidencia)
+    table = models.ResumenIncidentes.__table__
+    stmt = insert(table).from_select(["plaza_id", "mes", "tipo_incidencia", "total"], absence_rows)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[table.c.plaza_id, table.c.mes, table.c.tipo_incidencia],
+        set_={"total": table.c.total + stmt.excluded.total},
+    ))
+
+    overtime_days = select(
+        models.TiempoExtra.plaza_id.label("plaza_id"),
+        models.TiempoExtra.fecha.label("fecha"),
+        literal(1).label("tiempo_extra"),
+        literal(0).label("sustituciones"),
+    ).where(models.active(models.TiempoExtra), ~purged("tiempo_extra", models.TiempoExtra.fecha))
+    substitute_days = select(
+        models.Sustitucion.plaza_suplente_id,
+        models.Sustitucion.fecha,
+        literal(0),
+        literal(1),
+    ).where(
+        models.active(models.Sustitucion),
+        models.Sustitucion.plaza_suplente_id.isnot(None),
+        ~purged("tiempo_extra", models.Sustitucion.fecha),
+    )
+    bookings = union_all(overtime_days, substitute_days).subquery()
+    booking_rows = select(
+        bookings.c.plaza_id,
+        bookings.c.fecha,
+        func.sum(bookings.c.tiempo_extra),
+        func.sum(bookings.c.sustituciones),
+    ).group_by(bookings.c.plaza_id, bookings.c.fecha)
+    db.execute(insert(models.Ocupacion.__table__).from_select(
+        ["plaza_id", "fecha", "tiempo_extra", "sustituciones"], booking_rows
+    ))
+    # Core statements skip the after_flush bump; the ETags built on these tables must change.
+    versioning.bump(db, "resumen_tiempo_extra", "resumen_incidentes", "ocupacion")
+    db.commit()
+
+
+# --- Startup backfill ---
+# Any fixed key: it only has to be the same for every instance starting up.
+_BACKFILL_LOCK = 72_270_027
+
+def _has_rows(db: Session, model, *criteria):
+    return db.query(db.query(model).filter(*criteria).exists()).scalar()
+
+def _needs_rebuild(db: Session):
+    """A summary table or the bookings index is empty while its raw rows aren't (a database that predates it)."""
+    return (
+        not _has_rows(db, models.ResumenTiempoExtra)
+        and _has_rows(db, models.TiempoExtra, models.active(models.TiempoExtra))
+    ) or (
+        not _has_rows(db, models.ResumenIncidentes)
+        and (_has_rows(db, models.Incidente, models.active(models.Incidente))
+             or _has_rows(db, models.Ausencia, models.active(models.Ausencia)))
+    ) or (
+        not _has_rows(db, models.Ocupacion)
+        and (_has_rows(db, models.TiempoExtra, models.active(models.TiempoExtra))
+             or _has_rows(db, models.Sustitucion, models.active(models.Sustitucion),
+                          models.Sustitucion.plaza_suplente_id.isnot(None)))
+    )
+
+def backfill(engine):
+    """
+    Runs rebuild_summaries once on a database whose summary tables or bookings
+    index started out empty, since the incremental updates only add the later
+    writes (and the conflict checks would miss every earlier booking). It runs on
+    every startup; the advisory lock keeps concurrent instances from rebuilding twice.
+    """
+    with Session(engine) as db:
+        db.execute(select(func.pg_advisory_xact_lock(_BACKFILL_LOCK)))
+        if _needs_rebuild(db):
+            rebuild_summaries(db)
+        else:
+            db.commit()
+
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    print("Rebuilding summary tables...")
+    session = SessionLocal()
+    try:
+        rebuild_summaries(session)
+        print("✅ Summary tables rebuilt.")
+    finally:
+        session.close()
@@ -0,0 +1,51 @@
+import hashlib
+from typing import Iterable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+import models
+
+_VERSION_TABLE = models.VersionTabla.__table__
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_versions(session, flush_context):
+    """
+    Increments the version counter of every table touched by the flush.
+    It runs inside the same transaction, so a rollback also discards the bump.
+    """
+    tables = {
+        obj.__table__.name
+        for obj in (*session.new, *session.dirty, *session.deleted)
+        if hasattr(obj, "__table__") and obj.__table__ is not _VERSION_TABLE
+    }
+    if tables:
+        bump(session, *tables)
+
+def bump(db: Session, *tables: str):
+    """Bumps the given tables explicitly (for bulk statements that bypass the ORM flush)."""
+    stmt = insert(_VERSION_TABLE).values([{"tabla": name, "version": 1} for name in sorted(tables)])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[_VERSION_TABLE.c.tabla],
+        set_={"version": _VERSION_TABLE.c.version + 1},
+    )
+    db.connection().execute(stmt)
+
+def current_etag(db: Session, tables: Iterable[str], *parts: str) -> str:
+    """Builds a strong ETag from the versions of `tables` plus any request-specific parts."""
+    tables = sorted(tables)
+    rows = dict(
+        db.query(models.VersionTabla.tabla, models.VersionTabla.version)
+        .filter(models.VersionTabla.tabla.in_(tables))
+        .all()
+    )
+    key = "|".join([f"{name}={rows.get(name, 0)}" for name in tables] + list(parts))
+    return '"' + hashlib.sha1(key.encode()).hexdigest()[:20] + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return "*" in candidates or any(value.removeprefix("W/") == etag for value in candidates)
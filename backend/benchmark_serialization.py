@@ -0,0 +1,99 @@
+"""
+Compares the list-response serialization path before and after orjson +
+plain dict rows, and the bytes on the wire with and without compression.
+
+    python backend/benchmark_serialization.py --rows 20000
+    python backend/benchmark_serialization.py --api-url http://localhost:8080 \\
+        --path "/incidentes/range/?start_date=2025-01-01&end_date=2025-06-30"
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+import urllib.request
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+import orjson
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "app"))
+import schemas  # noqa: E402
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def synthetic_rows(count):
+    """Incidente-shaped rows, as the ORM would return them."""
+    start = date(2025, 1, 1)
+    tipos = ["Asistencia", "Falta", "Incapacidad", "Vacaciones", "Licencia"]
+    return [
+        SimpleNamespace(
+            incidente_id=i,
+            plaza_id=str(10000 + i % 32),
+            fecha_incidente=start + timedelta(days=i // 32),
+            tipo_incidencia=tipos[i % len(tipos)],
+            descripcion="Registrado desde la plantilla del turno Matutino",
+            registrado_por=None,
+        )
+        for i in range(count)
+    ]
+
+def serialize_before(objects):
+    """response_model validation from attributes + stdlib json, like the original endpoints."""
+    payload = [schemas.Incidente.model_validate(obj).model_dump(mode="json") for obj in objects]
+    return json.dumps(payload).encode()
+
+def serialize_after(objects):
+    """Plain dict rows (as returned by Query.with_entities) + orjson."""
+    rows = [vars(obj) for obj in objects]
+    return orjson.dumps(rows)
+
+def timed(fn, *args, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+def report_sizes(label, body):
+    sizes = [f"raw {len(body):>10,} B", f"gzip {len(gzip.compress(body, 6)):>9,} B"]
+    if brotli is not None:
+        sizes.append(f"br {len(brotli.compress(body, quality=5)):>9,} B")
+    print(f"{label:<8} " + "  ".join(sizes))
+
+def benchmark_local(rows):
+    objects = synthetic_rows(rows)
+    before, before_time = timed(serialize_before, objects)
+    after, after_time = timed(serialize_after, objects)
+    print(f"{rows:,} rows")
+    print(f"before   {before_time * 1000:8.1f} ms")
+    print(f"after    {after_time * 1000:8.1f} ms  ({before_time / after_time:.1f}x)")
+    report_sizes("before", before)
+    report_sizes("after", after)
+
+def benchmark_api(api_url, path):
+    for encoding in ["identity", "gzip", "br"]:
+        request = urllib.request.Request(api_url + path, headers={"Accept-Encoding": encoding})
+        start = time.perf_counter()
+        with urllib.request.urlopen(request) as response:
+            body = response.read()
+            served = response.headers.get("Content-Encoding", "identity")
+        elapsed = time.perf_counter() - start
+        print(f"{encoding:<9} -> {served:<9} {len(body):>10,} B  {elapsed * 1000:8.1f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--api-url", help="Measure a running API instead of synthetic rows.")
+    parser.add_argument("--path", default="/incidentes/range/?start_date=2025-01-01&end_date=2025-12-31")
+    args = parser.parse_args()
+    if args.api_url:
+        benchmark_api(args.api_url.rstrip("/"), args.path)
+    else:
+        benchmark_local(args.rows)
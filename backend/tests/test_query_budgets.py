@@ -0,0 +1,58 @@
+import pytest
+
+import diagnostics, reads
+from conftest import DAY
+
+# Every read endpoint with a @diagnostics.query_budget. DB_DIAGNOSTICS=strict makes
+# get_db raise QueryBudgetExceeded when a request issues more statements than
+# its budget, which TestClient re-raises here and fails the test.
+RANGE = {"start_date": "2025-03-01", "end_date": "2025-03-15"}
+READS = [
+    ("/plazas/", {}),
+    ("/day/" + DAY.isoformat(), {}),
+    ("/incidentes/", {"fecha": DAY.isoformat()}),
+    ("/incidentes/range/", RANGE),
+    ("/ausencias/", RANGE),
+    ("/sustituciones/range/", RANGE),
+    ("/tiempo-extra/", RANGE),
+    ("/tiempo-extra/plan", RANGE),
+    ("/conflictos", {"start": "2025-03-01", "end": "2025-03-15"}),
+    ("/asignaciones/", {"fecha": DAY.isoformat(), "turno": "Matutino"}),
+    ("/coberturas-necesarias/", {}),
+    ("/coberturas-necesarias/1/candidatos", {}),
+    ("/coberturas-temporales/", {}),
+    ("/changes", {}),
+]
+
+
+@pytest.mark.parametrize("path,params", READS)
+def test_read_stays_within_budget(client, path, params):
+    response = client.get(path, params=params)
+    assert response.status_code == 200, response.text
+
+
+@pytest.mark.parametrize("path,params", READS)
+def test_revalidation_stays_within_budget(client, path, params):
+    etag = client.get(path, params=params).headers.get("ETag")
+    if etag is None:
+        pytest.skip("endpoint has no ETag")
+    assert client.get(path, params=params, headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_batch_stays_within_budget(client):
+    queries = [{"name": path, "path": path, "params": params}
+               for path, params in READS if path in reads.BATCHABLE]
+    response = client.post("/batch", json={"queries": queries})
+    assert response.status_code == 200, response.text
+
+
+def test_budget_overrun_fails(client):
+    route = next(route for route in client.app.routes if getattr(route, "path", None) == "/incidentes/range/")
+    budget = route.endpoint.query_budget
+    route.endpoint.query_budget = 0
+    try:
+        with pytest.raises(diagnostics.QueryBudgetExceeded):
+            client.get("/incidentes/range/", params=RANGE)
+    finally:
+        route.endpoint.query_budget = budget
+
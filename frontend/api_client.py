@@ -0,0 +1,98 @@
+import os
+import threading
+from collections import OrderedDict
+
+import requests
+
+API_URL = os.environ.get("API_URL", "https://sgo-api-service-479752447685.us-central1.run.app")
+
+# Last validated payload per URL, so an expired st.cache_data entry can be
+# revalidated with If-None-Match instead of downloading the full JSON again.
+MAX_VALIDATORS = 256
+_validators = OrderedDict()
+_validators_lock = threading.Lock()
+
+# Shared HTTP session (keep-alive to Cloud Run). Every response is reported to
+# the callables in `response_listeners`, e.g. the render profiler.
+session = requests.Session()
+response_listeners = []
+
+def _notify_listeners(response, *args, **kwargs):
+    for listener in response_listeners:
+        listener(response)
+
+session.hooks["response"].append(_notify_listeners)
+
+# Payloads fetched ahead by prefetch(), per thread, until get_json() claims them.
+_prefetched = threading.local()
+
+def _key(url, params):
+    return (url, tuple(sorted((params or {}).items())))
+
+
+def get_json(path, params=None):
+    """
+    GET `path` from the API and return the decoded JSON. When the server answers
+    304 Not Modified, the payload stored with the previous ETag is returned.
+    Raises requests.exceptions.RequestException like `requests.get(...).raise_for_status()`.
+    """
+    url = f"{API_URL}{path}"
+    key = _key(url, params)
+    prefetched = getattr(_prefetched, "payloads", {})
+    if key in prefetched:
+        return prefetched.pop(key)
+    with _validators_lock:
+        cached = _validators.get(key)
+
+    headers = {"If-None-Match": cached[0]} if cached else {}
+    response = session.get(url, params=params, headers=headers)
+    if response.status_code == 304 and cached:
+        with _validators_lock:
+            _validators.move_to_end(key)
+        return cached[1]
+    response.raise_for_status()
+
+    payload = response.json()
+    etag = response.headers.get("ETag")
+    if etag:
+        with _validators_lock:
+            _validators[key] = (etag, payload)
+            _validators.move_to_end(key)
+            while len(_validators) > MAX_VALIDATORS:
+                _validators.popitem(last=False)
+    return payload
+
+
+def prefetch(reads):
+    """
+    Fetches several GET reads, given as (path, params) pairs, in one POST /batch
+    round trip. Each payload is handed out by this thread's next get_json() for
+    the same path and params, so the fetchers themselves stay unchanged.
+    Raises requests.exceptions.RequestException.
+    """
+    queries = [{"name": str(i), "path": path, "params": params or {}} for i, (path, params) in enumerate(reads)]
+    response = session.post(f"{API_URL}/batch", json={"queries": queries})
+    response.raise_for_status()
+    results = response.json()["results"]
+    _prefetched.payloads = {
+        _key(f"{API_URL}{path}", params): results[str(i)] for i, (path, params) in enumerate(reads)
+    }
+
+
+def get_frame(path, params=None):
+    """
+    GET a range endpoint as a pandas DataFrame. With pyarrow installed the rows
+    arrive as an Arrow IPC stream (format=arrow) and are read batch by batch
+    without going through JSON; otherwise the JSON response is used.
+    """
+    import pandas as pd
+    try:
+        import pyarrow as pa
+    except ImportError:
+        return pd.DataFrame(get_json(path, params))
+
+    response = session.get(f"{API_URL}{path}", params={**(params or {}), "format": "arrow"}, stream=True)
+    response.raise_for_status()
+    response.raw.decode_content = True
+    with pa.ipc.open_stream(response.raw) as reader:
+        return reader.read_pandas()
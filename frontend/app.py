@@ -16,6 +16,15 @@ except ImportError:
     # Esto es normal en un entorno de producción donde no tenemos .env
     pass
 
+import cache
+from calendar_view import calendar_day, quincena_calendar, quincena_days
+import live_updates
+import outbox
+import profiler
+from plaza_directory import PlazaDirectory
+from replica import replica
+from api_client import API_URL, get_frame, get_json, prefetch, session as api_session
+
 
 # --- Page Configuration ---
 st.set_page_config(
@@ -24,9 +33,6 @@ st.set_page_config(
     layout="wide"
 )
 
-# --- API Configuration ---
-API_URL = "https://sgo-api-service-479752447685.us-central1.run.app"
-
 # --- User Authentication (Secure) ---
 VALID_USERS = {}
 try:
@@ -64,150 +70,130 @@ def check_password():
     return False
 
 # --- Data Fetching Functions ---
-@st.cache_data(ttl=300)
+@cache.cached(ttl=300, tables=["plazas"], live_ttl=3600)
 def get_plazas():
+    """Returns the PlazaDirectory (lookups + schedule masks) built from /plazas/."""
     try:
-        response = requests.get(f"{API_URL}/plazas/")
-        response.raise_for_status()
-        df = pd.DataFrame(response.json())
+        df = pd.DataFrame(get_json("/plazas/"))
         df['display_name'] = df['nombre_actual'] + " (" + df['plaza'] + ")"
-        return df
     except requests.exceptions.RequestException as e:
         st.error(f"Error connecting to API: {e}")
-        return pd.DataFrame()
+        return cache.Uncached(PlazaDirectory(pd.DataFrame(columns=['plaza', 'display_name'])))
+    return PlazaDirectory(df)
 
-@st.cache_data(ttl=60)
+@cache.cached(ttl=60, tables=["incidentes"], live_ttl=900,
+              scopes=lambda fecha: [cache.day_scope("incidentes", fecha)])
 def get_incidentes(fecha):
     try:
-        params = {"fecha": fecha.isoformat()}
-        response = requests.get(f"{API_URL}/incidentes/", params=params)
-        response.raise_for_status()
-        return {item['plaza_id']: item['tipo_incidencia'] for item in response.json()}
+        rows = replica.window("incidentes", "fecha_incidente", fecha, fecha)
+        if rows is None:
+            rows = get_json("/incidentes/", {"fecha": fecha.isoformat()})
+        else:
+            # Long absences are kept as intervals; a single-day incident (later in the list) overrides them.
+            rows = replica.overlapping("ausencias", "start_date", "end_date", fecha, fecha) + rows
+        return {item['plaza_id']: item['tipo_incidencia'] for item in rows}
     except requests.exceptions.RequestException:
-        return {}
+        return cache.Uncached({})
 
-@st.cache_data(ttl=60)
+@cache.cached(ttl=60, tables=["asignaciones_servicio"], live_ttl=900,
+              scopes=lambda fecha, turno: [cache.day_scope("asignaciones_servicio", fecha, turno)])
 def get_asignaciones(fecha, turno):
     try:
-        params = {"fecha": fecha.isoformat(), "turno": turno}
-        response = requests.get(f"{API_URL}/asignaciones/", params=params)
-        response.raise_for_status()
-        return {item['plaza_id']: item['area_servicio'] for item in response.json()}
+        rows = replica.window("asignaciones_servicio", "fecha", fecha, fecha, turno=turno)
+        if rows is None:
+            rows = get_json("/asignaciones/", {"fecha": fecha.isoformat(), "turno": turno})
+        return {item['plaza_id']: item['area_servicio'] for item in rows}
     except requests.exceptions.RequestException:
-        return {}
+        return cache.Uncached({})
 
-@st.cache_data(ttl=60)
+@cache.cached(ttl=60, tables=["tiempo_extra"], live_ttl=900,
+              scopes=lambda start_date, end_date: cache.month_scopes("tiempo_extra", start_date, end_date))
 def get_overtime_records(start_date, end_date):
     try:
-        params = {"start_date": start_date.isoformat(), "end_date": end_date.isoformat()}
-        response = requests.get(f"{API_URL}/tiempo-extra/", params=params)
-        response.raise_for_status()
-        return response.json()
+        rows = replica.window("tiempo_extra", "fecha", start_date, end_date)
+        if rows is None:
+            params = {"start_date": start_date.isoformat(), "end_date": end_date.isoformat()}
+            rows = get_json("/tiempo-extra/", params)
+        return rows
     except requests.exceptions.RequestException:
-        return []
+        return cache.Uncached([])
 
-@st.cache_data(ttl=60)
+@cache.cached(ttl=60, tables=["sustituciones"], live_ttl=900,
+              scopes=lambda start_date, end_date: cache.month_scopes("sustituciones", start_date, end_date))
 def get_substitutions_by_range(start_date, end_date):
     try:
-        params = {"start_date": start_date.isoformat(), "end_date": end_date.isoformat()}
-        response = requests.get(f"{API_URL}/sustituciones/range/", params=params)
-        response.raise_for_status()
-        return response.json()
+        rows = replica.window("sustituciones", "fecha", start_date, end_date)
+        if rows is None:
+            params = {"start_date": start_date.isoformat(), "end_date": end_date.isoformat()}
+            rows = get_json("/sustituciones/range/", params)
+        return rows
     except requests.exceptions.RequestException:
-        return []
+        return cache.Uncached([])
 
-@st.cache_data(ttl=60)
-def get_coverage_needs():
+@cache.cached(ttl=60, tables=["coberturas_temporales", "plazas"], live_ttl=900)
+def get_coberturas_temporales():
     try:
-        response = requests.get(f"{API_URL}/coberturas-necesarias/")
-        response.raise_for_status()
-        return response.json()
+        return get_json("/coberturas-temporales/")
     except requests.exceptions.RequestException:
-        return []
-
-# --- Helper Function to Determine Day Off ---
-def is_day_off(selected_date, descanso_str):
-    if pd.isna(descanso_str) or descanso_str.strip() == "": return False
-    weekday = selected_date.weekday()
-    descanso = str(descanso_str).upper().strip()
-    if "LAV" in descanso: return weekday in [0, 1, 2, 3, 4]
-    day_checks = {
-        0: ["L", "LUNES", "L M"], 1: ["M", "MARTES", "M M"], 2: ["X", "MIERCOLES", "M M"],
-        3: ["J", "JUEVES", "J V"], 4: ["V", "VIERNES", "V S"], 5: ["S", "SABADO", "V S", "S D"],
-        6: ["D", "DOMINGO", "D L", "S D"]
-    }
-    for check_str in day_checks.get(weekday, []):
-        if check_str in descanso: return True
-    return False
+        return cache.Uncached(None)
 
-# --- Definitive Shift Filtering Logic ---
-def get_active_workers_for_shift(plazas_df, selected_date, selected_shift):
-    selected_weekday = selected_date.weekday()  # Monday is 0, Sunday is 6
-    active_workers = []
-
-    # Mapa de días de descanso: Asocia el string de descanso con los números de día de la semana
-    # Lunes=0, Martes=1, Miércoles=2, Jueves=3, Viernes=4, Sábado=5, Domingo=6
-    rest_day_map = {
-        "L M": [0, 1], "M M": [1, 2], "M J": [2, 3],
-        "J V": [3, 4], "V S": [4, 5], "S D": [5, 6],
-        "D L": [6, 0]
-    }
-    # Mapa de descanso para turno nocturno
-    night_shift_pattern = {
-        'DOMINGO': [0, 2, 4], 'SABADO': [6, 1, 3], 'VIERNES': [5, 0, 2],
-        'JUEVES': [4, 6, 1], 'MIERCOLES': [3, 5, 0], 'MARTES': [2, 4, 6],
-        'LUNES': [1, 3, 5]
-    }
-    day_map = {'L': 0, 'M': 1, 'X': 2, 'J': 3, 'V': 4, 'S': 5, 'D': 6}
-
-    for index, worker in plazas_df.iterrows():
-        is_active = False
-        horario = str(worker.get('horario', '')).upper()
-        descanso = str(worker.get('dias_descanso', '')).upper().strip()
-
-        # Case 1: Jornada Acumulada (LAV descanso)
-        if "LAV" in descanso:
-            if selected_weekday == 5 and selected_shift in ["Matutino", "Vespertino"]:
-                is_active = True
-            elif selected_weekday == 6:  # Sunday, active in all shifts
-                is_active = True
-        
-        # Case 2: Turno Nocturno
-        elif "A 08.10" in horario and selected_shift == "Nocturno":
-            # Use the full name of the rest day for the pattern
-            if descanso in night_shift_pattern:
-                if selected_weekday in night_shift_pattern[descanso]:
-                    is_active = True
-
-        # Case 3: Turno Matutino/Vespertino (LÓGICA CORREGIDA)
-        # Case 2: Turno Nocturno (sin cambios)
-        elif "A 08.10" in horario and selected_shift == "Nocturno":
-            if descanso in night_shift_pattern:
-                if selected_weekday in night_shift_pattern[descanso]:
-                    is_active = True
-
-        # Case 3: Turno Matutino/Vespertino (LÓGICA CORREGIDA)
-        else:
-            is_matutino = "7.00" in horario and selected_shift == "Matutino"
-            is_vespertino = "14.00" in horario and selected_shift == "Vespertino"
-            
-            if is_matutino or is_vespertino:
-                # Se asume que el trabajador labora, a menos que se demuestre lo contrario
-                is_active = True 
-                
-                # Verificamos si el día seleccionado coincide con sus días de descanso
-                if descanso in rest_day_map:
-                    if selected_weekday in rest_day_map[descanso]:
-                        is_active = False # Si está de descanso, no está activo
-                
-        if is_active:
-            active_workers.append(worker)
+@cache.cached(ttl=60, tables=["coberturas_necesarias"], live_ttl=900)
+def get_coverage_needs():
+    try:
+        return get_json("/coberturas-necesarias/")
+    except requests.exceptions.RequestException:
+        return cache.Uncached([])
 
-    return pd.DataFrame(active_workers)
+def booking_scopes(start_date, end_date):
+    """Month scopes of the dated tables a worker's availability is computed from."""
+    return [scope for table in ("incidentes", "tiempo_extra", "sustituciones")
+            for scope in cache.month_scopes(table, start_date, end_date)]
 
+@cache.cached(ttl=60, tables=["plazas", "coberturas_necesarias", "incidentes", "ausencias", "tiempo_extra", "sustituciones"], live_ttl=900,
+              scopes=lambda cobertura_id, start_date, end_date: booking_scopes(start_date, end_date))
+def get_candidates(cobertura_id, start_date, end_date):
+    """Uncovered day -> plazas that can take it, best first (GET /coberturas-necesarias/{id}/candidatos)."""
+    try:
+        payload = get_json(f"/coberturas-necesarias/{cobertura_id}/candidatos")
+        return {date.fromisoformat(dia['fecha']): [c['plaza'] for c in dia['candidatos']] for dia in payload['dias']}
+    except requests.exceptions.RequestException:
+        return cache.Uncached({})
+
+def suggested_overtime(plazas, day):
+    """(covered display name, candidate display names) for each coverage need still open on `day`."""
+    suggestions = []
+    for need in get_coverage_needs():
+        if not need['start_date'] <= day.isoformat() <= need['end_date']:
+            continue
+        candidates = get_candidates(need['id'], date.fromisoformat(need['start_date']), date.fromisoformat(need['end_date'])).get(day)
+        covered = plazas.by_plaza.get(need['plaza_id_ausente'])
+        if candidates and covered is not None:
+            names = [plazas.by_plaza[p]['display_name'] for p in candidates if p in plazas.by_plaza]
+            suggestions.append((covered['display_name'], names))
+    return suggestions
+
+@cache.cached(ttl=60, tables=["plazas", "incidentes", "ausencias", "tiempo_extra", "sustituciones"], live_ttl=900,
+              scopes=booking_scopes)
+def get_conflicts(start_date, end_date):
+    try:
+        return get_json("/conflictos", {"start": start_date.isoformat(), "end": end_date.isoformat()})
+    except requests.exceptions.RequestException:
+        return cache.Uncached([])
+
+def show_conflicts(error):
+    """Shows the double bookings of a 409 answer. Returns False for any other error."""
+    response = getattr(error, "response", None)
+    if response is None or response.status_code != 409:
+        return False
+    detail = response.json().get("detail", {})
+    st.error(detail.get("mensaje", "El registro crea conflictos de ocupación."))
+    for conflict in detail.get("conflictos", []):
+        st.caption(f"{conflict['fecha']} · plaza {conflict['plaza_id']}: {', '.join(conflict['motivos'])}")
+    return True
 
 # --- NEW: Function to prepare DataFrame for Excel export ---
-def prepare_report_dataframe(overtime_df, plazas_df):
+@profiler.timed
+def prepare_report_dataframe(overtime_df, plazas):
     if overtime_df.empty:
         return pd.DataFrame()
 
@@ -219,8 +205,8 @@ def prepare_report_dataframe(overtime_df, plazas_df):
         num_dias=('fecha', 'count')
     ).reset_index()
 
-    # Merge with plazas_df to get employee details
-    report_df = pd.merge(grouped, plazas_df, left_on='plaza_id', right_on='plaza', how='left')
+    # Merge with the plazas frame to get employee details
+    report_df = pd.merge(grouped, plazas.df, left_on='plaza_id', right_on='plaza', how='left')
 
     # Format the columns exactly as needed for the report
     report_df['MATRICULA'] = report_df['matricula_actual']
@@ -236,9 +222,8 @@ def prepare_report_dataframe(overtime_df, plazas_df):
         match = re.search(r"Cubre a: (.*) \((\d+)\)\. Folio: (.*)", motivo)
         if match:
             covered_worker_display_name, covered_worker_plaza_id, folio = match.groups()
-            details = plazas_df[plazas_df['plaza'] == covered_worker_plaza_id]
-            if not details.empty:
-                d = details.iloc[0]
+            d = plazas.by_plaza.get(covered_worker_plaza_id)
+            if d:
                 return f"{folio} {d['nombre_actual']}\n{d['categoria']}\nMAT: {d['matricula_actual']}\nTURNO: {d['horario']}\nDESCANSO: {d['dias_descanso']}"
         return motivo
     report_df['MOTIVO DE COBERTURA'] = report_df.apply(format_motivo, axis=1)
@@ -261,23 +246,18 @@ def prepare_report_dataframe(overtime_df, plazas_df):
     ]
     return report_df[final_columns]
 
-def generate_substitutions_report(sub_start_date, sub_end_date, plazas_df):
+def generate_substitutions_report(sub_start_date, sub_end_date, plazas):
     try:
         # Get substitutions for the date range
         params = {"start_date": sub_start_date.isoformat(), "end_date": sub_end_date.isoformat()}
-        response = requests.get(f"{API_URL}/sustituciones/range/", params=params)
-        response.raise_for_status()
-        substitutions = response.json()
+        subs_df = get_frame("/sustituciones/range/", params)
 
-        if not substitutions:
+        if subs_df.empty:
             return None
-
-        # Create DataFrame from substitutions
-        subs_df = pd.DataFrame(substitutions)
         
         # Merge with employee data for both absent and substitute workers
-        report_df = pd.merge(subs_df, plazas_df, left_on='plaza_ausente_id', right_on='plaza', how='left')
-        report_df = pd.merge(report_df, plazas_df, left_on='plaza_suplente_id', right_on='plaza', how='left',
+        report_df = pd.merge(subs_df, plazas.df, left_on='plaza_ausente_id', right_on='plaza', how='left')
+        report_df = pd.merge(report_df, plazas.df, left_on='plaza_suplente_id', right_on='plaza', how='left',
                             suffixes=('_ausente', '_suplente'))
         
         # Format the final report
@@ -321,22 +301,17 @@ def generate_substitutions_report(sub_start_date, sub_end_date, plazas_df):
     except requests.exceptions.RequestException as e:
         st.error(f"Error al obtener datos de la API: {e}")
         return None
-def generate_incidents_report(inc_start_date, inc_end_date, plazas_df):
+def generate_incidents_report(inc_start_date, inc_end_date, plazas):
     try:
         # Get incidents for the date range
         params = {"start_date": inc_start_date.isoformat(), "end_date": inc_end_date.isoformat()}
-        response = requests.get(f"{API_URL}/incidentes/range/", params=params)
-        response.raise_for_status()
-        incidents = response.json()
+        incidents_df = get_frame("/incidentes/range/", params)
 
-        if not incidents:
+        if incidents_df.empty:
             return None
-
-        # Create DataFrame from incidents
-        incidents_df = pd.DataFrame(incidents)
         
         # Merge with employee data
-        report_df = pd.merge(incidents_df, plazas_df, left_on='plaza_id', right_on='plaza', how='left')
+        report_df = pd.merge(incidents_df, plazas.df, left_on='plaza_id', right_on='plaza', how='left')
         
         # Format the final report
         report_df['FECHA'] = pd.to_datetime(report_df['fecha_incidente']).dt.strftime('%d/%m/%Y')
@@ -376,10 +351,10 @@ def generate_incidents_report(inc_start_date, inc_end_date, plazas_df):
         return None
     raise NotImplementedError
 
-def generate_assignments_report(as_date, as_shift, plazas_df):
+def generate_assignments_report(as_date, as_shift, plazas):
     try:
         # Get active workers and their assignments
-        active_workers_df = get_active_workers_for_shift(plazas_df, as_date, as_shift)
+        active_workers_df = plazas.active_workers(as_date, as_shift)
         assignments = get_asignaciones(as_date, as_shift)
         
         if active_workers_df.empty:
@@ -424,10 +399,10 @@ def generate_assignments_report(as_date, as_shift, plazas_df):
         st.error(f"Error al generar el reporte: {e}")
         return None
 
-def generate_overtime_template_report(overtime_to_report, plazas_df):
+def generate_overtime_template_report(overtime_to_report, plazas):
     try:
         # Create DataFrame with the required format
-        report_df = prepare_report_dataframe(pd.DataFrame(overtime_to_report), plazas_df)
+        report_df = prepare_report_dataframe(pd.DataFrame(overtime_to_report), plazas)
         
         if report_df.empty:
             return None
@@ -457,16 +432,13 @@ def generate_overtime_template_report(overtime_to_report, plazas_df):
         st.error(f"Error al generar el reporte: {e}")
         return None
     
-def manage_existing_plazas():
+def manage_existing_plazas(plazas):
     st.subheader("👤 Modificar Datos de un Trabajador")
 
-    response = requests.get(f"{API_URL}/plazas/")
-    if response.status_code == 200:
-        plazas_df = pd.DataFrame(response.json())
-        
+    if not plazas.empty:
         # --- CORRECCIÓN 1: Forzar la columna 'plaza' a ser de tipo string ---
         # Esto asegura que pandas y streamlit siempre la traten como texto.
-        plazas_df['plaza'] = plazas_df['plaza'].astype(str)
+        plazas_df = plazas.df.drop(columns=['display_name']).assign(plaza=plazas.df['plaza'].astype(str))
 
         st.dataframe(plazas_df)
 
@@ -477,8 +449,7 @@ def manage_existing_plazas():
         )
 
         if plaza_a_modificar:
-            # El filtro ahora comparará string con string, lo cual es seguro.
-            trabajador_actual = plazas_df[plazas_df['plaza'] == plaza_a_modificar].iloc[0]
+            trabajador_actual = plazas.by_plaza[plaza_a_modificar]
 
             with st.form("form_modificar_trabajador"):
                 st.write(f"**Modificando Plaza:** {trabajador_actual['plaza']}")
@@ -499,7 +470,7 @@ def manage_existing_plazas():
                     url_de_actualizacion = f"{API_URL}/plazas/{plaza_a_modificar}"
                     st.info(f"Intentando actualizar en la URL: {url_de_actualizacion}")
 
-                    update_response = requests.put(
+                    update_response = api_session.put(
                         url_de_actualizacion,
                         json=update_data
                     )
@@ -507,7 +478,7 @@ def manage_existing_plazas():
                     if update_response.status_code == 200:
                         st.success("¡Trabajador actualizado correctamente!")
                         # Limpia la cache para que la próxima recarga muestre los datos nuevos
-                        st.cache_data.clear() 
+                        cache.invalidate("plazas")
                         st.rerun()
                     else:
                         st.error(f"Error al actualizar. Código: {update_response.status_code}. Detalles: {update_response.text}")
@@ -540,28 +511,25 @@ def create_new_plaza():
                 # ... (resto de campos)
             }
             # Llamada a la API para crear (POST request)
-            response = requests.post(f"{API_URL}/plazas/", json=new_plaza_data)
+            response = api_session.post(f"{API_URL}/plazas/", json=new_plaza_data)
             if response.status_code == 200:
                 st.success(f"¡Plaza {plaza} creada exitosamente!")
+                cache.invalidate("plazas")
             else:
                 st.error(f"Error al crear la plaza. Detalles: {response.text}")
 
-def manage_eventuales():
+def manage_eventuales(plazas):
     st.subheader("🧑‍⚕️ Asignar Cobertura Temporal (Eventual)")
 
-    response = requests.get(f"{API_URL}/plazas/")
-    if response.status_code != 200:
+    if plazas.empty:
         st.error("No se pudo cargar la lista de plazas.")
         return
-    
-    plazas_df = pd.DataFrame(response.json())
-    plazas_df['plaza'] = plazas_df['plaza'].astype(str)
 
     with st.form("form_asignar_eventual"):
         st.write("Seleccione la plaza a cubrir e ingrese los datos del trabajador eventual.")
         plaza_a_cubrir = st.selectbox(
             "Plaza que será cubierta:",
-            options=plazas_df['plaza'].tolist()
+            options=list(plazas.by_plaza)
         )
 
         st.markdown("---")
@@ -577,535 +545,611 @@ def manage_eventuales():
                 "fecha_inicio": str(fecha_inicio),
                 "fecha_fin": str(fecha_fin)
             }
-            response = requests.post(
+            response = api_session.post(
                 f"{API_URL}/plazas/{plaza_a_cubrir}/asignar-cobertura-temporal", # URL corregida y más clara
                 json=cobertura_data
             )
             if response.status_code == 200:
                 st.success(f"¡Cobertura asignada a la plaza {plaza_a_cubrir} exitosamente!")
-                st.cache_data.clear()
+                cache.invalidate("plazas", "coberturas_temporales")
                 st.rerun()
             else:
                 st.error(f"Error al asignar cobertura. Detalles: {response.text}")
 
     st.markdown("---")
+    active_coverages_list(plazas)
+
+# Finishing a coverage reruns only this list; the restored name reaches the
+# rest of the page on its next full rerun through the cleared get_plazas cache.
+@st.fragment
+def active_coverages_list(plazas):
     st.subheader("📋 Coberturas Activas")
     
-    # Esta llamada fallará hasta que implementemos el backend
-    coberturas_response = requests.get(f"{API_URL}/coberturas-temporales/")
-    if coberturas_response.status_code == 200:
-        coberturas_activas = coberturas_response.json()
+    coberturas_activas = get_coberturas_temporales()
+    if coberturas_activas is not None:
         if not coberturas_activas:
             st.info("No hay coberturas temporales activas en este momento.")
         else:
-            # Crear un mapa de plaza -> nombre para mostrar
-            plaza_map = plazas_df.set_index('plaza')['nombre_actual'].to_dict()
-
             for cob in coberturas_activas:
                 col1, col2 = st.columns([3, 1])
                 with col1:
-                    nombre_original = plaza_map.get(cob['plaza_id'], cob['plaza_id'])
+                    nombre_original = plazas.name(cob['plaza_id'], cob['plaza_id'])
                     st.write(f"**Plaza:** {cob['plaza_id']}")
                     st.write(f"  - **Trabajador de Base:** {nombre_original}")
                     st.write(f"  - **Cubre (Eventual):** {cob['nombre_trabajador_original']}") # Ajustado al modelo
                     st.write(f"  - **Periodo:** {cob['fecha_inicio']} al {cob['fecha_fin']}")
                 with col2:
                     if st.button("Finalizar Cobertura", key=f"end_{cob['cobertura_id']}"):
-                        end_response = requests.post(f"{API_URL}/coberturas-temporales/{cob['cobertura_id']}/finalizar")
+                        end_response = api_session.post(f"{API_URL}/coberturas-temporales/{cob['cobertura_id']}/finalizar")
                         if end_response.status_code == 200:
                             st.success("¡Cobertura finalizada! El trabajador original ha sido restaurado.")
-                            st.cache_data.clear()
-                            st.rerun()
+                            cache.invalidate("plazas", "coberturas_temporales")
+                            st.rerun(scope="fragment")
                         else:
                             st.error("Error al finalizar la cobertura.")
     else:
         st.warning("No se pudieron cargar las coberturas activas.")
 
 
-# --- Main Application Logic ---
-def main_app():
-    st.sidebar.title(f"Bienvenido, {st.session_state['username']}!")
-    if st.sidebar.button("Cerrar Sesión"):
-        st.session_state["logged_in"] = False
-        st.rerun()
+# --- Page Rendering ---
+# Only the selected page is executed on each rerun, so a click in one section
+# doesn't refetch or rebuild the others.
+@profiler.timed
+def roster_grid(workers_df, column, current_values, default, options):
+    """
+    Frame for the roll-call style grids: one row per worker with the current
+    value of `column` (or `default`), typed as a categorical over `options`.
+    """
+    grid = pd.DataFrame({
+        "Nombre": workers_df['nombre_actual'].to_numpy(),
+        "Plaza": workers_df['plaza'].to_numpy(),
+    })
+    values = grid["Plaza"].map(current_values).fillna(default)
+    # Values outside the option list fall back to the default, as the old selectboxes did.
+    values = values.where(values.isin(options), default)
+    grid[column] = pd.Categorical(values, categories=options)
+    return grid
+
+def render_pase_de_lista(plazas):
+    st.header("Registro de Incidencias por Turno")
+    col1, col2 = st.columns(2)
+    with col1:
+        inc_date = st.date_input("Seleccione la Fecha:", key="inc_page_date")
+    with col2:
+        inc_turno = st.selectbox("Seleccione el Turno:", ["Matutino", "Vespertino", "Nocturno"], key="inc_page_turno")
+
+    active_workers_df = plazas.active_workers(inc_date, inc_turno)
+
+    # Cambios guardados localmente que aún no llegan al API tienen prioridad.
+    incidentes_existentes = {
+        **get_incidentes(inc_date),
+        **outbox.pending_values("incidente", "tipo_incidencia", fecha_incidente=inc_date.isoformat()),
+    }
+    st.markdown("---")
+    st.subheader(f"Personal Activo del Turno {inc_turno} para el {inc_date.strftime('%d/%m/%Y')}")
 
-    st.title("📋 SGO - Limpieza e Higiene HGSZ 33")
+    if active_workers_df.empty:
+        st.info("No hay personal programado para este turno en la fecha seleccionada.")
+    else:
+        incident_options = ["Asistencia", "Falta", "Incapacidad", "TXT", "Pase", "Vacaciones", "Beca", "Licencia", "Comision"]
+        grid = roster_grid(active_workers_df, "Estatus", incidentes_existentes, "Asistencia", incident_options)
+
+        # One grid inside a form: edits stay in the browser until the form is submitted.
+        with st.form(f"incident_form_{inc_date}_{inc_turno}"):
+            edited = st.data_editor(
+                grid, key=f"incident_grid_{inc_date}_{inc_turno}", hide_index=True, use_container_width=True,
+                disabled=["Nombre", "Plaza"], num_rows="fixed",
+                column_config={"Estatus": st.column_config.SelectboxColumn("Estatus", options=incident_options, required=True)},
+            )
+            if st.form_submit_button("Guardar Incidencias del Turno"):
+                outbox.enqueue("incidente", [
+                    {"plaza_id": plaza_id, "fecha_incidente": inc_date.isoformat(), "tipo_incidencia": tipo_incidencia, "descripcion": f"Registrado desde la plantilla del turno {inc_turno}"}
+                    for plaza_id, tipo_incidencia in zip(edited["Plaza"], edited["Estatus"])
+                ])
+                st.success("¡Se guardaron los registros! Se sincronizarán con el servidor en segundo plano.")
 
-    plazas_df = get_plazas()
+def render_sustituciones(plazas):
+    st.header("Planificación y Registro de Sustituciones")
+    st.subheader("Dashboard de Planeación Quincenal de Sustituciones")
 
-    if plazas_df.empty:
-        st.warning("Could not load employee data from the API.")
-    else:
-        # --- NEW: Added the Reporting tab ---
-        tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
-    "📝 Pase de Lista",
-    "🔄 Sustituciones",
-    "⏰ Tiempo Extra",
-    "🗺️ Asignación de Servicios",
-    "🗂️ Reportes",  # Anteriormente era la pestaña 5
-    "⚙️ Administración" # Nueva pestaña 6
-])
-
-        with tab1:
-            st.header("Registro de Incidencias por Turno")
-            col1, col2 = st.columns(2)
-            with col1:
-                inc_date = st.date_input("Seleccione la Fecha:", value=date.today(), key="inc_page_date")
-            with col2:
-                inc_turno = st.selectbox("Seleccione el Turno:", ["Matutino", "Vespertino", "Nocturno"], key="inc_page_turno")
-
-            active_workers_df = get_active_workers_for_shift(plazas_df, inc_date, inc_turno)
-            
-            incidentes_existentes = get_incidentes(inc_date)
-            st.markdown("---")
-            st.subheader(f"Personal Activo del Turno {inc_turno} para el {inc_date.strftime('%d/%m/%Y')}")
-            
-            if active_workers_df.empty:
-                st.info("No hay personal programado para este turno en la fecha seleccionada.")
-            else:
-                incident_options = ["Asistencia", "Falta", "Incapacidad", "TXT", "Pase", "Vacaciones", "Beca", "Licencia", "Comision"]
-                incident_selections = {}
-
-                for index, row in active_workers_df.iterrows():
-                    default_incidente = incidentes_existentes.get(row['plaza'], "Asistencia")
-                    try:
-                        default_index = incident_options.index(default_incidente)
-                    except ValueError:
-                        default_index = 0
-                    c1, c2 = st.columns([2, 3])
-                    with c1:
-                        st.write(row['nombre_actual'])
-                        st.caption(f"Plaza: {row['plaza']}")
-                    with c2:
-                        incident_selections[row['plaza']] = st.selectbox("Estatus:", options=incident_options, index=default_index, key=f"incident_select_{row['plaza']}")
-                
-                if st.button("Guardar Incidencias del Turno", key="save_incidents"):
-                    with st.spinner("Guardando..."):
-                        for plaza_id, tipo_incidencia in incident_selections.items():
-                            payload = {"plaza_id": plaza_id, "fecha_incidente": inc_date.isoformat(), "tipo_incidencia": tipo_incidencia, "descripcion": f"Registrado desde la plantilla del turno {inc_turno}"}
-                            try:
-                                requests.post(f"{API_URL}/incidentes/", json=payload).raise_for_status()
-                            except requests.exceptions.RequestException as e:
-                                st.warning(f"No se pudo guardar la incidencia para la plaza {plaza_id}: {e}")
-                        st.success("¡Se guardaron los registros con éxito!")
-                        st.cache_data.clear()
-
-        with tab2:
-            st.header("Planificación y Registro de Sustituciones")
-            st.subheader("Dashboard de Planeación Quincenal de Sustituciones")
-            
-            sub_q_start_date = st.date_input("Seleccione el inicio de la quincena:", value=date.today(), key="sub_q_date")
-            sub_q_end_date = sub_q_start_date + timedelta(days=14)
-            
-            substitution_records = get_substitutions_by_range(sub_q_start_date, sub_q_end_date)
-            
-            sub_daily_assignments = {}
-            if substitution_records:
-                plaza_to_name_map = plazas_df.set_index('plaza')['nombre_actual'].to_dict()
-                plaza_to_horario_map = plazas_df.set_index('plaza')['horario'].to_dict()
-
-                for record in substitution_records:
-                    record_date = date.fromisoformat(record['fecha'])
-                    ausente_name = plaza_to_name_map.get(record['plaza_ausente_id'], 'N/A')
-                    suplente_name = plaza_to_name_map.get(record['plaza_suplente_id'], 'N/A')
-                    ausente_horario = plaza_to_horario_map.get(record['plaza_ausente_id'], '')
-                    
-                    shift_display = "N/A"
-                    if "7.00" in ausente_horario: shift_display = "Mat."
-                    elif "14.00" in ausente_horario: shift_display = "Vesp."
-                    elif "A 08.10" in ausente_horario: shift_display = "Noct."
-                    
-                    display_text = f"{ausente_name} ({shift_display}) ➡️ {suplente_name}"
-                    
-                    if record_date not in sub_daily_assignments:
-                        sub_daily_assignments[record_date] = []
-                    sub_daily_assignments[record_date].append(display_text)
+    sub_q_start_date = st.date_input("Seleccione el inicio de la quincena:", key="sub_q_date")
+    sub_q_end_date = sub_q_start_date + timedelta(days=14)
 
-            st.markdown("---")
-            
-            days_of_week = ["Lun", "Mar", "Mié", "Jue", "Vie", "Sáb", "Dom"]
-            current_date = sub_q_start_date
-            
-            for week in range(3):
-                cols = st.columns(7)
-                for i in range(7):
-                    if current_date <= sub_q_end_date:
-                        day_str = days_of_week[current_date.weekday()]
-                        assigned_subs = sub_daily_assignments.get(current_date, [])
-                        
-                        with cols[i]:
-                            if assigned_subs:
-                                st.info(f"**{day_str} {current_date.day}**")
-                                with st.expander(f"Sustituciones: {len(assigned_subs)}"):
-                                    for sub in assigned_subs: st.write(f"• {sub}")
-                            else:
-                                st.success(f"**{day_str} {current_date.day}**")
-                                st.caption("Sin Sustituciones")
-                        current_date += timedelta(days=1)
-                if current_date > sub_q_end_date:
-                    break
-            
-            st.markdown("---")
+    substitution_records = get_substitutions_by_range(sub_q_start_date, sub_q_end_date)
 
-            st.subheader("Formulario de Sustitución de Trabajador")
-            with st.form("substitution_form", clear_on_submit=True):
-                col1, col2 = st.columns(2)
-                with col1:
-                    sustituido_display = st.selectbox("Trabajador Sustituido (Ausente):", options=plazas_df['display_name'], key="sub_sustituido")
-                    sustituido_details = plazas_df[plazas_df['display_name'] == sustituido_display].iloc[0]
-                    st.caption(f"**Categoría:** {sustituido_details['categoria']}\n\n**Horario:** {sustituido_details['horario']}")
-                with col2:
-                    sustituto_display = st.selectbox("Trabajador Sustituto (Cubre):", options=plazas_df['display_name'], key="sub_sustituto")
-                    sustituto_details = plazas_df[plazas_df['display_name'] == sustituto_display].iloc[0]
-                    st.caption(f"**Categoría:** {sustituto_details['categoria']}\n\n**Horario:** {sustituto_details['horario']}")
-                st.markdown("---")
-                sustitucion_date = st.date_input("Fecha de Sustitución:", value=date.today(), key="sub_date")
-                horario_a_sustituir = st.text_input("Horario a Sustituir:", placeholder="Ej: 07:00 a 15:00")
-                motivo_sub = st.text_input("Folio del Convenio:", key="sub_motivo")
-                if st.form_submit_button("Registrar Sustitución"):
-                    if sustituido_display == sustituto_display:
-                        st.error("El trabajador sustituido y el sustituto no pueden ser la misma persona.")
-                    else:
-                        sustituido_id = sustituido_details['plaza']
-                        sustituto_id = sustituto_details['plaza']
-                        full_motivo = f"Horario a sustituir: {horario_a_sustituir}. Motivo: {motivo_sub or 'N/A'}"
-                        payload = {"fecha": sustitucion_date.isoformat(), "plaza_ausente_id": sustituido_id, "plaza_suplente_id": sustituto_id, "motivo": full_motivo}
-                        try:
-                            requests.post(f"{API_URL}/sustituciones/", json=payload).raise_for_status()
-                            st.success("¡Sustitución registrada con éxito!")
-                            st.cache_data.clear()
-                            st.rerun()
-                        except requests.exceptions.RequestException as e:
-                            st.error(f"Error al registrar la sustitución: {e}")
-
-        with tab3:
-            st.header("Planificación y Registro de Tiempo Extraordinario")
-            st.subheader("Planificar Coberturas Necesarias")
-
-            with st.form("coverage_need_form", clear_on_submit=True):
-                col1, col2 = st.columns(2)
-                with col1:
-                    absent_worker_display = st.selectbox("Trabajador Ausente:", options=plazas_df['display_name'])
-                with col2:
-                    absence_period = st.date_input("Periodo de Ausencia (Del - Al):", [date.today(), date.today() + timedelta(days=7)])
-                
-                if st.form_submit_button("Añadir Necesidad de Cobertura"):
-                    if len(absence_period) == 2:
-                        absent_plaza_id = plazas_df[plazas_df['display_name'] == absent_worker_display]['plaza'].iloc[0]
-                        payload = {
-                            "plaza_id_ausente": absent_plaza_id,
-                            "start_date": absence_period[0].isoformat(),
-                            "end_date": absence_period[1].isoformat()
-                        }
-                        try:
-                            requests.post(f"{API_URL}/coberturas-necesarias/", json=payload).raise_for_status()
-                            st.cache_data.clear()
-                        except requests.exceptions.RequestException as e:
-                            st.error(f"No se pudo guardar la necesidad: {e}")
-                    else:
-                        st.warning("Por favor seleccione un rango de dos fechas.")
-
-            planned_needs = get_coverage_needs()
-            if planned_needs:
-                st.write("Coberturas Planificadas:")
-                for need in planned_needs:
-                    worker_name = plazas_df[plazas_df['plaza'] == need['plaza_id_ausente']]['nombre_actual'].iloc[0]
-                    c1, c2 = st.columns([4, 1])
-                    c1.info(f"Cubrir a **{worker_name}** del {need['start_date']} al {need['end_date']}")
-                    if c2.button("X", key=f"del_need_{need['id']}", help="Eliminar esta planificación"):
-                        try:
-                            requests.delete(f"{API_URL}/coberturas-necesarias/{need['id']}").raise_for_status()
-                            st.cache_data.clear()
-                            st.rerun()
-                        except requests.exceptions.RequestException as e:
-                            st.error("No se pudo eliminar.")
-            
-            st.markdown("---")
-            
-            st.subheader("Dashboard de Planeación Quincenal")
-            
-            q_start_date = st.date_input("Seleccione el inicio de la quincena:", value=date.today())
-            q_end_date = q_start_date + timedelta(days=14)
-            
-            overtime_records = get_overtime_records(q_start_date, q_end_date)
-            
-            daily_assignments = {}
-            if overtime_records:
-                plaza_to_name_map = plazas_df.set_index('plaza')['nombre_actual'].to_dict()
-                display_name_to_horario_map = plazas_df.set_index('display_name')['horario'].to_dict()
-                for record in overtime_records:
-                    record_date = date.fromisoformat(record['fecha'])
-                    plaza_id = record['plaza_id']
-                    worker_name = plaza_to_name_map.get(plaza_id, 'Desconocido')
-                    motivo = record.get('motivo_cobertura', '')
-                    match = re.search(r"Cubre a: (.*)\. Folio:", motivo)
-                    covered_worker_display_name = match.group(1) if match else "N/A"
-                    covered_horario = display_name_to_horario_map.get(covered_worker_display_name, '')
-                    shift_display = "N/A"
-                    if "7.00" in covered_horario: shift_display = "Mat."
-                    elif "14.00" in covered_horario: shift_display = "Vesp."
-                    elif "A 08.10" in covered_horario: shift_display = "Noct."
-                    assignment_info = {"id": record['id'], "display_text": f"{worker_name} (Cubre {shift_display})"}
-                    if record_date not in daily_assignments:
-                        daily_assignments[record_date] = []
-                    daily_assignments[record_date].append(assignment_info)
-
-            coverage_needs_dict = {}
-            for need in planned_needs:
-                worker_info = plazas_df[plazas_df['plaza'] == need['plaza_id_ausente']].iloc[0]
-                delta = date.fromisoformat(need['end_date']) - date.fromisoformat(need['start_date'])
-                for i in range(delta.days + 1):
-                    day = date.fromisoformat(need['start_date']) + timedelta(days=i)
-                    if not is_day_off(day, worker_info['dias_descanso']):
-                        horario = worker_info['horario']
-                        shift_display = "N/A"
-                        if "7.00" in horario: shift_display = "Mat."
-                        elif "14.00" in horario: shift_display = "Vesp."
-                        elif "A 08.10" in horario: shift_display = "Noct."
-                        display_text = f"{worker_info['nombre_actual']} ({shift_display})"
-                        if day not in coverage_needs_dict:
-                            coverage_needs_dict[day] = []
-                        coverage_needs_dict[day].append(display_text)
-
-            days_of_week = ["Lun", "Mar", "Mié", "Jue", "Vie", "Sáb", "Dom"]
-            current_date = q_start_date
-            
-            for week in range(3):
-                cols = st.columns(7)
-                for i in range(7):
-                    if current_date <= q_end_date:
-                        day_str = days_of_week[current_date.weekday()]
-                        assigned_workers_info = daily_assignments.get(current_date, [])
-                        needed_coverage = coverage_needs_dict.get(current_date, [])
-                        
-                        with cols[i]:
-                            if needed_coverage and not assigned_workers_info:
-                                st.info(f"**{day_str} {current_date.day}**")
-                                with st.expander(f"Necesita: {len(needed_coverage)}"):
-                                    for worker in needed_coverage: st.write(f"- {worker}")
-                            elif assigned_workers_info:
-                                st.success(f"**{day_str} {current_date.day}**")
-                                with st.expander(f"Cubierto por: {len(assigned_workers_info)}", expanded=True):
-                                    for assignment in assigned_workers_info:
-                                        st.write(f"- {assignment['display_text']}")
-                                        if st.button("Eliminar", key=f"del_{assignment['id']}", help="Eliminar esta asignación"):
-                                            st.session_state.confirming_delete_id = assignment['id']
-                                        
-                                        if st.session_state.get('confirming_delete_id') == assignment['id']:
-                                            st.warning(f"¿Seguro que quiere eliminar la asignación de **{assignment['display_text']}**?")
-                                            c1, c2 = st.columns(2)
-                                            if c1.button("Sí, eliminar", key=f"confirm_del_{assignment['id']}"):
-                                                try:
-                                                    requests.delete(f"{API_URL}/tiempo-extra/{assignment['id']}").raise_for_status()
-                                                    st.session_state.confirming_delete_id = None
-                                                    st.cache_data.clear()
-                                                    st.rerun()
-                                                except requests.exceptions.RequestException as e:
-                                                    st.error("No se pudo eliminar.")
-                                            if c2.button("No, cancelar", key=f"cancel_del_{assignment['id']}"):
-                                                st.session_state.confirming_delete_id = None
-                                                st.rerun()
-                            else:
-                                st.error(f"**{day_str} {current_date.day}**")
-                                st.caption("No Disponible")
-                        current_date += timedelta(days=1)
-                if current_date > q_end_date:
-                    break
-            
-            st.markdown("---")
-
-            st.subheader("Registrar Tiempo Extra Asignado")
-            with st.form("overtime_form", clear_on_submit=True):
-                ot_employee_display = st.selectbox("Seleccione el Empleado que realiza el tiempo extra:", options=plazas_df['display_name'], key="ot_employee")
-                ot_employee_details = plazas_df[plazas_df['display_name'] == ot_employee_display].iloc[0]
-                st.caption(f"**Categoría:** {ot_employee_details['categoria']}")
-                st.markdown("---")
-                covered_employee_display = st.selectbox("Seleccione el Empleado Cubierto (a quien se le cubre la ausencia):", options=plazas_df['display_name'], key="ot_covered_employee")
-                folio_convenio = st.text_input("Folio de Convenio:", placeholder="Ej: VACACIONES, INCAPACIDAD, 12345/2025")
-                ot_date = st.date_input("Periodo (Fecha del Tiempo Extra):", value=date.today(), key="ot_date")
-                ot_hours = st.number_input("Num. Horas Diarias:", min_value=0.5, max_value=24.0, value=8.0, step=0.5)
-                if st.form_submit_button("Registrar Tiempo Extra"):
-                    plaza_id = ot_employee_details['plaza']
-                    motivo_final = f"Cubre a: {covered_employee_display}. Folio: {folio_convenio}"
-                    payload = {"plaza_id": plaza_id, "fecha": ot_date.isoformat(), "horas": ot_hours, "motivo_cobertura": motivo_final}
-                    try:
-                        requests.post(f"{API_URL}/tiempo-extra/", json=payload).raise_for_status()
-                        st.success("¡Tiempo extra registrado con éxito!")
-                        st.cache_data.clear()
-                        st.rerun()
-                    except requests.exceptions.RequestException as e:
-                        st.error(f"Error al registrar el tiempo extra: {e}")
-
-        with tab4:
-            st.header("Asignación de Servicios por Turno")
-            col1_assign, col2_assign = st.columns(2)
-            with col1_assign:
-                assign_date = st.date_input("Seleccione la Fecha:", value=date.today(), key="assign_page_date")
-            with col2_assign:
-                assign_turno = st.selectbox("Seleccione el Turno:", ["Matutino", "Vespertino", "Nocturno"], key="assign_page_turno")
-            
-            turno_df_assign = get_active_workers_for_shift(plazas_df, assign_date, assign_turno)
-            
-            asignaciones_existentes = get_asignaciones(assign_date, assign_turno)
-            
-            st.markdown("---")
-            st.subheader(f"Plantilla del Turno {assign_turno} para el {assign_date.strftime('%d/%m/%Y')}")
+    sub_daily_assignments = {}
+    if substitution_records:
+        for record in substitution_records:
+            record_date = date.fromisoformat(record['fecha'])
+            ausente_name = plazas.name(record['plaza_ausente_id'])
+            suplente_name = plazas.name(record['plaza_suplente_id'])
+            shift_display = plazas.shift_code(record['plaza_ausente_id'])
+
+            display_text = f"{ausente_name} ({shift_display}) ➡️ {suplente_name}"
+
+            if record_date not in sub_daily_assignments:
+                sub_daily_assignments[record_date] = []
+            sub_daily_assignments[record_date].append(display_text)
+
+    st.markdown("---")
+
+    calendar_payload = []
+    for day in quincena_days(sub_q_start_date, sub_q_end_date):
+        assigned_subs = sub_daily_assignments.get(day, [])
+        if assigned_subs:
+            calendar_payload.append(calendar_day(day, "info", f"Sustituciones: {len(assigned_subs)}",
+                                                 [{"id": None, "text": sub} for sub in assigned_subs]))
+        else:
+            calendar_payload.append(calendar_day(day, "success", note="Sin Sustituciones"))
+
+    with profiler.section("Calendario de sustituciones"):
+        action = quincena_calendar(calendar_payload, key="sub_calendar")
+    if action and action["action"] == "day":
+        # Clicking a day pre-fills the date of the form below.
+        st.session_state.sub_date = action["fecha"]
 
-            if turno_df_assign.empty:
-                st.info("No hay personal programado para este turno en la fecha seleccionada.")
+    st.markdown("---")
+
+    st.subheader("Formulario de Sustitución de Trabajador")
+    with st.form("substitution_form", clear_on_submit=True):
+        col1, col2 = st.columns(2)
+        with col1:
+            sustituido_display = st.selectbox("Trabajador Sustituido (Ausente):", options=plazas.display_names, key="sub_sustituido")
+            sustituido_details = plazas.by_display_name[sustituido_display]
+            st.caption(f"**Categoría:** {sustituido_details['categoria']}\n\n**Horario:** {sustituido_details['horario']}")
+        with col2:
+            sustituto_display = st.selectbox("Trabajador Sustituto (Cubre):", options=plazas.display_names, key="sub_sustituto")
+            sustituto_details = plazas.by_display_name[sustituto_display]
+            st.caption(f"**Categoría:** {sustituto_details['categoria']}\n\n**Horario:** {sustituto_details['horario']}")
+        st.markdown("---")
+        sustitucion_date = st.date_input("Fecha de Sustitución:", key="sub_date")
+        horario_a_sustituir = st.text_input("Horario a Sustituir:", placeholder="Ej: 07:00 a 15:00")
+        motivo_sub = st.text_input("Folio del Convenio:", key="sub_motivo")
+        sub_forzar = st.checkbox("Registrar aunque haya conflictos de ocupación", key="sub_forzar")
+        if st.form_submit_button("Registrar Sustitución"):
+            if sustituido_display == sustituto_display:
+                st.error("El trabajador sustituido y el sustituto no pueden ser la misma persona.")
             else:
-                service_options = ["", "Gob/Ens", "Cons/Far", "Urg", "Grls/Rx", "Rop/RPBI", "Pedia", "UTQ/Aneste", "QX/CE", "Pisos", "Hospi", "Lab", "ExahusCE", "Cam", "Ayudantia", "QX/UTQ/CE", "Grls/Cons", "Rop/Lab"]
-                service_selections = {}
-
-                for index, row in turno_df_assign.iterrows():
-                    default_assignment = asignaciones_existentes.get(row['plaza'], "")
-                    try:
-                        default_index = service_options.index(default_assignment)
-                    except ValueError:
-                        default_index = 0
-                    c1_assign, c2_assign = st.columns([2, 3])
-                    with c1_assign:
-                        st.write(row['nombre_actual'])
-                        st.caption(f"Plaza: {row['plaza']}")
-                    with c2_assign:
-                        service_selections[row['plaza']] = st.selectbox("Área de Servicio:", options=service_options, index=default_index, key=f"service_select_{row['plaza']}")
-
-                if st.button("Guardar Cambios de Asignación"):
-                    with st.spinner("Guardando..."):
-                        for plaza_id, area_servicio in service_selections.items():
-                            if area_servicio:
-                                payload = {"plaza_id": plaza_id, "fecha": assign_date.isoformat(), "turno": assign_turno, "area_servicio": area_servicio}
-                                try:
-                                    requests.post(f"{API_URL}/asignaciones/", json=payload).raise_for_status()
-                                except requests.exceptions.RequestException as e:
-                                    st.error(f"Error al guardar asignación para la plaza {plaza_id}: {e}")
-                        st.success("¡Todas las asignaciones han sido guardadas con éxito!")
-                        st.cache_data.clear()
-
-# --- TAB 5: REPORTS --- (IMPROVED)
-    with tab5:
-        st.header("Generación de Reportes 🗂️")
-        st.write("Seleccione el tipo de reporte que desea generar y descargar.")
-        
-        # --- Incidents Report ---
-        with st.expander("📝 Reporte de Incidencias"):
-            col1_inc, col2_inc = st.columns(2)
-            with col1_inc:
-                inc_start_date = st.date_input("Fecha de inicio:", key="inc_report_start")
-            with col2_inc:
-                inc_end_date = st.date_input("Fecha de fin:", key="inc_report_end")
-            
-            if st.button("Generar Reporte de Incidencias"):
-                with st.spinner("Generando reporte..."):
-                    excel_data = generate_incidents_report(inc_start_date, inc_end_date, plazas_df)
-                    if excel_data:
-                        st.success("¡Reporte de incidencias generado!")
-                        st.download_button(
-                            label="📥 Descargar Excel",
-                            data=excel_data,
-                            file_name=f"Reporte_Incidencias_{inc_start_date}_a_{inc_end_date}.xlsx",
-                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                        )
-                    else:
-                        st.warning("No se encontraron incidencias en el período seleccionado.")
-
-        # --- Substitutions Report ---
-        with st.expander("🔄 Reporte de Sustituciones"):
-            col1_sub, col2_sub = st.columns(2)
-            with col1_sub:
-                sub_start_date = st.date_input("Fecha de inicio:", key="sub_report_start")
-            with col2_sub:
-                sub_end_date = st.date_input("Fecha de fin:", key="sub_report_end")
-
-            if st.button("Generar Reporte de Sustituciones"):
-                with st.spinner("Generando reporte..."):
-                    excel_data = generate_substitutions_report(sub_start_date, sub_end_date, plazas_df)
-                    if excel_data:
-                        st.success("¡Reporte de sustituciones generado!")
-                        st.download_button(
-                            label="📥 Descargar Excel",
-                            data=excel_data,
-                            file_name=f"Reporte_Sustituciones_{sub_start_date}_a_{sub_end_date}.xlsx",
-                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                        )
-                    else:
-                        st.warning("No se encontraron sustituciones en el período seleccionado.")
-
-        # --- Assignments Report ---
-        with st.expander("📍 Reporte de Asignación de Servicios"):
-            col1_as, col2_as = st.columns(2)
-            with col1_as:
-                as_date = st.date_input("Seleccione la fecha:", key="as_report_date")
-            with col2_as:
-                as_shift = st.selectbox("Seleccione el Turno:", ["Matutino", "Vespertino", "Nocturno"], key="as_report_shift")
-            
-            if st.button("Generar Reporte de Asignaciones"):
-                with st.spinner("Generando reporte..."):
-                    excel_data = generate_assignments_report(as_date, as_shift, plazas_df)
-                    if excel_data:
-                        st.success("¡Reporte de asignaciones generado!")
+                sustituido_id = sustituido_details['plaza']
+                sustituto_id = sustituto_details['plaza']
+                full_motivo = f"Horario a sustituir: {horario_a_sustituir}. Motivo: {motivo_sub or 'N/A'}"
+                payload = {"fecha": sustitucion_date.isoformat(), "plaza_ausente_id": sustituido_id, "plaza_suplente_id": sustituto_id, "motivo": full_motivo}
+                try:
+                    api_session.post(f"{API_URL}/sustituciones/", json=payload, params={"forzar": sub_forzar}).raise_for_status()
+                    st.success("¡Sustitución registrada con éxito!")
+                    cache.invalidate_day("sustituciones", sustitucion_date)
+                    st.rerun()
+                except requests.exceptions.RequestException as e:
+                    if not show_conflicts(e):
+                        st.error(f"Error al registrar la sustitución: {e}")
+
+def render_tiempo_extra(plazas):
+    st.header("Planificación y Registro de Tiempo Extraordinario")
+    st.subheader("Planificar Coberturas Necesarias")
+
+    with st.form("coverage_need_form", clear_on_submit=True):
+        col1, col2 = st.columns(2)
+        with col1:
+            absent_worker_display = st.selectbox("Trabajador Ausente:", options=plazas.display_names)
+        with col2:
+            absence_period = st.date_input("Periodo de Ausencia (Del - Al):", [date.today(), date.today() + timedelta(days=7)])
+
+        if st.form_submit_button("Añadir Necesidad de Cobertura"):
+            if len(absence_period) == 2:
+                absent_plaza_id = plazas.by_display_name[absent_worker_display]['plaza']
+                payload = {
+                    "plaza_id_ausente": absent_plaza_id,
+                    "start_date": absence_period[0].isoformat(),
+                    "end_date": absence_period[1].isoformat()
+                }
+                try:
+                    api_session.post(f"{API_URL}/coberturas-necesarias/", json=payload).raise_for_status()
+                    cache.invalidate("coberturas_necesarias")
+                except requests.exceptions.RequestException as e:
+                    st.error(f"No se pudo guardar la necesidad: {e}")
+            else:
+                st.warning("Por favor seleccione un rango de dos fechas.")
+
+    overtime_planning_board(plazas)
+
+    st.markdown("---")
+
+    st.subheader("Registrar Tiempo Extra Asignado")
+    if "ot_date_pick" in st.session_state:
+        st.session_state.ot_date = st.session_state.pop("ot_date_pick")
+    suggestions = suggested_overtime(plazas, st.session_state.get("ot_date", date.today()))
+    suggested = []
+    for covered_display, names in suggestions:
+        st.caption(f"Sugeridos para cubrir a **{covered_display}**: {', '.join(names)}")
+        suggested += [name for name in names if name not in suggested]
+    employee_options = suggested + [name for name in plazas.display_names if name not in suggested]
+    with st.form("overtime_form", clear_on_submit=True):
+        ot_employee_display = st.selectbox("Seleccione el Empleado que realiza el tiempo extra:", options=employee_options, key="ot_employee")
+        ot_employee_details = plazas.by_display_name[ot_employee_display]
+        st.caption(f"**Categoría:** {ot_employee_details['categoria']}")
+        st.markdown("---")
+        covered_employee_display = st.selectbox("Seleccione el Empleado Cubierto (a quien se le cubre la ausencia):", options=plazas.display_names, key="ot_covered_employee")
+        folio_convenio = st.text_input("Folio de Convenio:", placeholder="Ej: VACACIONES, INCAPACIDAD, 12345/2025")
+        ot_date = st.date_input("Periodo (Fecha del Tiempo Extra):", key="ot_date")
+        ot_hours = st.number_input("Num. Horas Diarias:", min_value=0.5, max_value=24.0, value=8.0, step=0.5)
+        ot_forzar = st.checkbox("Registrar aunque haya conflictos de ocupación", key="ot_forzar")
+        if st.form_submit_button("Registrar Tiempo Extra"):
+            plaza_id = ot_employee_details['plaza']
+            motivo_final = f"Cubre a: {covered_employee_display}. Folio: {folio_convenio}"
+            payload = {"plaza_id": plaza_id, "fecha": ot_date.isoformat(), "horas": ot_hours, "motivo_cobertura": motivo_final}
+            try:
+                api_session.post(f"{API_URL}/tiempo-extra/", json=payload, params={"forzar": ot_forzar}).raise_for_status()
+                st.success("¡Tiempo extra registrado con éxito!")
+                cache.invalidate_day("tiempo_extra", ot_date)
+                st.rerun()
+            except requests.exceptions.RequestException as e:
+                if not show_conflicts(e):
+                    st.error(f"Error al registrar el tiempo extra: {e}")
+
+# The planning board (coverage needs + quincena calendar) is a fragment: its
+# delete buttons and confirmations rerun only this block, not the whole page.
+@st.fragment
+def overtime_planning_board(plazas):
+    planned_needs = get_coverage_needs()
+    if planned_needs:
+        st.write("Coberturas Planificadas:")
+        for need in planned_needs:
+            worker_name = plazas.name(need['plaza_id_ausente'])
+            c1, c2 = st.columns([4, 1])
+            c1.info(f"Cubrir a **{worker_name}** del {need['start_date']} al {need['end_date']}")
+            if c2.button("X", key=f"del_need_{need['id']}", help="Eliminar esta planificación"):
+                try:
+                    api_session.delete(f"{API_URL}/coberturas-necesarias/{need['id']}").raise_for_status()
+                    get_coverage_needs.clear()
+                    st.rerun(scope="fragment")
+                except requests.exceptions.RequestException as e:
+                    st.error("No se pudo eliminar.")
+
+    st.markdown("---")
+
+    st.subheader("Dashboard de Planeación Quincenal")
+
+    q_start_date = st.date_input("Seleccione el inicio de la quincena:", key="ot_q_date")
+    q_end_date = q_start_date + timedelta(days=14)
+
+    overtime_records = get_overtime_records(q_start_date, q_end_date)
+
+    daily_assignments = {}
+    if overtime_records:
+        for record in overtime_records:
+            record_date = date.fromisoformat(record['fecha'])
+            plaza_id = record['plaza_id']
+            worker_name = plazas.name(plaza_id, 'Desconocido')
+            motivo = record.get('motivo_cobertura', '')
+            match = re.search(r"Cubre a: (.*)\. Folio:", motivo)
+            covered_worker_display_name = match.group(1) if match else "N/A"
+            covered_worker = plazas.by_display_name.get(covered_worker_display_name)
+            shift_display = plazas.shift_code(covered_worker['plaza']) if covered_worker else "N/A"
+            assignment_info = {"id": record['id'], "display_text": f"{worker_name} (Cubre {shift_display})"}
+            if record_date not in daily_assignments:
+                daily_assignments[record_date] = []
+            daily_assignments[record_date].append(assignment_info)
+
+    coverage_needs_dict = {}
+    for need in planned_needs:
+        worker_info = plazas.by_plaza.get(need['plaza_id_ausente'])
+        if worker_info is None:
+            continue
+        shift_display = plazas.shift_code(worker_info['plaza'])
+        delta = date.fromisoformat(need['end_date']) - date.fromisoformat(need['start_date'])
+        for i in range(delta.days + 1):
+            day = date.fromisoformat(need['start_date']) + timedelta(days=i)
+            if not plazas.is_day_off(worker_info['plaza'], day):
+                display_text = f"{worker_info['nombre_actual']} ({shift_display})"
+                if day not in coverage_needs_dict:
+                    coverage_needs_dict[day] = []
+                coverage_needs_dict[day].append(display_text)
+
+    calendar_payload = []
+    for day in quincena_days(q_start_date, q_end_date):
+        assigned_workers_info = daily_assignments.get(day, [])
+        needed_coverage = coverage_needs_dict.get(day, [])
+        if needed_coverage and not assigned_workers_info:
+            calendar_payload.append(calendar_day(day, "info", f"Necesita: {len(needed_coverage)}",
+                                                 [{"id": None, "text": worker} for worker in needed_coverage]))
+        elif assigned_workers_info:
+            calendar_payload.append(calendar_day(day, "success", f"Cubierto por: {len(assigned_workers_info)}",
+                                                 [{"id": a['id'], "text": a['display_text']} for a in assigned_workers_info]))
+        else:
+            calendar_payload.append(calendar_day(day, "error", note="No Disponible"))
+
+    with profiler.section("Calendario de tiempo extra"):
+        action = quincena_calendar(calendar_payload, key="ot_calendar", deletable=True)
+    if action and action["action"] == "delete":
+        try:
+            api_session.delete(f"{API_URL}/tiempo-extra/{action['id']}").raise_for_status()
+            cache.invalidate_day("tiempo_extra", action["fecha"])
+            st.rerun(scope="fragment")
+        except requests.exceptions.RequestException as e:
+            st.error("No se pudo eliminar.")
+    elif action and action["action"] == "day":
+        # The overtime form lives outside this fragment: hand the date over and rerun the page.
+        st.session_state.ot_date_pick = action["fecha"]
+        st.rerun()
+
+    conflictos = get_conflicts(q_start_date, q_end_date)
+    if conflictos:
+        with st.expander(f"⚠️ {len(conflictos)} conflictos de ocupación en la quincena"):
+            st.dataframe(pd.DataFrame([
+                {"Fecha": c['fecha'], "Trabajador": plazas.name(c['plaza_id']), "Motivos": ", ".join(c['motivos'])}
+                for c in conflictos
+            ]), hide_index=True)
+
+    st.markdown("---")
+    st.subheader("Propuesta Automática de la Quincena")
+    col1, col2 = st.columns(2)
+    plan_max_horas = col1.number_input("Máximo de horas extra por trabajador:", min_value=8.0, max_value=240.0, value=48.0, step=8.0, key="ot_plan_max")
+    plan_folio = col2.text_input("Folio de Convenio:", key="ot_plan_folio")
+    if st.button("Proponer Asignación", key="ot_plan_run"):
+        params = {"start_date": q_start_date.isoformat(), "end_date": q_end_date.isoformat(),
+                  "max_horas": plan_max_horas, "folio": plan_folio}
+        try:
+            st.session_state.ot_plan = get_json("/tiempo-extra/plan", params)
+        except requests.exceptions.RequestException as e:
+            st.error(f"No se pudo calcular la propuesta: {e}")
+
+    plan = st.session_state.get("ot_plan")
+    if plan and plan['start_date'] == q_start_date.isoformat():
+        if plan['sin_cubrir']:
+            st.warning(f"{len(plan['sin_cubrir'])} días quedan sin cubrir con el máximo de horas elegido.")
+        if plan['asignaciones']:
+            st.dataframe(pd.DataFrame([
+                {"Fecha": a['fecha'], "Trabajador": plazas.name(a['plaza_id']), "Horas": a['horas'], "Motivo": a['motivo_cobertura']}
+                for a in plan['asignaciones']
+            ]), hide_index=True)
+            if st.button("Confirmar Propuesta", key="ot_plan_commit"):
+                registros = [{k: a[k] for k in ("plaza_id", "fecha", "horas", "motivo_cobertura")} for a in plan['asignaciones']]
+                try:
+                    api_session.post(f"{API_URL}/tiempo-extra/bulk", json=registros).raise_for_status()
+                    cache.invalidate("tiempo_extra")
+                    del st.session_state.ot_plan
+                    st.rerun(scope="fragment")
+                except requests.exceptions.RequestException as e:
+                    if not show_conflicts(e):
+                        st.error(f"No se pudo registrar la propuesta: {e}")
+
+def render_asignaciones(plazas):
+    st.header("Asignación de Servicios por Turno")
+    col1_assign, col2_assign = st.columns(2)
+    with col1_assign:
+        assign_date = st.date_input("Seleccione la Fecha:", key="assign_page_date")
+    with col2_assign:
+        assign_turno = st.selectbox("Seleccione el Turno:", ["Matutino", "Vespertino", "Nocturno"], key="assign_page_turno")
+
+    turno_df_assign = plazas.active_workers(assign_date, assign_turno)
+
+    asignaciones_existentes = {
+        **get_asignaciones(assign_date, assign_turno),
+        **outbox.pending_values("asignacion", "area_servicio", fecha=assign_date.isoformat(), turno=assign_turno),
+    }
+
+    st.markdown("---")
+    st.subheader(f"Plantilla del Turno {assign_turno} para el {assign_date.strftime('%d/%m/%Y')}")
+
+    if turno_df_assign.empty:
+        st.info("No hay personal programado para este turno en la fecha seleccionada.")
+    else:
+        service_options = ["", "Gob/Ens", "Cons/Far", "Urg", "Grls/Rx", "Rop/RPBI", "Pedia", "UTQ/Aneste", "QX/CE", "Pisos", "Hospi", "Lab", "ExahusCE", "Cam", "Ayudantia", "QX/UTQ/CE", "Grls/Cons", "Rop/Lab"]
+        grid = roster_grid(turno_df_assign, "Área de Servicio", asignaciones_existentes, "", service_options)
+
+        with st.form(f"assign_form_{assign_date}_{assign_turno}"):
+            edited = st.data_editor(
+                grid, key=f"assign_grid_{assign_date}_{assign_turno}", hide_index=True, use_container_width=True,
+                disabled=["Nombre", "Plaza"], num_rows="fixed",
+                column_config={"Área de Servicio": st.column_config.SelectboxColumn("Área de Servicio", options=service_options)},
+            )
+            if st.form_submit_button("Guardar Cambios de Asignación"):
+                outbox.enqueue("asignacion", [
+                    {"plaza_id": plaza_id, "fecha": assign_date.isoformat(), "turno": assign_turno, "area_servicio": area_servicio}
+                    for plaza_id, area_servicio in zip(edited["Plaza"], edited["Área de Servicio"]) if area_servicio
+                ])
+                st.success("¡Asignaciones guardadas! Se sincronizarán con el servidor en segundo plano.")
+
+def render_reportes(plazas):
+    st.header("Generación de Reportes 🗂️")
+    st.write("Seleccione el tipo de reporte que desea generar y descargar.")
+
+    # --- Incidents Report ---
+    with st.expander("📝 Reporte de Incidencias"):
+        col1_inc, col2_inc = st.columns(2)
+        with col1_inc:
+            inc_start_date = st.date_input("Fecha de inicio:", key="inc_report_start")
+        with col2_inc:
+            inc_end_date = st.date_input("Fecha de fin:", key="inc_report_end")
+
+        if st.button("Generar Reporte de Incidencias"):
+            with st.spinner("Generando reporte..."):
+                excel_data = generate_incidents_report(inc_start_date, inc_end_date, plazas)
+                if excel_data:
+                    st.success("¡Reporte de incidencias generado!")
+                    st.download_button(
+                        label="📥 Descargar Excel",
+                        data=excel_data,
+                        file_name=f"Reporte_Incidencias_{inc_start_date}_a_{inc_end_date}.xlsx",
+                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                    )
+                else:
+                    st.warning("No se encontraron incidencias en el período seleccionado.")
+
+    # --- Substitutions Report ---
+    with st.expander("🔄 Reporte de Sustituciones"):
+        col1_sub, col2_sub = st.columns(2)
+        with col1_sub:
+            sub_start_date = st.date_input("Fecha de inicio:", key="sub_report_start")
+        with col2_sub:
+            sub_end_date = st.date_input("Fecha de fin:", key="sub_report_end")
+
+        if st.button("Generar Reporte de Sustituciones"):
+            with st.spinner("Generando reporte..."):
+                excel_data = generate_substitutions_report(sub_start_date, sub_end_date, plazas)
+                if excel_data:
+                    st.success("¡Reporte de sustituciones generado!")
+                    st.download_button(
+                        label="📥 Descargar Excel",
+                        data=excel_data,
+                        file_name=f"Reporte_Sustituciones_{sub_start_date}_a_{sub_end_date}.xlsx",
+                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                    )
+                else:
+                    st.warning("No se encontraron sustituciones en el período seleccionado.")
+
+    # --- Assignments Report ---
+    with st.expander("📍 Reporte de Asignación de Servicios"):
+        col1_as, col2_as = st.columns(2)
+        with col1_as:
+            as_date = st.date_input("Seleccione la fecha:", key="as_report_date")
+        with col2_as:
+            as_shift = st.selectbox("Seleccione el Turno:", ["Matutino", "Vespertino", "Nocturno"], key="as_report_shift")
+
+        if st.button("Generar Reporte de Asignaciones"):
+            with st.spinner("Generando reporte..."):
+                excel_data = generate_assignments_report(as_date, as_shift, plazas)
+                if excel_data:
+                    st.success("¡Reporte de asignaciones generado!")
+                    st.download_button(
+                        label="📥 Descargar Excel",
+                        data=excel_data,
+                        file_name=f"Reporte_Asignaciones_{as_date}_{as_shift}.xlsx",
+                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                    )
+                else:
+                    st.warning("No se encontraron asignaciones para la fecha y turno seleccionados.")
+
+    # --- Overtime Report (using official template) ---
+    with st.expander("➕ Reporte de Tiempo Extra (Plantilla Oficial)"):
+        today = date.today()
+        default_start = today.replace(day=1) if today.day <= 15 else today.replace(day=16)
+        default_end = today.replace(day=15) if today.day <= 15 else (today.replace(day=1) + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+        col1_ot, col2_ot = st.columns(2)
+        with col1_ot:
+            ot_start_date = st.date_input("Fecha de inicio:", value=default_start, key="ot_report_start")
+        with col2_ot:
+            ot_end_date = st.date_input("Fecha de fin:", value=default_end, key="ot_report_end")
+
+        if st.button("📊 Generar Reporte de Tiempo Extra"):
+            with st.spinner("Generando reporte..."):
+                overtime_to_report = get_overtime_records(ot_start_date, ot_end_date)
+                if overtime_to_report:
+                    excel_file = generate_overtime_template_report(overtime_to_report, plazas)
+                    if excel_file:
+                        st.success("¡Reporte generado con éxito!")
                         st.download_button(
-                            label="📥 Descargar Excel",
-                            data=excel_data,
-                            file_name=f"Reporte_Asignaciones_{as_date}_{as_shift}.xlsx",
+                            label="📥 Descargar Reporte Oficial",
+                            data=excel_file,
+                            file_name=f"Reporte_Oficial_Tiempo_Extra_{ot_start_date}_a_{ot_end_date}.xlsx",
                             mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
                         )
-                    else:
-                        st.warning("No se encontraron asignaciones para la fecha y turno seleccionados.")
-
-        # --- Overtime Report (using official template) ---
-        with st.expander("➕ Reporte de Tiempo Extra (Plantilla Oficial)"):
-            today = date.today()
-            default_start = today.replace(day=1) if today.day <= 15 else today.replace(day=16)
-            default_end = today.replace(day=15) if today.day <= 15 else (today.replace(day=1) + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-            
-            col1_ot, col2_ot = st.columns(2)
-            with col1_ot:
-                ot_start_date = st.date_input("Fecha de inicio:", value=default_start, key="ot_report_start")
-            with col2_ot:
-                ot_end_date = st.date_input("Fecha de fin:", value=default_end, key="ot_report_end")
-
-            if st.button("📊 Generar Reporte de Tiempo Extra"):
-                with st.spinner("Generando reporte..."):
-                    overtime_to_report = get_overtime_records(ot_start_date, ot_end_date)
-                    if overtime_to_report:
-                        excel_file = generate_overtime_template_report(overtime_to_report, plazas_df)
-                        if excel_file:
-                            st.success("¡Reporte generado con éxito!")
-                            st.download_button(
-                                label="📥 Descargar Reporte Oficial",
-                                data=excel_file,
-                                file_name=f"Reporte_Oficial_Tiempo_Extra_{ot_start_date}_a_{ot_end_date}.xlsx",
-                                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                            )
-                    else:
-                        st.warning("No se encontraron registros de tiempo extra en el período seleccionado.")
+                else:
+                    st.warning("No se encontraron registros de tiempo extra en el período seleccionado.")
 
-        with tab6:
-    # La llamada a la función ahora está correctamente indentada
-            render_admin_panel()
-
-def render_admin_panel():
+def render_admin_panel(plazas):
     st.title("⚙️ Panel de Administración")
     st.write("Gestione el personal, plazas y coberturas temporales.")
+    profiler.render_toggle()
+
+    # Sub-secciones para organizar las funciones de admin
+    admin_pages = {
+        "👤 Gestionar Plazas": lambda: manage_existing_plazas(plazas),
+        "➕ Crear Nueva Plaza": create_new_plaza,
+        "🧑‍⚕️ Gestionar Trabajadores Eventuales": lambda: manage_eventuales(plazas),
+    }
+    admin_page = st.radio("Sección de administración", list(admin_pages), horizontal=True,
+                          key="admin_page", label_visibility="collapsed")
+    admin_pages[admin_page]()
+
+PAGES = {
+    "📝 Pase de Lista": render_pase_de_lista,
+    "🔄 Sustituciones": render_sustituciones,
+    "⏰ Tiempo Extra": render_tiempo_extra,
+    "🗺️ Asignación de Servicios": render_asignaciones,
+    "🗂️ Reportes": render_reportes,
+    "⚙️ Administración": render_admin_panel,
+}
+
+# Undated reads each page makes besides get_plazas(), as (fetcher, API path), and
+# the pages whose fetchers read from the replica.
+PAGE_READS = {
+    "⏰ Tiempo Extra": [(get_coverage_needs, "/coberturas-necesarias/")],
+    "⚙️ Administración": [(get_coberturas_temporales, "/coberturas-temporales/")],
+}
+REPLICA_PAGES = {"📝 Pase de Lista", "🔄 Sustituciones", "⏰ Tiempo Extra", "🗺️ Asignación de Servicios"}
+
+def prefetch_page(page):
+    """
+    Fetches the reads this rerun will miss in the cache with one POST /batch,
+    instead of one request per fetcher. On failure the fetchers just make their
+    own requests.
+    """
+    reads = [] if get_plazas.is_cached() else [("/plazas/", None)]
+    reads += [(path, None) for fetcher, path in PAGE_READS.get(page, ()) if not fetcher.is_cached()]
+    sync = replica.pending_request() if page in REPLICA_PAGES else None
+    if sync:
+        reads.append(sync)
+    if len(reads) > 1:
+        try:
+            prefetch(reads)
+        except requests.exceptions.RequestException:
+            pass
+
+PERSISTENT_WIDGET_KEYS = [
+    "inc_page_date", "inc_page_turno", "sub_q_date", "ot_q_date",
+    "assign_page_date", "assign_page_turno",
+]
 
-    # Sub-pestañas para organizar las funciones de admin
-    admin_tab1, admin_tab2, admin_tab3 = st.tabs([
-        "👤 Gestionar Plazas",
-        "➕ Crear Nueva Plaza",
-        "🧑‍⚕️ Gestionar Trabajadores Eventuales"
-    ])
+# --- Main Application Logic ---
+@st.fragment(run_every=5)
+def render_sync_status():
+    """Estado de la bandeja de salida local, refrescado cada 5 s sin recargar la página."""
+    counts = outbox.status_counts()
+    if counts["pendiente"]:
+        st.info(f"🔄 {counts['pendiente']} cambio(s) pendiente(s) de sincronizar.")
+        if counts["error"]:
+            st.caption(f"Último error: {counts['error']}")
+    elif counts["rechazado"]:
+        st.error(f"⚠️ {counts['rechazado']} cambio(s) rechazado(s) por el servidor: {counts['error']}")
+    else:
+        st.caption("✅ Todos los cambios están sincronizados.")
 
-    with admin_tab1:
-        manage_existing_plazas()
+def main_app():
+    st.sidebar.title(f"Bienvenido, {st.session_state['username']}!")
+    if st.sidebar.button("Cerrar Sesión"):
+        st.session_state["logged_in"] = False
+        st.rerun()
+
+    st.title("📋 SGO - Limpieza e Higiene HGSZ 33")
+
+    # Fragments can't write to st.sidebar themselves; they must be called inside it.
+    with st.sidebar:
+        render_sync_status()
+
+    prefetch_page(st.session_state.get("nav_page", next(iter(PAGES))))
+    plazas = get_plazas()
+
+    if plazas.empty:
+        st.warning("Could not load employee data from the API.")
+        return
 
-    with admin_tab2:
-        create_new_plaza()
+    # Widget state is dropped for pages that aren't drawn; re-assigning it keeps
+    # each page's date/shift selection while the user visits other pages.
+    for key in PERSISTENT_WIDGET_KEYS:
+        if key in st.session_state:
+            st.session_state[key] = st.session_state[key]
 
-    with admin_tab3:
-        manage_eventuales()
+    selected_page = st.radio("Sección", list(PAGES), horizontal=True, key="nav_page", label_visibility="collapsed")
+    with profiler.section(selected_page):
+        PAGES[selected_page](plazas)
 
 
 # --- Main Script Execution ---
+live_updates.start()
+outbox.start()
 if check_password():
+    profiler.start_rerun()
     main_app()
+    profiler.render_panel()
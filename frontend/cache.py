@@ -0,0 +1,286 @@
+import functools
+import hashlib
+import logging
+import os
+import pickle
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+import profiler
+
+logger = logging.getLogger(__name__)
+
+# Capa compartida entre réplicas: SGO_CACHE_URL=redis://host:6379/0, o memory://
+# para probar en local con el sustituto en memoria. Sin valor sólo se usa la LRU local.
+CACHE_URL = os.environ.get("SGO_CACHE_URL", "")
+KEY_PREFIX = os.environ.get("SGO_CACHE_PREFIX", "sgo")
+LOCAL_MAX_ENTRIES = int(os.environ.get("SGO_CACHE_LOCAL_ENTRIES", "512"))
+LOCAL_MAX_BYTES = int(os.environ.get("SGO_CACHE_LOCAL_MB", "64")) * 1024 * 1024
+# Payloads bigger than this stay in the local tier only.
+SHARED_MAX_VALUE_BYTES = int(os.environ.get("SGO_CACHE_SHARED_MAX_KB", "2048")) * 1024
+# How long a replica trusts the table versions it last read from the shared tier.
+VERSION_TTL = float(os.environ.get("SGO_CACHE_VERSION_TTL", "2"))
+
+# Set by live_updates while its /events stream is connected: invalidation then
+# keeps entries fresh and fetchers can use their longer `live_ttl`.
+live = False
+
+# Callables notified with the names passed to every invalidate() call.
+invalidation_listeners = []
+
+
+# Returned by LocalLRU.get on a miss, so a cached None is still a hit.
+MISS = object()
+
+
+class Uncached:
+    """
+    Wraps what a fetcher returns when it could not get real data (e.g. an empty
+    fallback after an API error): the caller gets the value, but it is stored in
+    neither tier, so the next call tries the API again.
+    """
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+
+class LocalLRU:
+    """In-process LRU with per-entry expiry, capped by entry count and by payload bytes."""
+    def __init__(self, max_entries=LOCAL_MAX_ENTRIES, max_bytes=LOCAL_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()  # key -> (expires_at, size, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return MISS
+            if entry[0] < time.monotonic():
+                self._pop(key)
+                return MISS
+            self._data.move_to_end(key)
+            return entry[2]
+
+    def set(self, key, value, ttl, size):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+            self._data[key] = (time.monotonic() + ttl, size, value)
+            self._bytes += size
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                self._pop(next(iter(self._data)))
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def _pop(self, key):
+        self._bytes -= self._data.pop(key)[1]
+
+
+class MemoryStore:
+    """
+    Stand-in for Redis with the subset of commands used here (get, set with ex,
+    mget, incr). Lets the shared tier be exercised locally without a server.
+    """
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key):
+        entry = self._data.get(key)
+        if entry and entry[0] is not None and entry[0] < time.monotonic():
+            del self._data[key]
+            return None
+        return entry
+
+    def get(self, key):
+        with self._lock:
+            entry = self._live(key)
+            return entry[1] if entry else None
+
+    def mget(self, keys):
+        with self._lock:
+            return [entry[1] if entry else None for entry in map(self._live, keys)]
+
+    def set(self, key, value, ex=None):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ex if ex else None, value)
+
+    def incr(self, key):
+        with self._lock:
+            entry = self._live(key)
+            value = int(entry[1]) + 1 if entry else 1
+            self._data[key] = (None, str(value).encode())
+            return value
+
+
+def _connect(url):
+    if not url:
+        return None
+    if url.startswith("memory://"):
+        return MemoryStore()
+    try:
+        import redis
+    except ImportError:
+        logger.warning("SGO_CACHE_URL está definido pero el paquete 'redis' no está instalado; se usa sólo la caché local.")
+        return None
+    return redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+
+
+local = LocalLRU()
+shared = _connect(CACHE_URL)
+
+# table -> (version, read_at). Versions only ever grow, so a replica that reads
+# a newer one simply stops addressing the entries stored under the old one.
+_versions = {}
+_versions_lock = threading.Lock()
+
+
+def _shared_call(method, *args, **kwargs):
+    """Runs a command on the shared tier; a down Redis degrades to local-only caching."""
+    if shared is None:
+        return None
+    try:
+        return getattr(shared, method)(*args, **kwargs)
+    except Exception as e:
+        logger.warning("Caché compartida no disponible (%s): %s", method, e)
+        return None
+
+def _version_key(table):
+    return f"{KEY_PREFIX}:version:{table}"
+
+def table_versions(tables):
+    now = time.monotonic()
+    with _versions_lock:
+        stale = [t for t in tables if t not in _versions or now - _versions[t][1] > VERSION_TTL]
+    if stale:
+        values = _shared_call("mget", [_version_key(t) for t in stale]) or [None] * len(stale)
+        with _versions_lock:
+            for table, value in zip(stale, values):
+                known = _versions.get(table, (0, 0))[0]
+                _versions[table] = (max(known, int(value or 0)), now)
+    with _versions_lock:
+        return tuple(_versions[t][0] for t in tables)
+
+def invalidate(*tables):
+    """
+    Marks the given tables as changed. Every cached result that depends on them
+    is bypassed from now on, in this replica and, through the shared tier, in all
+    the others within VERSION_TTL seconds.
+    """
+    now = time.monotonic()
+    for table in tables:
+        new_version = _shared_call("incr", _version_key(table))
+        with _versions_lock:
+            known = _versions.get(table, (0, 0))[0]
+            _versions[table] = (max(known + 1, int(new_version or 0)), now)
+    for listener in invalidation_listeners:
+        listener(tables)
+
+def any_day_scope(table):
+    """Version name bumped by every day-scoped change to `table` (see invalidate_day)."""
+    return f"{table}@*"
+
+def day_scope(table, day, turno=None):
+    """Version name for the rows of `table` on one day (and one turno)."""
+    scope = f"{table}@{day.isoformat()}"
+    return f"{scope}/{turno}" if turno else scope
+
+def month_scopes(table, start, end):
+    """Version names for every month touched by [start, end], for range fetchers."""
+    months = []
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        months.append(f"{table}@{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+def invalidate_day(table, day, turno=None):
+    """
+    Invalidates only what a change to `table` on `day` can affect: the fetchers
+    scoped to that day (and turno), the range fetchers covering its month and
+    the fetchers that read `table` without declaring scopes for it.
+    """
+    names = [day_scope(table, day), month_scopes(table, day, day)[0], any_day_scope(table)]
+    if turno:
+        names.append(day_scope(table, day, turno))
+    invalidate(*names)
+
+def _version_names(tables, scopes, args, kwargs):
+    """
+    The versions a call depends on: its tables, its scopes and, for every table
+    the scopes don't cover, the table's any-day scope, so day-scoped
+    invalidations still reach fetchers that read it unscoped.
+    """
+    scope_names = tuple(scopes(*args, **kwargs)) if scopes else ()
+    scoped = {name.split("@", 1)[0] for name in scope_names}
+    return tables + scope_names + tuple(any_day_scope(t) for t in tables if t not in scoped)
+
+def _make_key(name, versions, args, kwargs):
+    digest = hashlib.sha1(repr((args, sorted(kwargs.items()))).encode()).hexdigest()
+    return f"{KEY_PREFIX}:{name}:{'.'.join(map(str, versions))}:{digest}"
+
+
+def cached(ttl, tables, scopes=None, live_ttl=None):
+    """
+    Caches a fetcher in two tiers: the local LRU and, if configured, the shared
+    tier. Entries expire after `ttl` seconds (`live_ttl` while change events are
+    being received) or as soon as one of `tables` is invalidated. `scopes`, called
+    with the fetcher's arguments, adds finer-grained versions (see day_scope and
+    month_scopes); a table without scopes is invalidated by any day-scoped
+    change. A fetcher returns its fallbacks wrapped in Uncached so they are not
+    cached. Hits and misses per tier are reported to the profiler.
+    `fn.clear()` invalidates the function's tables; `fn.is_cached(...)` tells
+    whether a call with those arguments would be a local hit.
+    """
+    tables = tuple(tables)
+
+    def decorator(fn):
+        name = fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            names = _version_names(tables, scopes, args, kwargs)
+            key = _make_key(name, table_versions(names), args, kwargs)
+            entry_ttl = live_ttl if live and live_ttl else ttl
+            tier = "local"
+            value = local.get(key)
+            if value is MISS:
+                blob = _shared_call("get", key)
+                if blob is not None:
+                    tier = "compartida"
+                    value = pickle.loads(zlib.decompress(blob))
+                    local.set(key, value, entry_ttl, len(blob))
+                else:
+                    tier = None
+                    value = fn(*args, **kwargs)
+                    if isinstance(value, Uncached):
+                        profiler.record_cache(name, tier, time.perf_counter() - start)
+                        return value.value
+                    blob = zlib.compress(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+                    local.set(key, value, entry_ttl, len(blob))
+                    if len(blob) <= SHARED_MAX_VALUE_BYTES:
+                        _shared_call("set", key, blob, ex=int(entry_ttl))
+            profiler.record_cache(name, tier, time.perf_counter() - start)
+            return value
+
+        def is_cached(*args, **kwargs):
+            names = _version_names(tables, scopes, args, kwargs)
+            return local.get(_make_key(name, table_versions(names), args, kwargs)) is not MISS
+
+        wrapper.clear = lambda: invalidate(*tables)
+        wrapper.is_cached = is_cached
+        wrapper.tables = tables
+        return wrapper
+    return decorator
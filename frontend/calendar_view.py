@@ -0,0 +1,45 @@
+import os
+from datetime import date, timedelta
+
+import streamlit as st
+import streamlit.components.v1 as components
+
+# Calendario de la quincena como un solo componente HTML: recibe todos los días en
+# un payload JSON, se dibuja en el navegador y sólo devuelve la acción del usuario.
+_component = components.declare_component(
+    "quincena_calendar", path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "calendar_component")
+)
+
+DAYS_OF_WEEK = ["Lun", "Mar", "Mié", "Jue", "Vie", "Sáb", "Dom"]
+
+
+def calendar_day(day, status, title="", entries=(), note=""):
+    """
+    One cell of the payload. `status` is "info", "success" or "error" (same colors
+    as st.info/st.success/st.error); `entries` are {"id", "text"} dicts.
+    """
+    return {
+        "fecha": day.isoformat(),
+        "label": f"{DAYS_OF_WEEK[day.weekday()]} {day.day}",
+        "status": status,
+        "title": title,
+        "entries": list(entries),
+        "note": note,
+    }
+
+def quincena_days(start_date, end_date):
+    return [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+
+def quincena_calendar(days, key, deletable=False):
+    """
+    Renders the calendar and returns the user's new action, or None:
+    {"action": "day", "fecha": date} or {"action": "delete", "id": ..., "fecha": date}.
+    The component keeps returning its last value on every rerun, so each action
+    is handed out only once (tracked by its nonce in session_state).
+    """
+    value = _component(days=days, deletable=deletable, key=key, default=None)
+    handled_key = f"{key}_handled_nonce"
+    if not value or value.get("nonce") == st.session_state.get(handled_key):
+        return None
+    st.session_state[handled_key] = value["nonce"]
+    return {**value, "fecha": date.fromisoformat(value["fecha"])}
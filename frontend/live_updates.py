@@ -0,0 +1,97 @@
+import json
+import logging
+import os
+import threading
+import time
+from datetime import date
+
+import requests
+
+import cache
+from api_client import API_URL
+
+logger = logging.getLogger(__name__)
+
+# Escucha GET /events del API y descarta de la caché sólo lo que cambió.
+# Se desactiva con SGO_LIVE_UPDATES=0 (los fetchers vuelven a depender del TTL).
+ENABLED = os.environ.get("SGO_LIVE_UPDATES", "1").lower() not in ("0", "false", "off")
+# The server sends a keepalive every 15 s; a silent stream for longer than this is dead.
+READ_TIMEOUT = 45
+MAX_BACKOFF = 30
+
+# Every table a change notice can name; an `event: reset` invalidates all of them.
+TABLES = ("plazas", "incidentes", "sustituciones", "tiempo_extra", "asignaciones_servicio",
+          "coberturas_necesarias", "coberturas_temporales")
+
+_started = False
+_start_lock = threading.Lock()
+
+
+def apply_notice(notice):
+    """Evicts the cache entries affected by one change notice."""
+    table = notice.get("table")
+    if table not in TABLES:
+        return
+    if notice.get("fecha"):
+        cache.invalidate_day(table, date.fromisoformat(notice["fecha"]), notice.get("turno"))
+    else:
+        cache.invalidate(table)
+
+def _read_events(response):
+    """Parses a text/event-stream body into (id, event, data) tuples."""
+    event_id, event_name, data = None, "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if line is None:
+            continue
+        if line == "":
+            if data:
+                yield event_id, event_name, "\n".join(data)
+            event_name, data = "message", []
+        elif line.startswith(":"):
+            continue
+        else:
+            field, _, value = line.partition(":")
+            value = value[1:] if value.startswith(" ") else value
+            if field == "id":
+                event_id = value
+            elif field == "event":
+                event_name = value
+            elif field == "data":
+                data.append(value)
+
+def _listen():
+    session = requests.Session()
+    last_event_id = None
+    backoff = 1
+    while True:
+        headers = {"Accept": "text/event-stream", "Accept-Encoding": "identity"}
+        if last_event_id:
+            headers["Last-Event-ID"] = last_event_id
+        try:
+            with session.get(f"{API_URL}/events", headers=headers, stream=True, timeout=(5, READ_TIMEOUT)) as response:
+                response.raise_for_status()
+                cache.live = True
+                backoff = 1
+                for event_id, event_name, data in _read_events(response):
+                    if event_id:
+                        last_event_id = event_id
+                    if event_name == "reset":
+                        cache.invalidate(*TABLES)
+                    elif event_name == "change":
+                        apply_notice(json.loads(data))
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.warning("Conexión a /events perdida: %s", e)
+        cache.live = False
+        time.sleep(backoff)
+        backoff = min(backoff * 2, MAX_BACKOFF)
+
+def start():
+    """Starts the listener thread once per process; later calls (every rerun) are no-ops."""
+    global _started
+    if not ENABLED:
+        return
+    with _start_lock:
+        if _started:
+            return
+        threading.Thread(target=_listen, name="sgo-live-updates", daemon=True).start()
+        _started = True
@@ -0,0 +1,188 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import date
+
+import requests
+
+import cache
+from api_client import API_URL, session as api_session
+
+logger = logging.getLogger(__name__)
+
+# Bandeja de salida local: los cambios del pase de lista y de las asignaciones se
+# guardan primero en SQLite y un hilo los envía a los endpoints /bulk del API.
+OUTBOX_PATH = os.environ.get("SGO_OUTBOX_PATH", "sgo_outbox.sqlite3")
+FLUSH_INTERVAL = float(os.environ.get("SGO_OUTBOX_FLUSH_SECONDS", "2"))
+BATCH_SIZE = 500
+MAX_BACKOFF = 300
+
+# kind -> (bulk endpoint, fields forming the coalescing key, date field, turno field, cached table)
+KINDS = {
+    "incidente": ("/incidentes/bulk", ("plaza_id", "fecha_incidente"), "fecha_incidente", None, "incidentes"),
+    "asignacion": ("/asignaciones/bulk", ("plaza_id", "fecha", "turno"), "fecha", "turno", "asignaciones_servicio"),
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    kind TEXT NOT NULL,
+    item_key TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    revision INTEGER NOT NULL DEFAULT 1,
+    status TEXT NOT NULL DEFAULT 'pendiente',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (kind, item_key)
+)
+"""
+
+_local = threading.local()
+_wakeup = threading.Event()
+_started = False
+_start_lock = threading.Lock()
+
+
+def _connect():
+    """One connection per thread (Streamlit script threads and the flusher)."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(OUTBOX_PATH, timeout=10, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(_SCHEMA)
+        _local.conn = conn
+    return conn
+
+def _item_key(kind, payload):
+    return "|".join(str(payload[field]) for field in KINDS[kind][1])
+
+
+def enqueue(kind, payloads):
+    """
+    Records the changes locally and returns immediately. A newer change for the
+    same key (e.g. the same plaza and fecha) replaces the pending one, so only
+    the latest value is sent. `revision` lets the flusher tell whether a row was
+    edited again while its batch was in flight.
+    """
+    now = time.time()
+    rows = [(kind, _item_key(kind, p), json.dumps(p), now) for p in payloads]
+    conn = _connect()
+    with conn:
+        conn.executemany(
+            """INSERT INTO outbox (kind, item_key, payload, updated_at) VALUES (?, ?, ?, ?)
+               ON CONFLICT (kind, item_key) DO UPDATE SET
+                   payload = excluded.payload, revision = revision + 1, status = 'pendiente',
+                   attempts = 0, next_attempt = 0, last_error = NULL, updated_at = excluded.updated_at""",
+            rows,
+        )
+    _wakeup.set()
+
+def pending_values(kind, field, **filters):
+    """
+    `plaza_id -> payload[field]` for changes not yet synced that match `filters`,
+    so a screen can show what the user saved before the API has it.
+    """
+    conn = _connect()
+    values = {}
+    for (payload,) in conn.execute("SELECT payload FROM outbox WHERE kind = ? AND status IN ('pendiente', 'error')", (kind,)):
+        item = json.loads(payload)
+        if all(item.get(name) == value for name, value in filters.items()):
+            values[item["plaza_id"]] = item[field]
+    return values
+
+def status_counts():
+    conn = _connect()
+    counts = dict(conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+    last_error = conn.execute(
+        "SELECT last_error FROM outbox WHERE status IN ('error', 'rechazado') ORDER BY updated_at DESC LIMIT 1"
+    ).fetchone()
+    return {
+        "pendiente": counts.get("pendiente", 0) + counts.get("error", 0),
+        "rechazado": counts.get("rechazado", 0),
+        "sincronizado": counts.get("sincronizado", 0),
+        "error": last_error[0] if last_error else None,
+    }
+
+
+def _mark(conn, kind, rows, status, error=None):
+    with conn:
+        conn.executemany(
+            """UPDATE outbox SET status = ?, attempts = attempts + 1, next_attempt = ?, last_error = ?
+               WHERE kind = ? AND item_key = ? AND revision = ?""",
+            [(status, time.time() + min(2 ** attempts, MAX_BACKOFF), error, kind, key, revision)
+             for key, _, revision, attempts in rows],
+        )
+
+def _send(conn, kind, rows):
+    """
+    Posts `rows` to the kind's bulk endpoint and records the outcome. A 4xx
+    means some item will never be accepted as is: the batch is split in halves
+    and resent until the rejected items are isolated, so the valid ones in the
+    same batch still go through. Returns the number of items synced.
+    """
+    endpoint, _, date_field, turno_field, table = KINDS[kind]
+    payloads = [json.loads(row[1]) for row in rows]
+    try:
+        api_session.post(f"{API_URL}{endpoint}", json=payloads, timeout=30).raise_for_status()
+    except requests.exceptions.RequestException as e:
+        status_code = getattr(e.response, "status_code", None)
+        rejected = status_code is not None and 400 <= status_code < 500 and status_code not in (408, 429)
+        if rejected and len(rows) > 1:
+            middle = len(rows) // 2
+            return _send(conn, kind, rows[:middle]) + _send(conn, kind, rows[middle:])
+        _mark(conn, kind, rows, "rechazado" if rejected else "error", str(e))
+        logger.warning("No se pudo sincronizar %s (%d cambios): %s", kind, len(rows), e)
+        return 0
+    with conn:
+        conn.executemany(
+            """UPDATE outbox SET status = 'sincronizado', last_error = NULL
+               WHERE kind = ? AND item_key = ? AND revision = ?""",
+            [(kind, key, revision) for key, _, revision, _ in rows],
+        )
+    for day, turno in {(p[date_field], p.get(turno_field) if turno_field else None) for p in payloads}:
+        cache.invalidate_day(table, date.fromisoformat(day), turno)
+    return len(rows)
+
+def flush_once():
+    """Sends every due pending batch. Returns the number of items synced."""
+    conn = _connect()
+    synced = 0
+    for kind in KINDS:
+        rows = conn.execute(
+            """SELECT item_key, payload, revision, attempts FROM outbox
+               WHERE kind = ? AND status IN ('pendiente', 'error') AND next_attempt <= ?
+               ORDER BY updated_at LIMIT ?""",
+            (kind, time.time(), BATCH_SIZE),
+        ).fetchall()
+        if rows:
+            synced += _send(conn, kind, rows)
+    # Synced and rejected rows are only kept for the status counters of the last day.
+    with conn:
+        conn.execute("DELETE FROM outbox WHERE status IN ('sincronizado', 'rechazado') AND updated_at < ?", (time.time() - 86400,))
+    return synced
+
+def _run():
+    while True:
+        _wakeup.wait(FLUSH_INTERVAL)
+        _wakeup.clear()
+        try:
+            flush_once()
+        except sqlite3.Error as e:
+            logger.error("Error en la bandeja de salida local: %s", e)
+        except Exception:
+            # Anything else must not end the thread: the queued changes would never be sent.
+            logger.exception("Error inesperado al sincronizar la bandeja de salida")
+
+def start():
+    """Starts the background flusher once per process; later calls are no-ops."""
+    global _started
+    with _start_lock:
+        if _started:
+            return
+        threading.Thread(target=_run, name="sgo-outbox", daemon=True).start()
+        _started = True
@@ -0,0 +1,112 @@
+import pandas as pd
+
+SHIFTS = ["Matutino", "Vespertino", "Nocturno"]
+
+# Mapa de días de descanso: Asocia el string de descanso con los números de día de la semana
+# Lunes=0, Martes=1, Miércoles=2, Jueves=3, Viernes=4, Sábado=5, Domingo=6
+REST_DAY_MAP = {
+    "L M": [0, 1], "M M": [1, 2], "M J": [2, 3],
+    "J V": [3, 4], "V S": [4, 5], "S D": [5, 6],
+    "D L": [6, 0]
+}
+# Mapa de descanso para turno nocturno
+NIGHT_SHIFT_PATTERN = {
+    'DOMINGO': [0, 2, 4], 'SABADO': [6, 1, 3], 'VIERNES': [5, 0, 2],
+    'JUEVES': [4, 6, 1], 'MIERCOLES': [3, 5, 0], 'MARTES': [2, 4, 6],
+    'LUNES': [1, 3, 5]
+}
+
+
+# --- Helper Function to Determine Day Off ---
+def _is_rest_weekday(descanso_str, weekday):
+    if pd.isna(descanso_str) or descanso_str.strip() == "": return False
+    descanso = str(descanso_str).upper().strip()
+    if "LAV" in descanso: return weekday in [0, 1, 2, 3, 4]
+    day_checks = {
+        0: ["L", "LUNES", "L M"], 1: ["M", "MARTES", "M M"], 2: ["X", "MIERCOLES", "M M"],
+        3: ["J", "JUEVES", "J V"], 4: ["V", "VIERNES", "V S"], 5: ["S", "SABADO", "V S", "S D"],
+        6: ["D", "DOMINGO", "D L", "S D"]
+    }
+    for check_str in day_checks.get(weekday, []):
+        if check_str in descanso: return True
+    return False
+
+# --- Definitive Shift Filtering Logic ---
+def is_active_on(horario, descanso, selected_weekday, selected_shift):
+    """True if a worker with this horario/descanso is on the roster for the weekday and shift."""
+    horario = str(horario).upper()
+    descanso = str(descanso).upper().strip()
+
+    # Case 1: Jornada Acumulada (LAV descanso)
+    if "LAV" in descanso:
+        if selected_weekday == 5 and selected_shift in ["Matutino", "Vespertino"]:
+            return True
+        return selected_weekday == 6  # Sunday, active in all shifts
+
+    # Case 2: Turno Nocturno
+    if "A 08.10" in horario and selected_shift == "Nocturno":
+        # Use the full name of the rest day for the pattern
+        return selected_weekday in NIGHT_SHIFT_PATTERN.get(descanso, [])
+
+    # Case 3: Turno Matutino/Vespertino
+    is_matutino = "7.00" in horario and selected_shift == "Matutino"
+    is_vespertino = "14.00" in horario and selected_shift == "Vespertino"
+    if is_matutino or is_vespertino:
+        # Se asume que el trabajador labora, a menos que coincida con sus días de descanso
+        return selected_weekday not in REST_DAY_MAP.get(descanso, [])
+    return False
+
+def shift_code(horario):
+    horario = horario if isinstance(horario, str) else ""
+    if "7.00" in horario: return "Mat."
+    if "14.00" in horario: return "Vesp."
+    if "A 08.10" in horario: return "Noct."
+    return "N/A"
+
+
+class PlazaDirectory:
+    """
+    Lookup structure built once per get_plazas() result: O(1) dicts keyed by
+    plaza, display_name and matricula, plus each worker's shift code and
+    weekday bitmasks for rest days and for the roster of every shift.
+    """
+    def __init__(self, plazas_df):
+        self.df = plazas_df
+        records = plazas_df.to_dict("records")
+        self.by_plaza = {r['plaza']: r for r in records}
+        self.by_display_name = {r['display_name']: r for r in records}
+        self.by_matricula = {r['matricula_actual']: r for r in records if r.get('matricula_actual')}
+        self.display_names = [r['display_name'] for r in records]
+        self.shift_codes = {r['plaza']: shift_code(r.get('horario')) for r in records}
+        # Bit `weekday` set = rest day (is_day_off) / on the roster for that shift.
+        self.rest_masks = {
+            r['plaza']: sum(1 << wd for wd in range(7) if _is_rest_weekday(r.get('dias_descanso'), wd))
+            for r in records
+        }
+        self.roster_masks = {
+            shift: [
+                sum(1 << wd for wd in range(7) if is_active_on(r.get('horario', ''), r.get('dias_descanso', ''), wd, shift))
+                for r in records
+            ]
+            for shift in SHIFTS
+        }
+
+    @property
+    def empty(self):
+        return self.df.empty
+
+    def name(self, plaza_id, default='N/A'):
+        record = self.by_plaza.get(plaza_id)
+        return record['nombre_actual'] if record else default
+
+    def shift_code(self, plaza_id):
+        return self.shift_codes.get(plaza_id, "N/A")
+
+    def is_day_off(self, plaza_id, day):
+        return bool(self.rest_masks.get(plaza_id, 0) >> day.weekday() & 1)
+
+    def active_workers(self, selected_date, selected_shift):
+        """Workers on the roster for the date and shift, in directory order."""
+        bit = 1 << selected_date.weekday()
+        mask = [bool(m & bit) for m in self.roster_masks[selected_shift]]
+        return self.df[mask]
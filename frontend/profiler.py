@@ -0,0 +1,111 @@
+import functools
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+import pandas as pd
+import streamlit as st
+
+import api_client
+
+# El perfilado se activa con SGO_PROFILE=1 o desde el panel de administración.
+ENV_ENABLED = os.environ.get("SGO_PROFILE", "").lower() in ("1", "true", "on")
+SESSION_KEY = "profiling_enabled"
+
+# Each Streamlit rerun executes in its own script thread, so the records of the
+# current rerun live in a thread-local and never mix between users.
+_local = threading.local()
+
+# Hit/miss counters per cached function, for the whole process.
+_cache_counts = defaultdict(lambda: {"llamadas": 0, "compartida": 0, "fallos": 0})
+_cache_lock = threading.Lock()
+
+
+def is_enabled():
+    return ENV_ENABLED or st.session_state.get(SESSION_KEY, False)
+
+def start_rerun():
+    """Starts a new per-rerun profile. Call once at the top of the script."""
+    _local.records = [] if is_enabled() else None
+    _local.rerun_start = time.perf_counter()
+
+def _record(kind, name, seconds, detail=""):
+    records = getattr(_local, "records", None)
+    if records is not None:
+        records.append({"tipo": kind, "nombre": name, "ms": seconds * 1000, "detalle": detail})
+
+@contextmanager
+def section(name):
+    """Times a named block of the page (a tab body, a calendar loop, ...)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record("sección", name, time.perf_counter() - start)
+
+def timed(fn):
+    """Decorator that times every call of a helper function."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _record("función", fn.__name__, time.perf_counter() - start)
+    return wrapper
+
+def record_cache(name, tier, seconds):
+    """Called by cache.cached for every lookup; `tier` is "local", "compartida" or None on a miss."""
+    with _cache_lock:
+        counts = _cache_counts[name]
+        counts["llamadas"] += 1
+        if tier is None:
+            counts["fallos"] += 1
+        elif tier == "compartida":
+            counts["compartida"] += 1
+    _record("caché", name, seconds, tier or "fallo")
+
+def _record_response(response):
+    path = urlparse(response.request.url).path
+    _record("API", f"{response.request.method} {path}", response.elapsed.total_seconds(), str(response.status_code))
+
+api_client.response_listeners.append(_record_response)
+
+
+def render_toggle():
+    """Admin switch. The flag is kept outside the widget key so it survives pages where the toggle isn't drawn."""
+    def _store():
+        st.session_state[SESSION_KEY] = st.session_state["profiling_toggle"]
+    st.toggle("⏱️ Mostrar perfil de ejecución", value=st.session_state.get(SESSION_KEY, False),
+              key="profiling_toggle", on_change=_store, disabled=ENV_ENABLED,
+              help="Muestra en la barra lateral el tiempo de cada sección, llamada a la API y función en caché.")
+
+def render_panel():
+    """Shows the breakdown of the current rerun in the sidebar."""
+    records = getattr(_local, "records", None)
+    if records is None:
+        return
+    total_ms = (time.perf_counter() - _local.rerun_start) * 1000
+    with st.sidebar.expander(f"⏱️ Perfil de ejecución ({total_ms:.0f} ms)", expanded=True):
+        if records:
+            df = pd.DataFrame(records)
+            summary = df.groupby(["tipo", "nombre"]).agg(
+                llamadas=("ms", "count"), total_ms=("ms", "sum"), max_ms=("ms", "max")
+            ).reset_index().sort_values("total_ms", ascending=False)
+            st.dataframe(summary, hide_index=True, use_container_width=True)
+        else:
+            st.caption("Sin registros en esta ejecución.")
+
+        with _cache_lock:
+            counts = [
+                {"función": name, "llamadas": c["llamadas"],
+                 "aciertos locales": c["llamadas"] - c["compartida"] - c["fallos"],
+                 "aciertos compartidos": c["compartida"], "fallos": c["fallos"]}
+                for name, c in _cache_counts.items()
+            ]
+        if counts:
+            st.caption("Caché (acumulado del proceso)")
+            st.dataframe(pd.DataFrame(counts), hide_index=True, use_container_width=True)
@@ -0,0 +1,96 @@
+import os
+import threading
+import time
+from datetime import date, timedelta
+
+import cache
+from api_client import get_json
+
+# Réplica local de las tablas con fecha, sincronizada con GET /changes: tras la
+# copia inicial, cada actualización trae sólo las filas que cambiaron.
+ENABLED = os.environ.get("SGO_REPLICA", "1").lower() not in ("0", "false", "off")
+# Only dates from this many days back are replicated; older windows go to the API.
+HORIZON_DAYS = int(os.environ.get("SGO_REPLICA_DAYS", "120"))
+# A read syncs first when the last sync is older than this (or an invalidation arrived).
+MAX_AGE = float(os.environ.get("SGO_REPLICA_MAX_AGE", "30"))
+
+TABLES = ("incidentes", "ausencias", "sustituciones", "tiempo_extra", "asignaciones_servicio")
+
+
+class Replica:
+    def __init__(self, tables=TABLES, horizon_days=HORIZON_DAYS):
+        self.tables = tables
+        self.desde = date.today() - timedelta(days=horizon_days)
+        self._rows = {name: {} for name in tables}
+        self._cursor = None
+        self._synced_at = 0.0
+        self._stale = True
+        self._lock = threading.Lock()
+
+    def mark_stale(self, *_):
+        self._stale = True
+
+    def _params(self):
+        params = {"desde": self.desde.isoformat(), "tables": ",".join(self.tables)}
+        if self._cursor:
+            params["since"] = self._cursor
+        return params
+
+    def _due(self):
+        return self._stale or time.monotonic() - self._synced_at > MAX_AGE
+
+    def pending_request(self):
+        """The (path, params) of the sync the next read will run, or None if none is due."""
+        return ("/changes", self._params()) if ENABLED and self._due() else None
+
+    def sync(self):
+        """
+        Applies the changes since the last cursor (a full snapshot the first
+        time). Raises requests.exceptions.RequestException when the API is down.
+        """
+        with self._lock:
+            params = self._params()
+            self._stale = False
+            try:
+                changes = get_json("/changes", params)
+            except Exception:
+                self._stale = True
+                raise
+            for name, delta in changes["tables"].items():
+                rows = self._rows[name] if not changes["full"] else {}
+                key = delta["key"]
+                for row in delta["upserts"]:
+                    rows[row[key]] = row
+                for deleted in delta["deletes"]:
+                    rows.pop(deleted, None)
+                self._rows[name] = rows
+            self._cursor = changes["cursor"]
+            self._synced_at = time.monotonic()
+
+    def window(self, table, date_column, start_date, end_date, **filters):
+        """
+        Rows of `table` with `date_column` in [start_date, end_date] that match
+        `filters`, or None when the window is older than the replica's horizon.
+        """
+        return self.overlapping(table, date_column, date_column, start_date, end_date, **filters)
+
+    def overlapping(self, table, start_column, end_column, start_date, end_date, **filters):
+        """
+        Rows of an interval table (e.g. ausencias) whose [start_column, end_column]
+        overlaps [start_date, end_date], or None outside the replica's horizon.
+        """
+        if not ENABLED or start_date < self.desde:
+            return None
+        if self._due():
+            self.sync()
+        start, end = start_date.isoformat(), end_date.isoformat()
+        return [
+            row for row in list(self._rows[table].values())
+            if row[start_column] <= end and start <= row[end_column] and all(row.get(k) == v for k, v in filters.items())
+        ]
+
+
+replica = Replica()
+# Any cache invalidation (own writes, outbox flushes, /events notices) means the
+# replica is behind too.
+cache.invalidation_listeners.append(replica.mark_stale)
@@ -1,11 +1,19 @@
 import os
+import argparse
+import calendar
+import shutil
+import tempfile
+import zipfile
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 from dotenv import load_dotenv
 from sqlalchemy import create_engine
 from openpyxl import load_workbook
 from datetime import date
 import re
 
+from archiver import read_archived
+
 # --- Database Connection Setup ---
 load_dotenv()
 
@@ -24,17 +32,34 @@ def get_database_engine():
     return create_engine(database_url)
 
 def fetch_overtime_data(engine, start_date, end_date):
-    """Fetches overtime and employee data for a given date range."""
+    """
+    Fetches overtime and employee data for a given date range. Quincenas archived
+    to Parquet (see archiver.py) are merged in; the rows still in the database win.
+    """
     query = f"""
     SELECT
         p.matricula_actual, p.nombre_actual, p.categoria, p.horario, p.dias_descanso,
-        te.fecha, te.horas, te.motivo_cobertura, p.plaza
+        te.fecha, te.horas, te.motivo_cobertura, p.plaza, te.id
     FROM tiempo_extra te
     JOIN plazas p ON te.plaza_id = p.plaza
     WHERE te.fecha BETWEEN '{start_date}' AND '{end_date}'
+      AND te.deleted_at IS NULL
     ORDER BY p.nombre_actual, te.fecha;
     """
     df = pd.read_sql(query, engine)
+
+    archived = read_archived("tiempo_extra", start_date, end_date)
+    if not archived.empty:
+        plazas = pd.read_sql(
+            "SELECT plaza, matricula_actual, nombre_actual, categoria, horario, dias_descanso FROM plazas WHERE deleted_at IS NULL",
+            engine,
+        )
+        archived = archived.merge(plazas, left_on="plaza_id", right_on="plaza")
+        archived["fecha"] = pd.to_datetime(archived["fecha"]).dt.date
+        # Rows archived without --purgar are still in the database; those win.
+        df = pd.concat([df, archived[df.columns]], ignore_index=True).drop_duplicates(subset="id", keep="first")
+        df = df.sort_values(["nombre_actual", "fecha"], kind="stable").reset_index(drop=True)
+    df = df.drop(columns="id")
     print(f"Found {len(df)} overtime records between {start_date} and {end_date}.")
     return df
 
@@ -67,6 +92,7 @@ def generate_report(data_df, template_path, output_path, plazas_df):
 
     sheet['G5'] = date.today().strftime('%d/%m/%Y')
     start_row = 10
+    plazas_by_id = {row['plaza']: row for row in plazas_df.to_dict('records')}
 
     for index, record in grouped_data.iterrows():
         current_row = start_row + index
@@ -87,9 +113,8 @@ def generate_report(data_df, template_path, output_path, plazas_df):
         if match:
             covered_worker_name_plaza, covered_worker_plaza_id, folio = match.groups()
             
-            covered_worker_details = plazas_df[plazas_df['plaza'] == covered_worker_plaza_id]
-            if not covered_worker_details.empty:
-                details = covered_worker_details.iloc[0]
+            details = plazas_by_id.get(covered_worker_plaza_id)
+            if details:
                 sheet[f'D{current_row}'] = f"{folio} {details['nombre_actual']}\n{details['categoria']}\nMAT: {details['matricula_actual']}\nTURNO: {details['horario']}\nDESCANSO: {details['dias_descanso']}"
             else:
                 sheet[f'D{current_row}'] = motivo
@@ -110,18 +135,117 @@ def generate_report(data_df, template_path, output_path, plazas_df):
     workbook.save(output_path)
     print(f"✅ Report successfully generated and saved to '{output_path}'")
 
-if __name__ == "__main__":
-    report_start_date = "2025-07-01"
-    report_end_date = "2025-07-31"
+# --- Batch generation (multiple periods) ---
+
+def parse_period(value):
+    """Parses a period written as 'YYYY-MM-DD:YYYY-MM-DD' into a (start, end) tuple."""
+    try:
+        start_str, end_str = value.split(":")
+        start, end = date.fromisoformat(start_str), date.fromisoformat(end_str)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Periodo inválido '{value}'. Use el formato AAAA-MM-DD:AAAA-MM-DD.")
+    if end < start:
+        raise argparse.ArgumentTypeError(f"Periodo inválido '{value}': la fecha final es anterior a la inicial.")
+    return start, end
+
+def quincenas_of_year(year):
+    """Returns every quincena of the year: the 1st-15th and the 16th-end of each month."""
+    periods = []
+    for month in range(1, 13):
+        last_day = calendar.monthrange(year, month)[1]
+        periods.append((date(year, month, 1), date(year, month, 15)))
+        periods.append((date(year, month, 16), date(year, month, last_day)))
+    return periods
+
+def partition_by_period(data_df, periods, by_categoria=False):
+    """
+    Splits the rows fetched for the union range into one DataFrame per period
+    (and per categoria when requested). Periods may overlap; a row is copied
+    into every period that contains it.
+    """
+    fechas = pd.to_datetime(data_df['fecha'])
+    partitions = {}
+    for start, end in periods:
+        mask = (fechas >= pd.Timestamp(start)) & (fechas <= pd.Timestamp(end))
+        period_df = data_df[mask]
+        if by_categoria:
+            for categoria, categoria_df in period_df.groupby('categoria'):
+                partitions[(start, end, categoria)] = categoria_df.reset_index(drop=True)
+        else:
+            partitions[(start, end, None)] = period_df.reset_index(drop=True)
+    return partitions
 
-    template_file = "template_tiempo_extra.xlsx"
-    output_file = f"Reporte_Tiempo_Extra_{report_start_date}_a_{report_end_date}.xlsx"
+def build_output_filename(start, end, categoria=None):
+    name = f"Reporte_Tiempo_Extra_{start}_a_{end}"
+    if categoria:
+        name += "_" + re.sub(r"[^A-Za-z0-9]+", "_", str(categoria)).strip("_")
+    return name + ".xlsx"
+
+def _render_job(job):
+    """Worker entry point for the process pool. Returns the path if a workbook was written."""
+    data_df, template_path, output_path, plazas_df = job
+    generate_report(data_df, template_path, output_path, plazas_df)
+    return output_path if os.path.exists(output_path) else None
+
+def generate_batch(periods, template_path, output_dir=None, zip_path=None, by_categoria=False, max_workers=None):
+    """
+    Generates one workbook per period using a single database round trip:
+    the union range is fetched once, partitioned in memory and the workbooks
+    are rendered in parallel.
+    """
+    db_engine = get_database_engine()
+    all_plazas_df = pd.read_sql("SELECT * FROM plazas WHERE deleted_at IS NULL", db_engine)
+    union_start = min(start for start, _ in periods)
+    union_end = max(end for _, end in periods)
+    overtime_df = fetch_overtime_data(db_engine, union_start, union_end)
+    db_engine.dispose()
+
+    partitions = partition_by_period(overtime_df, periods, by_categoria)
+
+    target_dir = tempfile.mkdtemp(prefix="reportes_") if zip_path else output_dir
+    os.makedirs(target_dir, exist_ok=True)
+
+    jobs = [
+        (period_df, template_path, os.path.join(target_dir, build_output_filename(start, end, categoria)), all_plazas_df)
+        for (start, end, categoria), period_df in partitions.items()
+    ]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        written = [path for path in executor.map(_render_job, jobs) if path]
+
+    if zip_path:
+        with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            for path in written:
+                archive.write(path, arcname=os.path.basename(path))
+        shutil.rmtree(target_dir, ignore_errors=True)
+        print(f"✅ {len(written)} reports packed into '{zip_path}'")
+    else:
+        print(f"✅ {len(written)} reports written to '{target_dir}'")
+    return written
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera los reportes oficiales de Tiempo Extra para uno o varios periodos.")
+    parser.add_argument("--periodo", action="append", type=parse_period, default=[],
+                        help="Periodo AAAA-MM-DD:AAAA-MM-DD. Puede repetirse.")
+    parser.add_argument("--anio", type=int, help="Genera todas las quincenas del año indicado.")
+    parser.add_argument("--plantilla", default="template_tiempo_extra.xlsx", help="Ruta de la plantilla de Excel.")
+    parser.add_argument("--salida", default=".", help="Directorio donde se guardan los reportes.")
+    parser.add_argument("--zip", dest="zip_path", help="Empaqueta los reportes en este archivo .zip en lugar de un directorio.")
+    parser.add_argument("--por-categoria", action="store_true", help="Genera un reporte por categoría dentro de cada periodo.")
+    parser.add_argument("--procesos", type=int, default=None, help="Número de procesos para generar los reportes.")
+    args = parser.parse_args(argv)
+
+    periods = list(args.periodo)
+    if args.anio:
+        periods.extend(quincenas_of_year(args.anio))
+    if not periods:
+        parser.error("Indique al menos un --periodo o un --anio.")
 
     try:
         print("Connecting to the database...")
-        db_engine = get_database_engine()
-        all_plazas_df = pd.read_sql("SELECT * FROM plazas", db_engine)
-        overtime_df = fetch_overtime_data(db_engine, report_start_date, report_end_date)
-        generate_report(overtime_df, template_file, output_file, all_plazas_df)
+        generate_batch(periods, args.plantilla, output_dir=args.salida, zip_path=args.zip_path,
+                       by_categoria=args.por_categoria, max_workers=args.procesos)
     except Exception as e:
         print(f"An error occurred: {e}")
+
+if __name__ == "__main__":
+    main()